@@ -2,6 +2,7 @@
 Tests the automatically shifting algorithm which matches the SMPS and CCNC data
 Version 2.0
 """
+import concurrent.futures
 import logging
 import numpy as np
 
@@ -12,7 +13,8 @@ import helper_functions as hf
 logger = logging.getLogger("controller")
 
 
-def get_auto_shift(smps_count, ccnc_count, scan_up_time, median_shift):
+def get_auto_shift(smps_count, ccnc_count, scan_up_time, median_shift, smooth_smps_count=None,
+                   smooth_ccnc_count=None, by_iteration=False):
     """
     Determines shift values of CCNC and SMPS files and prints the results to the console
 
@@ -22,26 +24,83 @@ def get_auto_shift(smps_count, ccnc_count, scan_up_time, median_shift):
     :param ndarray ccnc_count:
     :param int scan_up_time:
     :param int median_shift:
+    :param ndarray smooth_smps_count: The SMPS counts already smoothed with a window of 7 and an order of 2, so the
+                                      counts of many scans can be smoothed at once.  Smoothed here if not given.
+    :param ndarray smooth_ccnc_count: The CCNC counts already smoothed the same way
+    :param bool by_iteration: If True, the area of each shift is found one iteration after another
+                              (see :class:`~auto_shift.get_shift_areas_by_iteration`) instead of all at once
+                              (see :class:`~auto_shift.get_shift_areas`).  Both give the same shift.
     """
     if sum(smps_count) == 0 or sum(ccnc_count) == 0:
         return 0, ["No SMPS and/or CCNC data"]
     if len(smps_count) > len(ccnc_count):
         return 0, ["SMPS data longer than CCNC data"]
-    # Initalize weight values
-    high_smps_weight = const.HIGH_SMPS_WEIGHT
-    high_ccnc_weight = const.HIGH_CCNC_WEIGHT
-    error_messages = []
-
     # RESEARCH best way?
-    smooth_smps_count = hf.smooth(smps_count, window_length=7, polyorder=2)
-
-    smooth_ccnc_count = hf.smooth(ccnc_count, window_length=7, polyorder=2)
+    if smooth_smps_count is None:
+        smooth_smps_count = hf.smooth(smps_count, window_length=7, polyorder=2)
+    if smooth_ccnc_count is None:
+        smooth_ccnc_count = hf.smooth(ccnc_count, window_length=7, polyorder=2)
 
     smps_first_peak = np.argmax(smooth_smps_count[0:scan_up_time])
     smps_next_peak = np.argmax(smooth_smps_count[scan_up_time:]) + scan_up_time
     ccnc_first_peak = np.argmax(smooth_ccnc_count[median_shift:(median_shift + scan_up_time)]) + median_shift
     ccnc_next_peak = np.argmax(smooth_ccnc_count[(median_shift + scan_up_time):]) + scan_up_time + median_shift
+    return get_shift_from_peaks(smooth_smps_count, smooth_ccnc_count, smps_first_peak, smps_next_peak,
+                                ccnc_first_peak, ccnc_next_peak, by_iteration)
+
+
+def get_shift_from_peaks(smooth_smps_count, smooth_ccnc_count, smps_first_peak, smps_next_peak, ccnc_first_peak,
+                         ccnc_next_peak, by_iteration=False):
+    """
+    Determines the shift value of a scan from the peaks of its smoothed SMPS and CCNC counts
+    (see :class:`~auto_shift.get_auto_shift`).  The SMPS counts between the peaks are moved over the CCNC counts between
+    the peaks and the shift with the least weighted area between the curves is used.
+
+    :param ndarray smooth_smps_count: The smoothed SMPS counts
+    :param ndarray smooth_ccnc_count: The smoothed CCNC counts
+    :param int smps_first_peak: The index of the peak of the SMPS counts during the up scan
+    :param int smps_next_peak: The index of the peak of the SMPS counts after the up scan
+    :param int ccnc_first_peak: The index of the peak of the CCNC counts during the up scan
+    :param int ccnc_next_peak: The index of the peak of the CCNC counts after the up scan
+    :param bool by_iteration: If True, the area of each shift is found one iteration after another
+    :return: The shift value and the error messages
+    :rtype: (int, list[str])
+    """
+    return search_shift_from_peaks(smooth_smps_count, smooth_ccnc_count, smps_first_peak, smps_next_peak,
+                                   ccnc_first_peak, ccnc_next_peak, by_iteration)[:2]
+
+
+def search_shift_from_peaks(smooth_smps_count, smooth_ccnc_count, smps_first_peak, smps_next_peak, ccnc_first_peak,
+                            ccnc_next_peak, by_iteration=False, median_shift=None, band=None, curve=None):
+    """
+    Determines the shift value of a scan from its peaks the same as :class:`~auto_shift.get_shift_from_peaks`, and
+    how many shifts were searched.
+
+    If a band is given, only the shifts within band of the median shift are searched first.  While the least area is
+    on the edge of the searched shifts, and so the best shift may be further away, the band is doubled and the new
+    shifts on each side are searched (see :class:`~auto_shift.search_shift_band`).
 
+    The area of each searched shift is kept in a :class:`~auto_shift.ShiftCostCurve`.  If the curve of an earlier
+    search of the scan is given and was found from the same peaks, its areas are reused and only the shifts it did not
+    search are searched.
+
+    :param ndarray smooth_smps_count: The smoothed SMPS counts
+    :param ndarray smooth_ccnc_count: The smoothed CCNC counts
+    :param int smps_first_peak: The index of the peak of the SMPS counts during the up scan
+    :param int smps_next_peak: The index of the peak of the SMPS counts after the up scan
+    :param int ccnc_first_peak: The index of the peak of the CCNC counts during the up scan
+    :param int ccnc_next_peak: The index of the peak of the CCNC counts after the up scan
+    :param bool by_iteration: If True, the area of each shift is found one iteration after another.  Only used when
+                              every shift is searched, and neither reuses nor returns a curve.
+    :param int median_shift: The median shift the band is around
+    :param int band: The number of shifts searched on each side of the median shift at first.  If None, every shift
+                     is searched.
+    :param ShiftCostCurve curve: The curve of an earlier search of the scan
+    :return: The shift value, the error messages, the number of shifts searched, the number of shifts and the curve
+             of the scan
+    :rtype: (int, list[str], int, int, ShiftCostCurve)
+    """
+    peaks = (int(smps_first_peak), int(smps_next_peak), int(ccnc_first_peak), int(ccnc_next_peak))
     # Increase SMPS range to ensure enough values are captured.
     # RESEARCH magic numbers
     # shift the SMPS first peak back by whatever is larger, 3% of the SMPS data size or 3 scans
@@ -59,60 +118,669 @@ def get_auto_shift(smps_count, ccnc_count, scan_up_time, median_shift):
                                  4 - abs((ccnc_next_peak - ccnc_first_peak) - (smps_next_peak - smps_first_peak)))
     max_iter += smpsccnc_peak_len_diff
 
+    # Determine Ranges
+    s_s = smps_first_peak - smpsccnc_peak_len_diff
+    c_s = ccnc_first_peak
+    c_e = ccnc_first_peak + data_length
+    ccnc_middle_data = smooth_ccnc_count[c_s:c_e]
+
+    num_shifts = max(max_iter, 0)
+    if by_iteration:
+        curve = None
+    elif curve is not None and curve.peaks == peaks and len(curve.areas) == num_shifts:
+        # The curve of the scan is kept unchanged as the new curve may search more shifts
+        curve = curve.copy()
+    else:
+        curve = ShiftCostCurve(num_shifts, peaks, int(ccnc_first_peak - smps_first_peak))
+    if band is not None and median_shift is not None and not by_iteration:
+        # The iteration of a shift is ccnc_first_peak - smps_first_peak - shift
+        median_iteration = ccnc_first_peak - smps_first_peak - median_shift
+        total_area, error_messages, num_searched = search_shift_band(smooth_smps_count, ccnc_middle_data, s_s,
+                                                                     data_length, max_iter, median_iteration, band,
+                                                                     curve)
+    elif by_iteration:
+        total_area, error_messages = get_shift_areas_by_iteration(smooth_smps_count, ccnc_middle_data, s_s,
+                                                                  data_length, max_iter)
+        num_searched = num_shifts
+    else:
+        num_searched = curve.search(smooth_smps_count, ccnc_middle_data, s_s, data_length, 0, num_shifts)
+        total_area = curve.areas
+        error_messages = curve.get_error_messages()
+
+    if len(total_area) == 0:
+        proposed_shift = 0
+    else:
+        proposed_shift = ccnc_first_peak - smps_first_peak - np.argmin(total_area)
+    if curve is not None:
+        curve.shift = int(proposed_shift)
+    return proposed_shift, error_messages, num_searched, num_shifts, curve
+
+
+def search_shift_band(smooth_smps_count, ccnc_middle_data, first_start, data_length, num_shifts, center, band,
+                      curve=None):
+    """
+    Finds the areas of the shifts around a center shift (see :class:`~auto_shift.get_shift_areas`).  The shifts
+    within band of the center are searched first.  While the least area is on the edge of the searched shifts, the
+    band is doubled and only the shifts added on each side are searched, so the search grows from a fine band around
+    the center until the least area is inside it or every shift is searched.
+
+    :param ndarray smooth_smps_count: The smoothed SMPS counts
+    :param ndarray ccnc_middle_data: The smoothed CCNC counts between their peaks
+    :param int first_start: The start of the SMPS window of the first shift
+    :param int data_length: The length of each SMPS window
+    :param int num_shifts: The number of shifts
+    :param int center: The shift the search starts at.  Moved to the nearest shift if out of range.
+    :param int band: The number of shifts searched on each side of the center at first
+    :param ShiftCostCurve curve: Keeps the area of each searched shift.  The shifts it already searched are not
+                                 searched again.
+    :return: The area of each shift, which is inf for the shifts outside the final band, a message for each shift in
+             the band whose area could not be found and the number of shifts searched
+    :rtype: (ndarray, list[str], int)
+    """
+    if num_shifts <= 0:
+        return np.zeros(0), [], 0
+    if curve is None:
+        curve = ShiftCostCurve(num_shifts)
+    num_searched = 0
+    center = min(max(int(center), 0), num_shifts - 1)
+    band = max(int(band), 1)
+    low, high = max(center - band, 0), min(center + band + 1, num_shifts)
+    num_searched += curve.search(smooth_smps_count, ccnc_middle_data, first_start, data_length, low, high)
+    while True:
+        best = low + int(np.argmin(curve.areas[low:high]))
+        if not ((best == low and low > 0) or (best == high - 1 and high < num_shifts)):
+            break
+        band *= 2
+        low, high = max(center - band, 0), min(center + band + 1, num_shifts)
+        num_searched += curve.search(smooth_smps_count, ccnc_middle_data, first_start, data_length, low, high)
+    total_area = np.full(num_shifts, np.inf)
+    total_area[low:high] = curve.areas[low:high]
+    return total_area, curve.get_error_messages(low, high), num_searched
+
+
+def get_shift_area(smps_middle_data, ccnc_middle_data):
+    """
+    Finds the weighted area between a window of the smoothed SMPS counts and the smoothed CCNC counts.  Where the
+    curves cross, the area on each side of the crossing is found separately.  The area where the CCNC counts are
+    higher is weighted by :class:`~constants.HIGH_CCNC_WEIGHT` and where the SMPS counts are higher by
+    :class:`~constants.HIGH_SMPS_WEIGHT`.
+
+    :param ndarray smps_middle_data: The window of the smoothed SMPS counts
+    :param ndarray ccnc_middle_data: The smoothed CCNC counts between their peaks
+    :return: The weighted area between the curves
+    :rtype: float
+    :raises FloatingPointError: If the curves have the same slope at any point
+    """
+    high_smps_weight = const.HIGH_SMPS_WEIGHT
+    high_ccnc_weight = const.HIGH_CCNC_WEIGHT
+    with np.errstate(all='raise'):
+        # -- Set weights
+        smps_weight = np.where(smps_middle_data[:-1] > ccnc_middle_data[:-1], high_smps_weight, 1)
+        ccnc_weight = np.where(ccnc_middle_data[:-1] > smps_middle_data[:-1], high_ccnc_weight, 1)
+        # -- create array to represent x axis
+        x = np.arange(len(smps_middle_data))
+        # -- create array of differences
+        s_subt_c = smps_middle_data - ccnc_middle_data
+        # -- Find if the lines cross
+        data_crosses = np.sign(s_subt_c[:-1] * s_subt_c[1:])
+        # -- Slopes and individual intersects
+        smps_slope = smps_middle_data[1:] - smps_middle_data[:-1]
+        ccnc_slope = ccnc_middle_data[1:] - ccnc_middle_data[:-1]
+        smps_y_isects = smps_middle_data[:-1] - (smps_slope * x[:-1])
+        ccnc_y_isects = ccnc_middle_data[:-1] - (ccnc_slope * x[:-1])
+        # -- Find the x coordinate where the lines cross (the decimal places only)
+        x_line_isects = (ccnc_y_isects - smps_y_isects) / (smps_slope - ccnc_slope)
+        x_line_isects = np.where(data_crosses > 0, 0., x_line_isects)
+        x_line_isects = np.where(data_crosses > 0, 0., x_line_isects - x[:-1])
+        # -- Areas via trapezoidal rule
+        areas_no_isects = 0.5 * abs(s_subt_c[:-1] + s_subt_c[1:]) * ccnc_weight * smps_weight
+        areas_of_isects_l = 0.5 * abs(s_subt_c[:-1]) * x_line_isects * ccnc_weight * smps_weight
+        areas_of_isects_r = 0.5 * abs(s_subt_c[1:]) * (1 - x_line_isects) * ccnc_weight * smps_weight
+        areas_of_isects = areas_of_isects_l + areas_of_isects_r
+        return np.sum(np.where(data_crosses > 0, areas_no_isects, areas_of_isects))
+
+
+def get_shift_areas_by_iteration(smooth_smps_count, ccnc_middle_data, first_start, data_length, num_shifts):
+    """
+    Finds the weighted area between the curves (see :class:`~auto_shift.get_shift_area`) for each shift, one
+    iteration after another.  The SMPS window of shift i starts at first_start + i.  If the area of a shift can not
+    be found, such as when the curves have the same slope, the area of the shift before it is used.
+
+    :param ndarray smooth_smps_count: The smoothed SMPS counts
+    :param ndarray ccnc_middle_data: The smoothed CCNC counts between their peaks
+    :param int first_start: The start of the SMPS window of the first shift
+    :param int data_length: The length of each SMPS window
+    :param int num_shifts: The number of shifts
+    :return: The area of each shift and a message for each shift whose area could not be found
+    :rtype: (list[float], list[str])
+    """
     total_area = []
+    error_messages = []
     # Repeat for the number of iterations or until the smps end index > smps_next_peak
-    for iteration in range(max_iter):
-        # Determine Ranges
-        s_s = iteration + smps_first_peak - smpsccnc_peak_len_diff
-        s_e = iteration + smps_first_peak + data_length - smpsccnc_peak_len_diff
-        c_s = ccnc_first_peak
-        c_e = ccnc_first_peak + data_length
-
+    for iteration in range(num_shifts):
+        s_s = iteration + first_start
+        s_e = iteration + first_start + data_length
         # get middle data for test [Loop needs to start before here]
         smps_middle_data = smooth_smps_count[s_s:s_e]
-        ccnc_middle_data = smooth_ccnc_count[c_s:c_e]
-
         # Get area between the curves
-        with np.errstate(all='raise'):
-            try:
-                # -- Set weights
-                smps_weight = np.where(smps_middle_data[:-1] > ccnc_middle_data[:-1], high_smps_weight, 1)
-                ccnc_weight = np.where(ccnc_middle_data[:-1] > smps_middle_data[:-1], high_ccnc_weight, 1)
-                # -- create array to represent x axis
-                x = np.arange(len(smps_middle_data))
-                # -- create array of differences
-                s_subt_c = smps_middle_data - ccnc_middle_data
-                # -- Find if the lines cross
-                data_crosses = np.sign(s_subt_c[:-1] * s_subt_c[1:])
-                # -- Slopes and individual intersects
-                smps_slope = smps_middle_data[1:] - smps_middle_data[:-1]
-                ccnc_slope = ccnc_middle_data[1:] - ccnc_middle_data[:-1]
-                smps_y_isects = smps_middle_data[:-1] - (smps_slope * x[:-1])
-                ccnc_y_isects = ccnc_middle_data[:-1] - (ccnc_slope * x[:-1])
-                # -- Find the x coordinate where the lines cross (the decimal places only)
-                x_line_isects = (ccnc_y_isects - smps_y_isects) / (smps_slope - ccnc_slope)
-                x_line_isects = np.where(data_crosses > 0, 0., x_line_isects)
-                x_line_isects = np.where(data_crosses > 0, 0., x_line_isects - x[:-1])
-                # -- Areas via trapezoidal rule
-                areas_no_isects = 0.5 * abs(s_subt_c[:-1] + s_subt_c[1:]) * ccnc_weight * smps_weight
-                areas_of_isects_l = 0.5 * abs(s_subt_c[:-1]) * x_line_isects * ccnc_weight * smps_weight
-                areas_of_isects_r = 0.5 * abs(s_subt_c[1:]) * (1 - x_line_isects) * ccnc_weight * smps_weight
-                areas_of_isects = areas_of_isects_l + areas_of_isects_r
-                total_area.append(np.sum(np.where(data_crosses > 0, areas_no_isects, areas_of_isects)))
-            except Exception as e:
-                # Catch divide by zero errors
-                error_message = "Shift issue on iteration " + str(iteration)
-                error_message += " (" + str(e) + ")"
-                if len(total_area) == 0:
-                    total_area.append(999999999999)
-                    error_message += " [set to 9's]"
-                else:
-                    total_area.append(total_area[-1])
-                    error_message += " [set to prior value]"
-                error_messages.append(error_message)
+        try:
+            total_area.append(get_shift_area(smps_middle_data, ccnc_middle_data))
+        except Exception as e:
+            # Catch divide by zero errors
+            error_message = "Shift issue on iteration " + str(iteration)
+            error_message += " (" + str(e) + ")"
+            if len(total_area) == 0:
+                total_area.append(999999999999)
+                error_message += " [set to 9's]"
+            else:
+                total_area.append(total_area[-1])
+                error_message += " [set to prior value]"
+            error_messages.append(error_message)
+    return total_area, error_messages
 
-    if len(total_area) == 0:
-        return 0, error_messages
-    else:
-        proposed_shift = ccnc_first_peak - smps_first_peak - np.argmin(total_area)
-        return proposed_shift, error_messages
+
+def get_shift_areas(smooth_smps_count, ccnc_middle_data, first_start, data_length, num_shifts, first_iteration=0,
+                    prior_area=None):
+    """
+    Finds the same areas and messages as :class:`~auto_shift.get_shift_areas_by_iteration`, but for all the shifts at
+    once.  The SMPS windows of all the shifts are strided views of the smoothed SMPS counts, so no values are copied,
+    and the areas are found as one matrix of shape (shifts, window).
+
+    Instead of stopping at the first floating point error of each shift, the whole matrix is calculated and the shifts
+    where the curves have the same slope are masked.  Only the masked shifts and the shifts whose window does not fit
+    in the SMPS counts are found again one at a time, which gives their message and the prior value.
+
+    :param ndarray smooth_smps_count: The smoothed SMPS counts
+    :param ndarray ccnc_middle_data: The smoothed CCNC counts between their peaks
+    :param int first_start: The start of the SMPS window of the first shift
+    :param int data_length: The length of each SMPS window
+    :param int num_shifts: The number of shifts
+    :param int first_iteration: The iteration of the first shift, when only some of the shifts are searched
+    :param float prior_area: The area of the shift before the first shift, if known
+    :return: The area of each shift and a message for each shift whose area could not be found
+    :rtype: (ndarray, list[str])
+    """
+    total_area, error_messages = get_shift_areas_by_shift(smooth_smps_count, ccnc_middle_data, first_start,
+                                                          data_length, num_shifts, first_iteration, prior_area)
+    return total_area, [error_messages[iteration] for iteration in sorted(error_messages)]
+
+
+def get_shift_areas_by_shift(smooth_smps_count, ccnc_middle_data, first_start, data_length, num_shifts,
+                             first_iteration=0, prior_area=None):
+    """
+    Finds the areas of the shifts the same as :class:`~auto_shift.get_shift_areas`, with the message of each shift
+    whose area could not be found by its iteration, so the messages can be kept with the areas.
+
+    :param ndarray smooth_smps_count: The smoothed SMPS counts
+    :param ndarray ccnc_middle_data: The smoothed CCNC counts between their peaks
+    :param int first_start: The start of the SMPS window of the first shift
+    :param int data_length: The length of each SMPS window
+    :param int num_shifts: The number of shifts
+    :param int first_iteration: The iteration of the first shift, when only some of the shifts are searched
+    :param float prior_area: The area of the shift before the first shift, if known
+    :return: The area of each shift and the message of each shift whose area could not be found by its iteration
+    :rtype: (ndarray, dict[int, str])
+    """
+    if num_shifts <= 0:
+        return np.zeros(0), {}
+    smooth_smps_count = np.asarray(smooth_smps_count)
+    ccnc_middle_data = np.asarray(ccnc_middle_data)
+    total_area = np.zeros(num_shifts)
+    redo = np.ones(num_shifts, dtype=bool)
+    # The shifts whose SMPS window is inside the SMPS counts
+    first_shift = max(0, -first_start)
+    last_shift = min(num_shifts, len(smooth_smps_count) - data_length - first_start + 1)
+    if first_shift < last_shift and len(ccnc_middle_data) == data_length and data_length > 1:
+        smps_windows = np.lib.stride_tricks.as_strided(
+            smooth_smps_count[first_start + first_shift:],
+            shape=(last_shift - first_shift, data_length),
+            strides=(smooth_smps_count.strides[0], smooth_smps_count.strides[0]),
+            writeable=False)
+        try:
+            areas, same_slope = get_window_areas(smps_windows, ccnc_middle_data)
+            total_area[first_shift:last_shift] = areas
+            redo[first_shift:last_shift] = same_slope
+        except FloatingPointError:
+            # An overflow or underflow, which stops a single shift, is found again one shift at a time
+            pass
+
+    error_messages = {}
+    for iteration in np.flatnonzero(redo):
+        s_s = iteration + first_start
+        s_e = iteration + first_start + data_length
+        try:
+            total_area[iteration] = get_shift_area(smooth_smps_count[s_s:s_e], ccnc_middle_data)
+        except Exception as e:
+            # Catch divide by zero errors.  The shift before has its final area as the shifts are in order.
+            error_message = "Shift issue on iteration " + str(iteration + first_iteration)
+            error_message += " (" + str(e) + ")"
+            if iteration == 0 and prior_area is None:
+                total_area[iteration] = 999999999999
+                error_message += " [set to 9's]"
+            else:
+                total_area[iteration] = total_area[iteration - 1] if iteration > 0 else prior_area
+                error_message += " [set to prior value]"
+            error_messages[int(iteration) + first_iteration] = error_message
+    return total_area, error_messages
+
+
+def get_window_areas(smps_windows, ccnc_middle_data):
+    """
+    Finds the weighted area between each window of the smoothed SMPS counts and the smoothed CCNC counts with the same
+    operations as :class:`~auto_shift.get_shift_area`, so the area of each window is the same.
+
+    :param ndarray smps_windows: The SMPS windows as a matrix of shape (shifts, window)
+    :param ndarray ccnc_middle_data: The smoothed CCNC counts between their peaks
+    :return: The area of each window and whether the curves have the same slope at any point of the window, or are
+             not finite, in which case its area is not valid
+    :rtype: (ndarray, ndarray)
+    :raises FloatingPointError: If a value overflows or underflows
+    """
+    high_smps_weight = const.HIGH_SMPS_WEIGHT
+    high_ccnc_weight = const.HIGH_CCNC_WEIGHT
+    # The divisions by zero are masked instead
+    with np.errstate(divide='ignore', invalid='ignore', over='raise', under='raise'):
+        # -- Set weights
+        smps_weight = np.where(smps_windows[:, :-1] > ccnc_middle_data[:-1], high_smps_weight, 1)
+        ccnc_weight = np.where(ccnc_middle_data[:-1] > smps_windows[:, :-1], high_ccnc_weight, 1)
+        # -- create array to represent x axis
+        x = np.arange(smps_windows.shape[1])
+        # -- create array of differences
+        s_subt_c = smps_windows - ccnc_middle_data
+        # -- Find if the lines cross
+        data_crosses = np.sign(s_subt_c[:, :-1] * s_subt_c[:, 1:])
+        # -- Slopes and individual intersects
+        smps_slope = smps_windows[:, 1:] - smps_windows[:, :-1]
+        ccnc_slope = ccnc_middle_data[1:] - ccnc_middle_data[:-1]
+        smps_y_isects = smps_windows[:, :-1] - (smps_slope * x[:-1])
+        ccnc_y_isects = ccnc_middle_data[:-1] - (ccnc_slope * x[:-1])
+        # -- Find the x coordinate where the lines cross (the decimal places only)
+        slope_differences = smps_slope - ccnc_slope
+        x_line_isects = (ccnc_y_isects - smps_y_isects) / slope_differences
+        x_line_isects = np.where(data_crosses > 0, 0., x_line_isects)
+        x_line_isects = np.where(data_crosses > 0, 0., x_line_isects - x[:-1])
+        # -- Areas via trapezoidal rule
+        areas_no_isects = 0.5 * abs(s_subt_c[:, :-1] + s_subt_c[:, 1:]) * ccnc_weight * smps_weight
+        areas_of_isects_l = 0.5 * abs(s_subt_c[:, :-1]) * x_line_isects * ccnc_weight * smps_weight
+        areas_of_isects_r = 0.5 * abs(s_subt_c[:, 1:]) * (1 - x_line_isects) * ccnc_weight * smps_weight
+        areas_of_isects = areas_of_isects_l + areas_of_isects_r
+        areas = np.sum(np.where(data_crosses > 0, areas_no_isects, areas_of_isects), axis=1)
+    same_slope = (slope_differences == 0).any(axis=1) | ~np.isfinite(smps_windows).all(axis=1)
+    same_slope |= not np.isfinite(ccnc_middle_data).all()
+    return areas, same_slope
+
+
+class ShiftCostCurve(object):
+    """
+    The weighted area between the curves (the cost) of each shift of a scan, kept with the peaks it was found from
+    and the shift that was chosen from it.  The area of iteration i is the area of the shift offset - i.  The shifts
+    are searched as needed, so a curve can be reused to search more shifts or to find the next best shifts without
+    finding the areas again.
+
+    Stores the following variables:
+
+    - **peaks**: The first and next SMPS peak and the first and next CCNC peak the curve was found from
+      (see :class:`~auto_shift.search_shift_from_peaks`)
+    - **offset**: The shift of the first iteration
+    - **areas**: The area of each iteration, which is inf for the iterations that were not searched
+    - **searched**: Whether each iteration was searched
+    - **error_messages**: The message of each searched iteration whose area could not be found by its iteration
+    - **shift**: The shift chosen from the curve
+
+    :param int num_shifts: The number of shifts
+    :param tuple peaks: The peaks the curve is found from
+    :param int offset: The shift of the first iteration
+    """
+    def __init__(self, num_shifts, peaks=None, offset=0):
+        self.peaks = peaks
+        self.offset = offset
+        self.areas = np.full(num_shifts, np.inf)
+        self.searched = np.zeros(num_shifts, dtype=bool)
+        self.error_messages = {}
+        self.shift = None
+
+    def copy(self):
+        """
+        Returns a copy of the curve which can be searched without changing this curve.
+
+        :return: The copy
+        :rtype: ShiftCostCurve
+        """
+        curve = ShiftCostCurve(0, self.peaks, self.offset)
+        curve.areas = self.areas.copy()
+        curve.searched = self.searched.copy()
+        curve.error_messages = dict(self.error_messages)
+        curve.shift = self.shift
+        return curve
+
+    def search(self, smooth_smps_count, ccnc_middle_data, first_start, data_length, start, end):
+        """
+        Finds the areas of the iterations from start to end that were not searched yet
+        (see :class:`~auto_shift.get_shift_areas`).  Each run of iterations that were not searched is found at once,
+        using the area a search of every iteration would have before the run as the prior value
+        (see :class:`~auto_shift.ShiftCostCurve.get_prior_area`), so the areas are the same as that search.
+
+        :param ndarray smooth_smps_count: The smoothed SMPS counts
+        :param ndarray ccnc_middle_data: The smoothed CCNC counts between their peaks
+        :param int first_start: The start of the SMPS window of the first iteration
+        :param int data_length: The length of each SMPS window
+        :param int start: The first iteration searched
+        :param int end: The iteration after the last iteration searched
+        :return: The number of iterations searched
+        :rtype: int
+        """
+        iterations = np.flatnonzero(~self.searched[start:end]) + start
+        if len(iterations) == 0:
+            return 0
+        # Split the iterations into runs of consecutive iterations
+        run_starts = np.concatenate(([0], np.flatnonzero(np.diff(iterations) != 1) + 1))
+        run_ends = np.append(run_starts[1:], len(iterations))
+        for run_start, run_end in zip(iterations[run_starts], iterations[run_ends - 1] + 1):
+            run_start, run_end = int(run_start), int(run_end)
+            prior_area = self.get_prior_area(smooth_smps_count, ccnc_middle_data, first_start, data_length, run_start)
+            areas, messages = get_shift_areas_by_shift(smooth_smps_count, ccnc_middle_data, first_start + run_start,
+                                                       data_length, run_end - run_start, run_start, prior_area)
+            self.areas[run_start:run_end] = areas
+            self.searched[run_start:run_end] = True
+            self.error_messages.update(messages)
+        return len(iterations)
+
+    def get_prior_area(self, smooth_smps_count, ccnc_middle_data, first_start, data_length, iteration):
+        """
+        Returns the area a search of every iteration has before an iteration, which is the prior value of the
+        iteration if its area can not be found.  That is the area of the nearest iteration before it whose area could
+        be found, as the areas that could not be found are set to the prior value in turn.  The iterations before it
+        that were not searched are found one at a time, without being kept, until one was searched or has an area.
+
+        :param ndarray smooth_smps_count: The smoothed SMPS counts
+        :param ndarray ccnc_middle_data: The smoothed CCNC counts between their peaks
+        :param int first_start: The start of the SMPS window of the first iteration
+        :param int data_length: The length of each SMPS window
+        :param int iteration: The iteration
+        :return: The prior area, or None if no iteration before it has an area
+        :rtype: float
+        """
+        for prior in range(iteration - 1, -1, -1):
+            if self.searched[prior]:
+                return self.areas[prior]
+            areas, messages = get_shift_areas_by_shift(smooth_smps_count, ccnc_middle_data, first_start + prior,
+                                                       data_length, 1, prior)
+            if prior not in messages:
+                return areas[0]
+        return None
+
+    def get_error_messages(self, start=0, end=None):
+        """
+        Returns the messages of the searched iterations from start to end in order.
+
+        :param int start: The first iteration
+        :param int end: The iteration after the last iteration.  If None, up to the last iteration.
+        :return: The messages
+        :rtype: list[str]
+        """
+        if end is None:
+            end = len(self.areas)
+        return [self.error_messages[iteration] for iteration in sorted(self.error_messages)
+                if start <= iteration < end]
+
+    def get_shifts(self):
+        """
+        Returns the shift of each iteration.
+
+        :return: The shifts
+        :rtype: ndarray
+        """
+        return self.offset - np.arange(len(self.areas))
+
+    def get_best_shifts(self, count=3):
+        """
+        Returns the shifts at the local minimums of the searched areas, from the least area to the greatest.  Where
+        neighbouring shifts have the same area, the first iteration is used, so the first shift is the shift chosen
+        from the curve when every shift in its band was searched.
+
+        :param int count: The number of shifts returned at most
+        :return: The best shifts
+        :rtype: list[int]
+        """
+        areas = np.where(self.searched, self.areas, np.inf)
+        before = np.concatenate(([np.inf], areas[:-1]))
+        after = np.append(areas[1:], np.inf)
+        minimums = np.flatnonzero(self.searched & (areas < before) & (areas <= after))
+        # A stable sort keeps the first iteration of equal areas first
+        minimums = minimums[np.argsort(areas[minimums], kind="stable")]
+        return [int(shift) for shift in self.get_shifts()[minimums[:count]]]
+
+
+class AutoShiftBatch(object):
+    """
+    Determines the shift values of all the scans of an experiment at once, with the same results as calling
+    :class:`~auto_shift.get_auto_shift` for each scan.  The counts are smoothed once and kept as matrices with a row
+    for each scan, padded with -inf so the padding is never a peak.  The peaks of all the scans are found with one
+    argmax over each matrix, masked to the range searched in each scan.  The SMPS peaks do not depend on the median
+    shift, so they are only found once for all the passes.
+
+    The few scans that get_auto_shift handles differently, such as scans without data or where a range is empty, are
+    left to get_auto_shift.
+
+    Stores the following variables:
+
+    - **smps_counts**: The SMPS counts of each scan
+    - **ccnc_counts**: The CCNC counts of each scan
+    - **scan_up_times**: The scan up time of each scan
+    - **smooth_smps_counts**: The smoothed SMPS counts of each scan
+    - **smooth_ccnc_counts**: The smoothed CCNC counts of each scan
+    - **smooth_smps_matrix**: The smoothed SMPS counts as a matrix of shape (scans, values)
+    - **smooth_ccnc_matrix**: The smoothed CCNC counts as a matrix of shape (scans, values)
+    - **smps_peaks**: The first and next SMPS peak of each scan, found when first needed
+    - **search_counts**: The number of shifts searched and the number of shifts of each scan in the last call of
+      :class:`~auto_shift.AutoShiftBatch.get_shifts`.  None for the scans left to get_auto_shift.
+    - **cost_curves**: The :class:`~auto_shift.ShiftCostCurve` of each scan in the last call of get_shifts.  None for
+      the scans left to get_auto_shift.
+    - **batched**: Whether each scan is handled by the batch instead of by get_auto_shift
+
+    :param list[ndarray] smps_counts: The SMPS counts of each scan
+    :param list[ndarray] ccnc_counts: The CCNC counts of each scan
+    :param list[int]|ndarray scan_up_times: The scan up time of each scan
+    :param list[ndarray] smooth_smps_counts: The SMPS counts already smoothed with a window of 7 and an order of 2.
+                                             Smoothed here if not given.
+    :param list[ndarray] smooth_ccnc_counts: The CCNC counts already smoothed the same way
+    """
+    def __init__(self, smps_counts, ccnc_counts, scan_up_times, smooth_smps_counts=None, smooth_ccnc_counts=None):
+        self.smps_counts = smps_counts
+        self.ccnc_counts = ccnc_counts
+        self.scan_up_times = np.asarray(scan_up_times, dtype=np.intp)
+        if smooth_smps_counts is None:
+            smooth_smps_counts = hf.smooth_lists(smps_counts, window_length=7, polyorder=2)
+        if smooth_ccnc_counts is None:
+            smooth_ccnc_counts = hf.smooth_lists(ccnc_counts, window_length=7, polyorder=2)
+        self.smooth_smps_counts = smooth_smps_counts
+        self.smooth_ccnc_counts = smooth_ccnc_counts
+        self.smps_lengths = np.array([len(counts) for counts in smps_counts], dtype=np.intp)
+        self.ccnc_lengths = np.array([len(counts) for counts in ccnc_counts], dtype=np.intp)
+        self.smooth_smps_matrix = self.get_matrix(smooth_smps_counts)
+        self.smooth_ccnc_matrix = self.get_matrix(smooth_ccnc_counts)
+        # The counts are never negative, so there is data if any count is not zero
+        has_data = np.array([np.any(smps) and np.any(ccnc) for smps, ccnc in zip(smps_counts, ccnc_counts)],
+                            dtype=bool)
+        all_finite = np.ones(len(smps_counts), dtype=bool)
+        for matrix, lengths in ((self.smooth_smps_matrix, self.smps_lengths),
+                                (self.smooth_ccnc_matrix, self.ccnc_lengths)):
+            # The padding is the only -inf
+            all_finite &= np.isfinite(matrix).sum(axis=1) == lengths
+        self.batched = has_data & (self.smps_lengths <= self.ccnc_lengths) & all_finite
+        # The SMPS ranges must not be empty
+        self.batched &= (self.scan_up_times > 0) & (self.scan_up_times < self.smps_lengths)
+        self.smps_peaks = None
+        self.search_counts = None
+        self.cost_curves = None
+
+    @staticmethod
+    def get_matrix(a_lists):
+        """
+        Pads lists with -inf into a matrix with a row for each list.
+
+        :param list[ndarray] a_lists: The lists
+        :return: The matrix of shape (lists, longest list)
+        :rtype: ndarray
+        """
+        width = max([len(a_list) for a_list in a_lists] + [0])
+        matrix = np.full((len(a_lists), width), -np.inf)
+        for i, a_list in enumerate(a_lists):
+            matrix[i, :len(a_list)] = a_list
+        return matrix
+
+    @staticmethod
+    def get_peaks(matrix, starts, ends):
+        """
+        Finds the index of the largest value of each row between its start and end, the same as argmax of the
+        slice of each row.
+
+        :param ndarray matrix: The matrix of shape (rows, values)
+        :param ndarray starts: The first index searched in each row
+        :param ndarray ends: The index after the last index searched in each row
+        :return: The index of the peak of each row
+        :rtype: ndarray
+        """
+        columns = np.arange(matrix.shape[1])
+        in_range = (columns >= starts[:, np.newaxis]) & (columns < ends[:, np.newaxis])
+        return np.argmax(np.where(in_range, matrix, -np.inf), axis=1)
+
+    def get_smps_peaks(self):
+        """
+        Returns the first and next SMPS peak of each scan, as found by :class:`~auto_shift.get_auto_shift`.
+
+        :return: The first peaks and the next peaks
+        :rtype: (ndarray, ndarray)
+        """
+        if self.smps_peaks is None:
+            up_times = self.scan_up_times
+            first_peaks = self.get_peaks(self.smooth_smps_matrix, np.zeros_like(up_times),
+                                         np.minimum(up_times, self.smps_lengths))
+            next_peaks = self.get_peaks(self.smooth_smps_matrix, up_times, self.smps_lengths)
+            self.smps_peaks = (first_peaks, next_peaks)
+        return self.smps_peaks
+
+    def get_shifts(self, median_shift, executor=None, num_workers=1, progress=None, band=None, curves=None):
+        """
+        Determines the shift value of each scan (see :class:`~auto_shift.get_auto_shift`).  The number of shifts
+        searched in each scan is kept in search_counts and the cost curve of each scan in cost_curves.
+
+        If an executor is given, the scans are split into chunks that are aligned in the executor, such as a
+        `concurrent.futures.ProcessPoolExecutor`.  The shifts and messages are collected in scan order and are the
+        same as aligning the scans one after another.
+
+        :param int median_shift: The median shift
+        :param concurrent.futures.Executor executor: Aligns the chunks of scans.  If None, the scans are aligned one
+                                                     after another.
+        :param int num_workers: The number of workers of the executor.  Each worker is given
+                                :class:`~constants.AUTO_SHIFT_CHUNKS_PER_WORKER` chunks.
+        :param function progress: Called with the percent of the scans aligned, at most once per percent
+        :param int band: If given, only the shifts around the median shift are searched in each scan
+                         (see :class:`~auto_shift.search_shift_from_peaks`)
+        :param list[ShiftCostCurve] curves: The cost curve of an earlier search of each scan, such as the cost_curves
+                                            of an earlier pass, whose areas are reused where the peaks are the same.
+                                            None for the scans without one.
+        :return: The shift value of each scan and the error messages of each scan
+        :rtype: (list[int], list[list[str]])
+        """
+        up_times = self.scan_up_times
+        # The CCNC ranges must not be empty.  get_auto_shift handles the rest.
+        first_ends = np.minimum(median_shift + up_times, self.ccnc_lengths)
+        batched = self.batched & (median_shift >= 0) & (median_shift < first_ends)
+        batched &= median_shift + up_times < self.ccnc_lengths
+        smps_first_peaks, smps_next_peaks = self.get_smps_peaks()
+        ccnc_first_peaks = self.get_peaks(self.smooth_ccnc_matrix, np.full_like(up_times, median_shift), first_ends)
+        ccnc_next_peaks = self.get_peaks(self.smooth_ccnc_matrix, median_shift + up_times, self.ccnc_lengths)
+        scans = []
+        for i in range(len(self.smps_counts)):
+            if batched[i]:
+                peaks = (smps_first_peaks[i], smps_next_peaks[i], ccnc_first_peaks[i], ccnc_next_peaks[i])
+            else:
+                peaks = None
+            curve = curves[i] if curves is not None else None
+            scans.append((self.smps_counts[i], self.ccnc_counts[i], int(up_times[i]), median_shift,
+                          self.smooth_smps_counts[i], self.smooth_ccnc_counts[i], peaks, band, curve))
+        if executor is None:
+            chunk_size = max(1, len(scans) // 100)
+        else:
+            num_chunks = num_workers * const.AUTO_SHIFT_CHUNKS_PER_WORKER
+            chunk_size = max(1, -(-len(scans) // num_chunks))
+        chunks = [scans[start:start + chunk_size] for start in range(0, len(scans), chunk_size)]
+        results = [None] * len(chunks)
+        progress_queue = ProgressQueue(len(scans), progress)
+        if executor is None:
+            for index, chunk in enumerate(chunks):
+                results[index] = get_shifts_of_scans(chunk)
+                progress_queue.put(len(chunk))
+        else:
+            futures = {executor.submit(get_shifts_of_scans, chunk): index for index, chunk in enumerate(chunks)}
+            # The chunks are reported as they finish, but kept in scan order
+            for future in concurrent.futures.as_completed(futures):
+                index = futures[future]
+                results[index] = future.result()
+                progress_queue.put(len(chunks[index]))
+        shifts = []
+        error_messages = []
+        self.search_counts = []
+        self.cost_curves = []
+        for chunk_results in results:
+            for shift, err_msg, search_count, curve in chunk_results:
+                shifts.append(shift)
+                error_messages.append(err_msg)
+                self.search_counts.append(search_count)
+                self.cost_curves.append(curve)
+        return shifts, error_messages
+
+
+def get_shifts_of_scans(scans):
+    """
+    Determines the shift values of a chunk of scans for :class:`~auto_shift.AutoShiftBatch.get_shifts`.  This is a
+    module function so the chunk can be sent to another process.
+
+    :param list[tuple] scans: The SMPS counts, CCNC counts, scan up time, median shift, smoothed SMPS counts,
+                              smoothed CCNC counts, peaks, search band and earlier cost curve of each scan.  If the
+                              peaks are None, the scan is left to :class:`~auto_shift.get_auto_shift`.
+    :return: The shift value, the error messages, the number of shifts searched out of the number of shifts and the
+             cost curve of each scan.  The number of shifts and the curve are None for the scans left to
+             get_auto_shift.
+    :rtype: list[(int, list[str], (int, int)|None, ShiftCostCurve|None)]
+    """
+    results = []
+    for (smps_count, ccnc_count, scan_up_time, median_shift, smooth_smps_count, smooth_ccnc_count, peaks, band,
+         curve) in scans:
+        if peaks is None:
+            shift, err_msg = get_auto_shift(smps_count, ccnc_count, scan_up_time, median_shift, smooth_smps_count,
+                                            smooth_ccnc_count)
+            results.append((shift, err_msg, None, None))
+        else:
+            shift, err_msg, num_searched, num_shifts, curve = search_shift_from_peaks(
+                smooth_smps_count, smooth_ccnc_count, *peaks, median_shift=median_shift, band=band, curve=curve)
+            results.append((shift, err_msg, (num_searched, num_shifts), curve))
+    return results
+
+
+class ProgressQueue(object):
+    """
+    Collects the number of finished items and reports the percent finished.  The report is throttled to once per
+    percent, so a progress bar is not repainted for every item.
+
+    :param int total: The number of items
+    :param function progress: Called with the percent finished.  If None, nothing is reported.
+    """
+    def __init__(self, total, progress=None):
+        self.total = total
+        self.progress = progress
+        self.finished = 0
+        self.reported = -1
+
+    def put(self, num_finished):
+        """
+        Adds finished items and reports the percent finished if it changed.
+
+        :param int num_finished: The number of items that finished
+        """
+        self.finished += num_finished
+        percent = 100 * self.finished // max(self.total, 1)
+        if self.progress is not None and percent != self.reported:
+            self.reported = percent
+            self.progress(percent)
@@ -24,8 +24,10 @@ def find_derv_peaks(a_scan):
     :param Scan a_scan:
     """
     # TODO issues/64  Probably unneccessary after Dataframe switchover
-    df = pd.DataFrame({"ave_smps_diameters": a_scan.ave_smps_diameters,
-                       "log_ave_smps_diameters": np.log(a_scan.ave_smps_diameters),
+    # The diameters can be float32 when the scans are stored compactly
+    ave_smps_diameters = np.asarray(a_scan.ave_smps_diameters, dtype=np.float64)
+    df = pd.DataFrame({"ave_smps_diameters": ave_smps_diameters,
+                       "log_ave_smps_diameters": np.log(ave_smps_diameters),
                        "corrected_ccnc_counts": a_scan.corrected_ccnc_counts,
                        "corrected_smps_counts": a_scan.corrected_smps_counts,
                        "corr_cs_ratio":
@@ -6,6 +6,45 @@ Constants used throughout the program.
 BIN_SIZES = [0.625, 0.875, 1.25, 1.75, 2.25, 2.75, 3.25, 3.75, 4.25, 4.75, 5.25, 5.75, 6.25, 6.75, 7.25,
              7.75, 8.25, 8.75, 9.25, 9.75]
 
+#: Column of the time in a row of the CCNC file (after the empty cells are removed)
+CCNC_TIME_COLUMN = 0
+
+#: Column of the current supersaturation in a row of the CCNC file
+CCNC_SUPER_SAT_COLUMN = 1
+
+#: Column of the T1 reading in a row of the CCNC file
+CCNC_T1_COLUMN = 5
+
+#: Column of the T2 reading in a row of the CCNC file
+CCNC_T2_COLUMN = 7
+
+#: Column of the T3 reading in a row of the CCNC file
+CCNC_T3_COLUMN = 9
+
+#: Column of the sample flow in a row of the CCNC file
+CCNC_SAMPLE_FLOW_COLUMN = 17
+
+#: Column of the first of the 20 bins in a row of the CCNC file
+CCNC_FIRST_BIN_COLUMN = 25
+
+#: Column of the CCN number concentration in a row of the CCNC file.  Counted from the end of the row.
+CCNC_COUNT_COLUMN = -3
+
+#: Names of the float columns created when a CCNC file is parsed
+CCNC_FLOAT_COLUMNS = ("super_sat", "T1", "T2", "T3", "sample_flow", "ccnc_count")
+
+#: The number of CCNC files at which the files are parsed in a process pool instead of one after another
+CCNC_PARALLEL_FILE_THRESHOLD = 8
+
+#: The number of lines of a SMPS data block that are copied out of the memory mapped file and decoded at a time
+SMPS_DECODE_CHUNK_LINES = 4096
+
+#: The folder, inside the data folder, where the parsed data files are cached
+PARSE_CACHE_FOLDER = ".chemics_cache"
+
+#: The version of the parse cache.  Increase when the parsed arrays change so that old caches are not used.
+PARSE_CACHE_VERSION = 3
+
 # RESEARCH Use of this may go away when sigmoid calculation is reviewed
 #: Very small number used to resolve zeros
 EPSILON = 0.000001
@@ -21,6 +60,12 @@ HIGH_SMPS_WEIGHT = 1
 # is greater, is multipled by this weight.  This value was determined empirically.
 HIGH_CCNC_WEIGHT = 2.2
 
+#: The number of scans at which the scans are aligned in a process pool instead of one after another
+AUTO_SHIFT_PARALLEL_SCAN_THRESHOLD = 100
+
+#: The number of chunks of scans given to each process when the scans are aligned in a process pool
+AUTO_SHIFT_CHUNKS_PER_WORKER = 4
+
 #: # REVIEW Documentation
 SIGMOID_MIN_DIAMETER = 9.0
 
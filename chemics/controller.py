@@ -2,6 +2,8 @@
 This class handles most of the programs actions.
 """
 # External Packages
+import concurrent.futures
+import copy
 import datetime as dt
 from io import StringIO
 import logging
@@ -10,7 +12,6 @@ import numpy as np
 import os
 import pandas as pd
 import pickle
-import re
 import time
 
 # Internal Packages
@@ -32,11 +33,32 @@ class Controller(object):
     Stores the following variables:
 
     - **scans**: A list of all scans
+    - **scan_store**: The data of all the scans (see :class:`~scan.ScanStore`)
     - **counts_to_conc_conv**:
     - **data_files**:
-    - **ccnc_data**: Data from the Cloud Condensation Nuclei Counter
-    - **smps_data**: Data from the Scanning Mobility Particle Sizer
+    - **ccnc_data**: Data from the Cloud Condensation Nuclei Counter as typed columns
+      (see :class:`~helper_functions.ccnc_rows_to_columns`) with the timestamp of each row
+      (see :class:`~helper_functions.merge_ccnc_columns`)
+    - **smps_data**: Data from the Scanning Mobility Particle Sizer as numpy arrays
+      (see :class:`~helper_functions.process_smps_file`)
+    - **data_file_keys**: The content hashed key of each data file, so the data tables can be read again once they
+      are released (see :class:`~controller.Controller.load_data_tables`)
+    - **use_parse_cache**: Whether the parsed data files are cached next to the data files
+    - **compact_storage**: Whether the raw and processed data of the scans is stored as float32
+      (see :class:`~scan.ScanStore`)
+    - **align_max_workers**: The number of processes used to align the scans.  If None, the number of CPUs is used.
+      Use 1 to align the scans one after another.
+    - **align_search_band**: The number of shifts on each side of the median shift searched at first in the second
+      pass of the auto alignment.  If None, every shift is searched (see :class:`~auto_shift.search_shift_band`).
+    - **lean_memory**: Whether the data tables (ccnc_data and smps_data) are released once the scans are created
+      (see :class:`~controller.Controller.release_data_tables`)
+    - **ccnc_tail_reader**: Follows the CCNC files while they are being written
+      (see :class:`~helper_functions.CcncTailReader`)
     - **experiment_date**: The date of experiment
+    - **scan_time_index**: The time span of each scan in seconds since the epoch
+      (see :class:`~helper_functions.IntervalIndex`)
+    - **scan_similarity**: The comparisons of the raw SMPS distributions of the scans
+      (see :class:`~scan.ScanSimilarity`)
     - **smooth_method**: The smoothing method
     - **base_shift_factor**: The base shift factor. Very useful for auto alignment.
     - **curr_scan_index**: Index of the current scan
@@ -72,10 +94,15 @@ class Controller(object):
         self.counts_to_conc_conv = None
         # Variables set with set_attributes_default method
         self.scans = None
+        self.scan_store = None
         self.data_files = None
         self.ccnc_data = None
         self.smps_data = None
+        self.data_file_keys = None
+        self.ccnc_tail_reader = None
         self.experiment_date = None
+        self.scan_time_index = None
+        self.scan_similarity = None
         self.scan_duration = None
         self.base_shift_factor = None
         self.curr_scan_index = None
@@ -84,6 +111,11 @@ class Controller(object):
         self.stage = "init"
         self.save_name = None
         self.project_folder = None
+        self.use_parse_cache = True
+        self.compact_storage = False
+        self.lean_memory = False
+        self.align_max_workers = None
+        self.align_search_band = None
         # variables for calculating kappa
         # QUESTION What can be constants?
         self.sigma = 0.072
@@ -114,12 +146,17 @@ class Controller(object):
         """
         # DOCQUESTION What can be constants?
         self.scans = []
+        self.scan_store = None
         self.counts_to_conc_conv = 0
         self.cpc_sample_flow = 0.5
         self.data_files = None
         self.ccnc_data = None
         self.smps_data = None
+        self.data_file_keys = None
+        self.ccnc_tail_reader = None
         self.experiment_date = None
+        self.scan_time_index = None
+        self.scan_similarity = None
         self.base_shift_factor = 0
         self.curr_scan_index = 0
         self.b_limits = [0.5, 1.5]
@@ -170,6 +207,9 @@ class Controller(object):
         self.do_basic_trans()
         self.view.update_progress_bar(95)
         self.pre_align_sanity_check()
+        # Nothing reads the data tables once the scans are created
+        if self.lean_memory:
+            self.release_data_tables()
         self.view.update_progress_bar(100)
         self.view.close_progress_bar()
         # Update the experiment info in the view
@@ -181,39 +221,173 @@ class Controller(object):
 
     def auto_align_scans(self):
         """
-        # REVIEW Documentation
+        Finds the shift factor of every scan and applies them.  The first pass finds the shift factors without a
+        median shift to get the median shift, and the second pass finds them again around the median shift.  Both
+        passes use one :class:`~auto_shift.AutoShiftBatch`, so the counts are smoothed and the SMPS peaks are found
+        once for all the scans.
 
-        :return:
-        :rtype:
+        If there are at least :class:`~constants.AUTO_SHIFT_PARALLEL_SCAN_THRESHOLD` scans, both passes are run in one
+        process pool of align_max_workers processes.  The shift factors are the same as aligning the scans one after
+        another.
+
+        The cost curve of each scan is kept on the scan (see :class:`~auto_shift.ShiftCostCurve`), so the next best
+        shift factors can be found (see :class:`~controller.Controller.get_best_shift_factors`) and the scans can be
+        aligned again around another median shift without searching the same shifts again
+        (see :class:`~controller.Controller.realign_scans`).
         """
         self.view.init_progress_bar("Aligning SMPS and CCNC data...")
-        # Find the median shift factor of unadjusted shifts to get a general idea of the shift
-        shift_factors = []
-        for i in range(len(self.scans)):
-            self.view.update_progress_bar(100 * (i + 1) // len(self.scans) // 2)
-            a_scan = self.scans[i]
-            shift_factors.append(auto_shift.get_auto_shift(a_scan.raw_smps_counts,
-                                                           a_scan.raw_ccnc_counts,
-                                                           a_scan.scan_up_time, 0)[0])
-        median_shift = sorted(shift_factors)[(len(shift_factors) + 1) // 2]
+        batch = self.get_auto_shift_batch()
+        num_workers = min(self.align_max_workers or os.cpu_count() or 1, len(self.scans))
+        if num_workers > 1 and len(self.scans) >= const.AUTO_SHIFT_PARALLEL_SCAN_THRESHOLD:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=num_workers) as executor:
+                shift_factors, err_msgs = self.find_shift_factors(batch, executor, num_workers)
+        else:
+            shift_factors, err_msgs = self.find_shift_factors(batch)
+        self.apply_auto_shifts(batch, shift_factors, err_msgs)
+        self.view.close_progress_bar()
+        self.post_align_sanity_check()
+        self.switch_to_scan(0)
 
-        # Using the approximate median shift factor, find actual shift values.
-        for i in range(len(self.scans)):
-            self.view.update_progress_bar(50 + (100 * (i + 1) // len(self.scans) // 2))
-            a_scan = self.scans[i]
-            shift_factor, err_msg = auto_shift.get_auto_shift(a_scan.raw_smps_counts,
-                                                              a_scan.raw_ccnc_counts,
-                                                              a_scan.scan_up_time,
-                                                              median_shift)
+    def realign_scans(self, median_shift):
+        """
+        Aligns the scans again around a new median shift, as the second pass of
+        :class:`~controller.Controller.auto_align_scans`.  The cost curves kept on the scans are reused, so only the
+        shifts that were not searched with the same peaks before are searched.
+
+        :param int median_shift: The median shift the shifts are searched around
+        """
+        self.view.init_progress_bar("Aligning SMPS and CCNC data...")
+        batch = self.get_auto_shift_batch()
+        shift_factors, err_msgs = batch.get_shifts(median_shift, progress=self.view.update_progress_bar,
+                                                   band=self.align_search_band,
+                                                   curves=[a_scan.shift_cost_curve for a_scan in self.scans])
+        self.apply_auto_shifts(batch, shift_factors, err_msgs)
+        self.view.close_progress_bar()
+        self.post_align_sanity_check()
+        self.switch_to_scan(self.curr_scan_index)
+
+    def get_auto_shift_batch(self):
+        """
+        Creates the :class:`~auto_shift.AutoShiftBatch` of all the scans, with their counts smoothed through the scan
+        store.
+
+        :return: The scans to align
+        :rtype: AutoShiftBatch
+        """
+        # Smooth the counts of all the scans once for all the passes
+        rows = [a_scan.row for a_scan in self.scans]
+        smooth_smps_counts = self.scan_store.smooth_rows("raw_smps_counts", rows, window_length=7, polyorder=2)
+        smooth_ccnc_counts = self.scan_store.smooth_rows("raw_ccnc_counts", rows, window_length=7, polyorder=2)
+        return auto_shift.AutoShiftBatch([a_scan.raw_smps_counts for a_scan in self.scans],
+                                         [a_scan.raw_ccnc_counts for a_scan in self.scans],
+                                         [a_scan.scan_up_time for a_scan in self.scans],
+                                         smooth_smps_counts, smooth_ccnc_counts)
+
+    def apply_auto_shifts(self, batch, shift_factors, err_msgs):
+        """
+        Logs the error messages of the auto alignment, applies the shift factors to the scans and keeps the cost
+        curve of each scan on the scan.
+
+        :param AutoShiftBatch batch: The aligned scans
+        :param list[int] shift_factors: The shift factor of each scan
+        :param list[list[str]] err_msgs: The error messages of each scan
+        """
+        for i, err_msg in enumerate(err_msgs):
             for index, value in enumerate(err_msg):
                 if index == 0:
                     logger.warning("get_auto_shift error on scan: " + str(i))
                 logger.warning("    (%d) %s" % (index, value))
-            self.scans[i].set_shift_factor(shift_factor + 1)    # Edit adding + 1 to shift_factor
-            self.scans[i].generate_processed_data()
-        self.view.close_progress_bar()
-        self.post_align_sanity_check()
-        self.switch_to_scan(0)
+        shift_factors = [shift_factor + 1 for shift_factor in shift_factors]  # Edit adding + 1 to shift_factor
+        # Apply the shift factors to all the scans at once
+        scan.apply_shift_factors(self.scans, shift_factors)
+        for a_scan, curve in zip(self.scans, batch.cost_curves):
+            a_scan.shift_cost_curve = curve
+
+    def find_shift_factors(self, batch, executor=None, num_workers=1):
+        """
+        Runs both passes of the auto alignment (see :class:`~controller.Controller.auto_align_scans`) and shows their
+        progress.  The second pass reuses the cost curves of the first pass where the peaks are the same.
+
+        :param AutoShiftBatch batch: The scans to align
+        :param concurrent.futures.Executor executor: Aligns the scans in chunks.  If None, the scans are aligned one
+                                                     after another.
+        :param int num_workers: The number of workers of the executor
+        :return: The shift factor and the error messages of each scan from the second pass
+        :rtype: (list[int], list[list[str]])
+        """
+        # Find the median shift factor of unadjusted shifts to get a general idea of the shift
+        shift_factors = batch.get_shifts(0, executor, num_workers,
+                                         lambda percent: self.view.update_progress_bar(percent // 2))[0]
+        median_shift = sorted(shift_factors)[(len(shift_factors) + 1) // 2]
+
+        # Using the approximate median shift factor, find actual shift values.
+        shift_factors, err_msgs = batch.get_shifts(median_shift, executor, num_workers,
+                                                   lambda percent: self.view.update_progress_bar(50 + percent // 2),
+                                                   self.align_search_band, batch.cost_curves)
+        # Log the number of shifts searched to compare the search band with searching every shift
+        num_searched = 0
+        num_shifts = 0
+        for i, search_count in enumerate(batch.search_counts):
+            if search_count is not None:
+                logger.debug("Auto alignment searched %d of %d shifts on scan: %d" % (search_count + (i,)))
+                num_searched += search_count[0]
+                num_shifts += search_count[1]
+        logger.info("Auto alignment searched %d of %d shifts (band: %s)"
+                    % (num_searched, num_shifts, self.align_search_band))
+        return shift_factors, err_msgs
+
+    def get_shift_cost_curve(self, scan_index):
+        """
+        Returns the cost curve of a scan from the auto alignment as shift factors, so it can be shown with the shift
+        factor of the scan.
+
+        :param int scan_index: The index of the scan
+        :return: The shift factor of each searched shift and its area, or None if the scan was not auto aligned
+        :rtype: (ndarray, ndarray)|None
+        """
+        curve = self.scans[scan_index].shift_cost_curve
+        if curve is None:
+            return None
+        # The shift factors are one more than the shifts (see Controller#apply_auto_shifts)
+        return curve.get_shifts()[curve.searched] + 1, curve.areas[curve.searched]
+
+    def get_best_shift_factors(self, scan_index, count=3):
+        """
+        Returns the best shift factors of a scan from its cost curve, from the least area to the greatest
+        (see :class:`~auto_shift.ShiftCostCurve.get_best_shifts`).  The first is the shift factor the auto alignment
+        chose, so the next ones can be jumped to without searching the shifts again.
+
+        :param int scan_index: The index of the scan
+        :param int count: The number of shift factors returned at most
+        :return: The best shift factors, or an empty list if the scan was not auto aligned
+        :rtype: list[int]
+        """
+        curve = self.scans[scan_index].shift_cost_curve
+        if curve is None:
+            return []
+        return [shift + 1 for shift in curve.get_best_shifts(count)]
+
+    def export_kappa_precision_report(self, export_filename):
+        """
+        Export the kappa precision report (see :class:`~controller.Controller.get_kappa_precision_report`) to csv.
+
+        :param str export_filename: The file name to export the file to
+        """
+        try:
+            report = self.get_kappa_precision_report()
+        except IOError as e:
+            logger.warning("Unable to read the data files again (%s)" % str(e))
+            self.view.show_information_message(title="Export Precision Report", text="Export failed",
+                                               subtext=str(e))
+            return
+        other_mode = "float64" if self.compact_storage else "float32"
+        df = pd.DataFrame(report["points"],
+                          columns=["Scan Index", "dp(nm)", "K/app", "K/app (" + other_mode + ")", "Difference"])
+        df.to_csv(export_filename, index=False)
+        subtext = "Largest difference: %g (relative: %g), unmatched points: %d" \
+                  % (report["max_difference"], report["max_relative_difference"], report["unmatched"])
+        self.view.show_information_message(title="Export Precision Report",
+                                           text="Export to " + export_filename + " successful!", subtext=subtext)
 
     def export_scans(self, filename):
         """
@@ -267,6 +441,7 @@ class Controller(object):
             try:
                 sigmoid_fit.get_sigmoid_info(a_scan)
                 a_scan.sigmoid_status = True
+                a_scan.set_stage_done("sigmoid")
             except NotImplementedError as e:
                 a_scan.sigmoid_status = False
                 logger.warning("Scan: %d - NotImplementedError: %s" % (scan_index, str(e)))
@@ -302,6 +477,8 @@ class Controller(object):
         # asc = (exp(sqrt(4 * a_param ** 3 / (27 * self.i_kappa_1 * (self.dd_1 * 0.000000001) ** 3))) - 1) * 100
         # Calculate each kappa
         ss_and_dps = []
+        # Calculate the activation of the scans without one at once
+        scan.get_activations(self.scans)
         for i in range(len(self.scans)):
             a_scan = self.scans[i]
             if not a_scan.is_valid() or a_scan.true_super_sat is None:
@@ -348,6 +525,61 @@ class Controller(object):
                                                    analytic_kappa, deviation_percentage]])
             # REVIEW kset set value kappa points key, value = true
             self.valid_kappa_points[(scan_index, dp_50, ss, activation)] = True
+        for a_scan in self.scans:
+            a_scan.set_stage_done("kappa")
+
+    def refresh_kappa_values(self):
+        """
+        Calculates the kappa values again if the kappa points of any scan are stale (see
+        :class:`~scan.Scan.invalidate`).  Used before the kappa values are shown or exported.
+        """
+        # COMBAKL Kappa
+        if any(a_scan.get_stale_stages("kappa") for a_scan in self.scans):
+            for i in range(len(self.scans)):
+                self.refresh_scan(i, "sigmoid")
+            self.calculate_all_kappa_values()
+            self.calculate_average_kappa_values()
+
+    def get_kappa_precision_report(self):
+        """
+        Compares the kappa values of the project with the kappa values of the same scans stored in the other storage
+        mode (see compact_storage).  The data tables are read again (see
+        :class:`~controller.Controller.load_data_tables`) into scans of the other mode, which are given the shift
+        factor, status and supersaturation of the scans of the project.  The stages computed for each scan of the
+        project are then computed for its copy, with the sigmoid lines fitted automatically, and the kappa values are
+        calculated the same way.
+
+        :return: The report (see :class:`~helper_functions.kappa_precision_report`)
+        :rtype: dict
+        :raises IOError: If a data file is missing or has changed
+        """
+        self.refresh_kappa_values()
+        self.load_data_tables()
+        other = copy.copy(self)
+        other.compact_storage = not self.compact_storage
+        other.kappa_calculate_dict = {}
+        other.valid_kappa_points = {}
+        other.scans = []
+        other.create_scans()
+        other.get_normalized_concentration()
+        other.get_smps_counts()
+        other.get_ccnc_counts()
+        other.do_basic_trans()
+        for i, (a_scan, other_scan) in enumerate(zip(self.scans, other.scans)):
+            other_scan.set_shift_factor(a_scan.shift_factor)
+            other_scan.generate_processed_data()
+            other_scan.status = a_scan.status
+            other_scan.status_code = a_scan.status_code
+            other_scan.true_super_sat = a_scan.true_super_sat
+            if "corrected" in a_scan.computed_stages:
+                other_scan.correct_charges()
+            if "sigmoid" in a_scan.computed_stages:
+                other.auto_fit_one_sigmoid(i)
+        if len(self.kappa_calculate_dict) > 0:
+            other.calculate_all_kappa_values()
+        if self.lean_memory:
+            self.release_data_tables()
+        return hf.kappa_precision_report(self.kappa_calculate_dict, other.kappa_calculate_dict)
 
     def calculate_average_kappa_values(self):
         """
@@ -393,14 +625,35 @@ class Controller(object):
         Takes the list of data_files stored in the controller and determines:
 
         - self.experiment_date from the first ccnc file record
-        - ccnc_data from the csv file(s)
-        - smps_data from the txt file
+        - ccnc_data from the csv file(s) as typed columns
+        - smps_data from the memory mapped txt file
         - Sets the counts_to_conc_conv value by finding the CPC Sample Flow(lpm) value
         from the SMPS file and performs the following conversion to convert the liter per
         minute measure into a second per CC value.
 
         (1 minute / "CPC Sample Flow" L)  *  (60 seconds / 1 minute)  *  (1 L / 1000 cc)
 
+        If use_parse_cache is set, files that have not changed since they were last parsed are loaded from their
+        parse cache (see :class:`~helper_functions.load_parse_cache`).
+        """
+        self.read_data_files()
+
+        # Obtain data that is consistant across scans
+        # Determine scan duration which is the sum of the scan up time and the retrace time.
+        # -- Use the first scan's values  # DOCQUESTION Assume ALWAYS the same?
+        metadata = self.smps_data["metadata"]
+        self.scan_up_time = int(metadata["scanuptime(s)"][0])
+        self.scan_down_time = int(metadata["retracetime(s)"][0])  # this is the retrace time
+        self.cpc_sample_flow = float(metadata["cpcsampleflow(lpm)"][0])
+        # DOCQUESTION Which leads to always assuming this is same
+        self.scan_duration = self.scan_up_time + self.scan_down_time
+        self.counts_to_conc_conv = (1.0/self.cpc_sample_flow) * (3/50)
+
+    def read_data_files(self):
+        """
+        Reads the data_files stored in the controller into the experiment_date, ccnc_data and smps_data
+        (see :class:`~controller.Controller.parse_files`).  The section index of the SMPS file is only used to read it
+        and is not kept.
         """
         ccnc_csv_files = []  # Should be hourly files  # TODO issues/25 Add error handling
         smps_txt_files = []  # Should be one file  # TODO issues/25 Add error handling
@@ -415,27 +668,78 @@ class Controller(object):
         smps_txt_files = [str(x) for x in smps_txt_files]
         # Turn smps to a str instead of a list - Assumes only one file
         smps_txt_files = smps_txt_files[0]
-        self.experiment_date, self.ccnc_data = hf.process_csv_files(ccnc_csv_files)
-        self.smps_data = hf.process_tab_sep_files(smps_txt_files)
+        self.experiment_date, self.ccnc_data = hf.process_ccnc_csv_files(ccnc_csv_files,
+                                                                          use_cache=self.use_parse_cache)
+        if self.use_parse_cache:
+            self.smps_data = hf.load_cached_smps_file(smps_txt_files)[1]
+            for folder in set(os.path.dirname(os.path.abspath(x)) for x in ccnc_csv_files + [smps_txt_files]):
+                hf.evict_parse_cache(folder)
+        else:
+            self.smps_data = hf.process_smps_file(smps_txt_files)[1]
 
-        # Obtain data that is consistant across scans
-        # Determine scan duration which is the sum of the scan up time and the retrace time.
-        # -- Find first scan up time  # DOCQUESTION Assume ALWAYS the same?
-        for i in range(len(self.smps_data)):
-            if ''.join(self.smps_data[i][0].split()).lower() == "scanuptime(s)":
-                self.scan_up_time = int(self.smps_data[i][1])
-                self.scan_down_time = int(self.smps_data[i + 1][1])  # this is the retrace time
-                self.cpc_sample_flow = float(self.smps_data[i + 8][1])
-                break
-        # DOCQUESTION Which leads to always assuming this is same
-        self.scan_duration = self.scan_up_time + self.scan_down_time
-        self.counts_to_conc_conv = (1.0/self.cpc_sample_flow) * (3/50)
+    def poll_ccnc_files(self):
+        """
+        Reads the rows appended to the CCNC csv files since they were last polled and updates ccnc_data and the
+        experiment_date.  The first poll reads the files from the top.  This is used while the CCNC is still writing
+        its current hourly file, so the growing file does not have to be parsed again.
+
+        :return: The number of new CCNC rows
+        :rtype: int
+        """
+        if self.ccnc_tail_reader is None:
+            ccnc_csv_files = [str(x) for x in self.data_files if x.lower().endswith('.csv')]
+            self.ccnc_tail_reader = hf.CcncTailReader(ccnc_csv_files)
+        num_new_rows = self.ccnc_tail_reader.poll()
+        if num_new_rows > 0:
+            self.experiment_date = self.ccnc_tail_reader.date
+            self.ccnc_data = self.ccnc_tail_reader.columns
+        return num_new_rows
+
+    def hash_data_files(self):
+        """
+        Creates the data_file_keys from the data_files stored in the controller.  If a data file can not be read, a
+        warning is logged and there are no keys.
+        """
+        try:
+            self.data_file_keys = [hf.get_file_key(a_file) for a_file in self.data_files]
+        except OSError as e:
+            logger.warning("Unable to hash the data files (%s)" % str(e))
+            self.data_file_keys = None
+
+    def release_data_tables(self):
+        """
+        Releases the ccnc_data and smps_data to free their memory.  The data files are hashed first so the tables can
+        be read again with :class:`~controller.Controller.load_data_tables`.
+        """
+        if self.data_file_keys is None and self.data_files is not None:
+            self.hash_data_files()
+        self.ccnc_data = None
+        self.smps_data = None
+
+    def load_data_tables(self):
+        """
+        Reads the data tables again if they were released (see :class:`~controller.Controller.release_data_tables`).
+        The data files are only read if they are unchanged since they were hashed
+        (see :class:`~helper_functions.file_matches_key`).
+
+        :raises IOError: If a data file is missing or has changed
+        """
+        if self.ccnc_data is not None and self.smps_data is not None:
+            return
+        if self.data_files is None or self.data_file_keys is None:
+            raise IOError("The data files of the project are unknown")
+        for a_file, key in zip(self.data_files, self.data_file_keys):
+            if not hf.file_matches_key(a_file, key):
+                raise IOError("The data file %s is missing or has changed" % a_file)
+        self.read_data_files()
 
     def create_scans(self):
         """
         Creates the scans objects and updates via the following scan methods:
 
-        - :class:`~scan.Scan.set_start_time` From the SMPS file
+        - :class:`~scan.Scan.set_start_time` From the SMPS file.  The date of the scan is used if the SMPS file has
+          it.  Otherwise the scans start on the day of the first CCNC row
+          (see :class:`~helper_functions.smps_timestamps`)
         - :class:`~scan.Scan.set_end_time` Start time + Duration
         - :class:`~scan.Scan.set_up_time` From the SMPS file
         - :class:`~scan.Scan.set_down_time` From the SMPS file (retrace time)
@@ -444,15 +748,20 @@ class Controller(object):
         - :class:`~scan.Scan.set_cpc_sample_flow` from the SMPS file
         """
         # Get a list of all the start times
-        scan_start_times = self.smps_data[0]  # TODO issues/4 Affected by the changed to storing the AIM Scan #
+        # TODO issues/4 Affected by the changed to storing the AIM Scan #
+        first_ccnc_time = int(self.ccnc_data["timestamp"][0]) if len(self.ccnc_data["timestamp"]) > 0 else 0
+        scan_start_times = hf.smps_timestamps(self.smps_data["start_times"], self.smps_data["start_dates"],
+                                              first_ccnc_time - first_ccnc_time % 86400)
+        # The data of all the scans is kept in one store
+        self.scan_store = scan.ScanStore(len(scan_start_times), self.compact_storage)
         # For each scan time
         for i in range(len(scan_start_times)):
             # Create a scan object
-            a_scan = scan.Scan(i)
+            a_scan = scan.Scan(i, self.scan_store)
             # Add it to the scan list
             self.scans.append(a_scan)
             # Create time objects
-            start_time = dt.datetime.strptime(scan_start_times[i], "%H:%M:%S")
+            start_time = hf.timestamp_to_datetime(scan_start_times[i])
             end_time = start_time + dt.timedelta(seconds=self.scan_duration)
             # Set Scan values
             a_scan.set_start_time(start_time)
@@ -462,82 +771,64 @@ class Controller(object):
             a_scan.set_duration(self.scan_duration)
             a_scan.set_counts_2_conc(self.counts_to_conc_conv)
             a_scan.set_cpc_sample_flow(self.cpc_sample_flow)
+        self.index_scan_times()
+
+    def index_scan_times(self):
+        """
+        Creates the scan_time_index from the start and end time of each scan.
+        """
+        starts = [hf.datetime_to_timestamp(a_scan.start_time) for a_scan in self.scans]
+        ends = [hf.datetime_to_timestamp(a_scan.end_time) for a_scan in self.scans]
+        self.scan_time_index = hf.IntervalIndex(starts, ends)
+
+    def get_scans_between(self, start_time, end_time):
+        """
+        Finds the scans that overlap a time range, which can span several days.
+
+        :param datetime.datetime start_time: The start of the time range
+        :param datetime.datetime end_time: The end of the time range
+        :return: The index of each scan that overlaps the time range
+        :rtype: list[int]
+        """
+        if self.scan_time_index is None:
+            self.index_scan_times()
+        return self.scan_time_index.overlapping(hf.datetime_to_timestamp(start_time),
+                                                hf.datetime_to_timestamp(end_time)).tolist()
 
     def get_normalized_concentration(self):
         """
         Updates the scans objects via the following scan methods:
 
-            * :class:`~scan.Scan.add_to_diameter_midpoints`  The diameter midpoints
-            * :class:`~scan.Scan.add_to_raw_normalized_concs`  # RESEARCH In English?
+            * :class:`~scan.Scan.set_raw_normalized_concs`  The diameter midpoints and the dN/dlogDp values
+              # RESEARCH In English?
+
+        The dN/dlogDp matrix decoded in :class:`~controller.Controller.parse_files` is copied into the scan store at
+        once.  Every scan shares the same diameter midpoints array and holds a view of its row.
 
         Normalized flow_rate is also called dN/dLogDp, which is the notation used in the graph. For further information
         see `tsi documentation
         <https://www.tsi.com/getmedia/1621329b-f410-4dce-992b-e21e1584481a/PR-001-RevA_Aerosol-Statistics-AppNote?ext=.pdf>`_.
         """
         # DOCQUESTION Verify comment in docstring from original code is correction "Normalized...."
-        start_line_index = 1
-        end_line_index = 0
-        # Find the first line that is not a value.  This is the end of the range
-        for i in range(1, len(self.smps_data)):
-            if re.search('[a-zA-Z]', self.smps_data[i][0]):
-                end_line_index = i
-                break
-        # For each line in the range, get the diameter midpoints and add to each scan
-        for i in range(start_line_index, end_line_index):
-            for j in range(len(self.scans)):
-                a_scan = self.scans[j]
-                a_scan.add_to_diameter_midpoints(self.smps_data[i][0])  # RESEARCH efficiency of pulling same i times
-                a_scan.add_to_raw_normalized_concs(self.smps_data[i][j + 1])
+        diameter_midpoints = self.smps_data["diameter_midpoints"]
+        normalized_concs = self.smps_data["normalized_concs"]
+        self.scan_store.diameter_midpoints = diameter_midpoints
+        self.scan_store.set_all_values("raw_normalized_concs", normalized_concs.T)
 
     def get_smps_counts(self):
         """
         Updates the scans objects via the following scan methods:
 
-        * :class:`~scan.Scan.add_to_raw_smps_counts`  The SMPS Counts
-        * :class:`~scan.Scan.add_to_ave_smps_diameters`  The average SMPS diameters across all scans
-        """
-        #########################################
-        # Determine where data is in file
-        start_line_index = 0
-        end_line_index = len(self.smps_data) - 1  # DOCQUESTION - minus one to ignore the "Comments" line - but this ok?
-        # Find where second data section begins
-        for i in range(3, len(self.smps_data)):  # DOCQUESTION - why start with 3?
-            # Find beginning of middle text section
-            if re.search('[a-zA-Z]', self.smps_data[i][0]):
-                for j in range(i + 1, len(self.smps_data)):
-                    # Find end of middle text section
-                    if not re.search('[a-zA-Z]', self.smps_data[j][0]):
-                        start_line_index = j
-                        break
-                break
-        target_time = 1
-        curr_line_index = start_line_index
-        count_by_scans = [0] * len(self.scans)
-        sum_diameter = 0
-        #########################################
-        # Find values and update scans
+        * :class:`~scan.Scan.set_raw_smps_data`  The SMPS Counts and the average SMPS diameters across all scans
+
+        The counts of all the scans are summed per second at once by :class:`~helper_functions.sum_smps_seconds`.
+        """
+        smps_counts, ave_smps_diameters = hf.sum_smps_seconds(self.smps_data["raw_times"],
+                                                              self.smps_data["raw_diameters"],
+                                                              self.smps_data["raw_counts"])
         # DOCQUESTION Confirm calculations for ave_diamter are wrong
-        while True:
-            curr_time = float(self.smps_data[curr_line_index][0])
-            for j in range(0, len(self.scans)):
-                diameter = float(self.smps_data[curr_line_index][j * 2 + 1])
-                count = int(self.smps_data[curr_line_index][j * 2 + 2])
-                sum_diameter += diameter * count
-                count_by_scans[j] += count
-            if hf.are_floats_equal(curr_time, target_time) or curr_line_index == end_line_index:
-                target_time += 1
-                if sum(count_by_scans) == 0:
-                    ave_diameter = float(self.smps_data[curr_line_index][1])
-                else:
-                    ave_diameter = hf.safe_div(sum_diameter, sum(count_by_scans))
-                for j in range(0, len(self.scans)):
-                    self.scans[j].add_to_raw_smps_counts(count_by_scans[j])
-                    self.scans[j].add_to_ave_smps_diameters(ave_diameter)
-                count_by_scans = [0] * len(self.scans)
-                sum_diameter = 0
-            curr_line_index += 1
-            if curr_line_index >= end_line_index:
-                break
+        for j in range(len(self.scans)):
+            self.scans[j].set_raw_smps_data(smps_counts[:, j], ave_smps_diameters)
 
     def get_ccnc_counts(self):
         """
@@ -545,81 +836,74 @@ class Controller(object):
 
          * :class:`~scan.Scan.set_status` Based on status of scan  # REVIEW - Add reasons to documentation
          * :class:`~scan.Scan.set_status_code` Based on status of scan  # REVIEW - Add reasons to documentation
-         * :class:`~scan.Scan.add_to_raw_super_sats`  The supersaturation values
-         * :class:`~scan.Scan.add_to_raw_ccnc_counts`  The CCNC counts
-         * :class:`~scan.Scan.add_to_raw_ave_ccnc_sizes`  The average CCNC size
-         * :class:`~scan.Scan.add_to_raw_t1s_t2s_t3s`  The temperature values
+         * :class:`~scan.Scan.set_raw_ccnc_data`  The supersaturation, CCNC counts, average CCNC size and
+           temperature values
+
+         The values are sliced from the typed CCNC columns created in :class:`~controller.Controller.parse_files`.
          """
-        first_bin_column_index = 25
-        bin_sizes = const.BIN_SIZES
-        # Get the first position of CCNC count in the ccnc file
-        curr_scan = 0
-        curr_scan_start_time = self.scans[curr_scan].start_time
+        ccnc_times = self.ccnc_data["timestamp"]
+        num_ccnc_rows = len(ccnc_times)
+        bins = self.ccnc_data["bins"]
+        bin_sizes = np.asarray(const.BIN_SIZES)
+        # Values that are calculated from the bins of each row
+        # DOCQUESTION The sum only includes the first 19 bins.  Intended?
+        ccnc_count_sums = bins[:, :len(bin_sizes) - 1].sum(axis=1).astype(np.float64)
+        total_counts = bins.sum(axis=1)
+        total_sizes = bins.dot(bin_sizes)
+        ave_ccnc_sizes = np.zeros(num_ccnc_rows, dtype=np.float64)
+        np.divide(total_sizes, total_counts, out=ave_ccnc_sizes, where=total_counts != 0)
+        # The CCNC rows and the scan start times on the same time axis, in seconds since the epoch
+        scan_start_times = np.array([hf.datetime_to_timestamp(a_scan.start_time) for a_scan in self.scans],
+                                    dtype=np.int64)
+        # The first row at or after each scan start time
+        scan_start_rows = np.searchsorted(ccnc_times, scan_start_times)
+        # ccnc starts being in sync with smps at the first scan whose start time is a CCNC time
+        in_sync = scan_start_rows < num_ccnc_rows
+        in_sync[in_sync] = ccnc_times[scan_start_rows[in_sync]] == scan_start_times[in_sync]
+        if not in_sync.any():
+            logger.warning("No CCNC row matches the start time of any scan")
+            for a_scan in self.scans:
+                a_scan.set_status(0)
+                a_scan.set_status_code(1)  # RESEARCH 1 Status Code
+            return
+        curr_scan = int(np.argmax(in_sync))
+        # The scans before are not covered by the CCNC data
+        for a_scan in self.scans[:curr_scan]:
+            a_scan.set_status(0)
+            a_scan.set_status_code(1)  # RESEARCH 1 Status Code
         # the index at which ccnc data is in sync with smps data
-        ccnc_index = 0
-        while True:
-            curr_ccnc_time = dt.datetime.strptime(self.ccnc_data[ccnc_index][0], "%H:%M:%S")
-            if curr_ccnc_time > curr_scan_start_time:
-                self.scans[curr_scan].set_status(0)
-                self.scans[curr_scan].set_status_code(1)  # RESEARCH 1 Status Code
-                curr_scan += 1
-                curr_scan_start_time = self.scans[curr_scan].start_time
-            elif curr_ccnc_time < curr_scan_start_time:
-                ccnc_index += 1
-            else:  # the current ccnc_index is where ccnc starts being in sync with smps
-                break
+        ccnc_index = int(scan_start_rows[curr_scan])
         finish_scanning_ccnc_data = False
         while not finish_scanning_ccnc_data:
-            finish_scanning_ccnc_data = False
             a_scan = self.scans[curr_scan]
             duration = a_scan.duration
             # we do one thing at a time
-            for i in range(duration + duration // 4):  # DOCQUESTION Pull 125%? Okay paradigm?
-                curr_ccnc_index = ccnc_index + i
-                # if we reach out of ccnc data bound
-                if curr_ccnc_index >= len(self.ccnc_data):
-                    # stop scanning ccnc data
-                    finish_scanning_ccnc_data = True
-                    # if we did not collect enough data for a scan, then set its status to 0
-                    if i < duration:
-                        a_scan.set_status(0)
-                        a_scan.set_status_code(1)  # RESEARCH 1 Status Code
-                    break
-                # collect a bunch of data from ccnc file
-                supersaturation = self.ccnc_data[curr_ccnc_index][1]
-                a_scan.add_to_raw_super_sats(supersaturation)
-                ccnc_count = self.ccnc_data[curr_ccnc_index][-3]
-                ccnc_count_sum = int(sum([float(x) for x in self.ccnc_data[curr_ccnc_index][25:44]]))
-                ccnc_sample_flow = self.ccnc_data[curr_ccnc_index][17]
-                a_scan.add_to_raw_ccnc_counts(ccnc_count, ccnc_count_sum, ccnc_sample_flow)
-                total_count = 0
-                total_size = 0
-                for j in range(len(bin_sizes)):
-                    count_in_bin = int(float(self.ccnc_data[curr_ccnc_index][first_bin_column_index + j]))
-                    total_size += bin_sizes[j] * count_in_bin
-                    total_count += count_in_bin
-                ave_size = hf.safe_div(total_size, total_count)
-                a_scan.add_to_raw_ave_ccnc_sizes(ave_size)
-                a_scan.add_to_raw_t1s_t2s_t3s(self.ccnc_data[curr_ccnc_index][5], self.ccnc_data[curr_ccnc_index][7],
-                                              self.ccnc_data[curr_ccnc_index][9])
+            rows_wanted = duration + duration // 4  # DOCQUESTION Pull 125%? Okay paradigm?
+            rows_available = num_ccnc_rows - ccnc_index
+            # if we reach out of ccnc data bound
+            if rows_available < rows_wanted:
+                # stop scanning ccnc data
+                finish_scanning_ccnc_data = True
+                # if we did not collect enough data for a scan, then set its status to 0
+                if rows_available < duration:
+                    a_scan.set_status(0)
+                    a_scan.set_status_code(1)  # RESEARCH 1 Status Code
+            # collect a bunch of data from ccnc file
+            rows = slice(ccnc_index, ccnc_index + min(rows_wanted, rows_available))
+            a_scan.set_raw_ccnc_data(self.ccnc_data["super_sat"][rows], self.ccnc_data["T1"][rows],
+                                     self.ccnc_data["T2"][rows], self.ccnc_data["T3"][rows],
+                                     self.ccnc_data["ccnc_count"][rows], ccnc_count_sums[rows],
+                                     self.ccnc_data["sample_flow"][rows], ave_ccnc_sizes[rows])
             curr_scan += 1
             # if we run of out scans to compare with ccnc data, stop scanning ccnc data
             if curr_scan >= len(self.scans):
                 break
             # find the next ccnc_index
             # we got to based on the start time, since the duration values are always off
-            next_scan_start_time = self.scans[curr_scan].start_time
-            while True:
-                curr_ccnc_time = dt.datetime.strptime(self.ccnc_data[ccnc_index][0], "%H:%M:%S")
-                if curr_ccnc_time < next_scan_start_time:
-                    ccnc_index += 1
-                    # if we reach out of ccnc data bound
-                    if ccnc_index >= len(self.ccnc_data):
-                        # stop scanning ccnc data
-                        finish_scanning_ccnc_data = True
-                        break
-                else:
-                    break
+            ccnc_index = max(ccnc_index, int(scan_start_rows[curr_scan]))
+            # if we reach out of ccnc data bound, stop scanning ccnc data
+            if ccnc_index >= num_ccnc_rows:
+                finish_scanning_ccnc_data = True
 
     def do_basic_trans(self):
         """
@@ -641,12 +925,19 @@ class Controller(object):
             self.scans[i].pre_align_self_test()
         # DOCQUESTION Cross validation. Basically compare the distribution of a scan with the next two
         # We know that only the first few distributions have weird data, so once it becomes right, we stop
-        for i in range(len(self.scans) - 2):
+        # The comparisons of every scan with the next two are calculated at once and kept in scan_similarity
+        self.scan_similarity = scan.ScanSimilarity(self.scans)
+        num_compared = max(len(self.scans) - 2, 0)
+        same_as_next = self.scan_similarity.compare_smps(np.stack((np.arange(num_compared),
+                                                                   np.arange(num_compared) + 1), axis=1))
+        same_as_one_after = self.scan_similarity.compare_smps(np.stack((np.arange(num_compared),
+                                                                        np.arange(num_compared) + 2), axis=1))
+        for i in range(num_compared):
             # if the scan is invalid, we skip to the next one
             if not self.scans[i].is_valid():
                 continue
             # if a scan has a different dist from the next one or the one after that
-            if not self.scans[i].compare_smps(self.scans[i + 1]) or not self.scans[i].compare_smps(self.scans[i + 2]):
+            if not same_as_next[i] or not same_as_one_after[i]:
                 self.scans[i].set_status(0)
                 self.scans[i].set_status_code(3)  # RESEARCH 3 Status Code
             else:
@@ -693,6 +984,43 @@ class Controller(object):
         self.curr_scan_index = new_index
         # RESEARCH Shouldn't this update the view automatically?
 
+    def refresh_scan(self, index, stage):
+        """
+        Computes the stale stages of a scan that a stage depends on, including the stage itself (see
+        :class:`~scan.Scan.get_stale_stages`).  Stages that are up to date are not computed again.
+
+        - processed: :class:`~scan.Scan.generate_processed_data`
+        - corrected: :class:`~scan.Scan.correct_charges`
+        - sigmoid: :class:`~controller.Controller.auto_fit_one_sigmoid`, as the sigmoid lines of the old data no
+          longer fit
+        - kappa: Calculated for all the scans at once by :class:`~controller.Controller.refresh_kappa_values`
+
+        :param int index: The index of the scan in the `self.scans[]` list
+        :param str stage: The stage that is needed (see :class:`~scan.Scan.STAGES`)
+        """
+        a_scan = self.scans[index]
+        for a_stage in a_scan.get_stale_stages(stage):
+            if a_stage == "processed":
+                a_scan.generate_processed_data()
+            elif a_stage == "corrected":
+                a_scan.correct_charges()
+            elif a_stage == "sigmoid":
+                self.auto_fit_one_sigmoid(index)
+            else:
+                continue
+            # Scans that can not be computed, such as invalid scans, are not tried again until their inputs change
+            a_scan.stale_stages.discard(a_stage)
+
+    def update_scan(self, stage):
+        """
+        Marks a stage of the current scan as changed and updates only the parts of the view that depend on it.  The
+        stale stages are computed when the view needs them (see :class:`~controller.Controller.refresh_scan`).
+
+        :param str stage: The stage whose inputs changed (see :class:`~scan.Scan.STAGES`)
+        """
+        self.scans[self.curr_scan_index].invalidate(stage)
+        self.view.update_scan_info_and_graphs(stage)
+
     def switch_to_scan(self, index):
         """
         Switches the controller to activate a specific scan and updates the view appropriately
@@ -834,8 +1162,6 @@ class Controller(object):
         - self.scans
         - self.counts_to_conc_conv
         - self.data_files
-        - self.ccnc_data
-        - self.smps_data
         - self.experiment_date
         - self.base_shift_factor
         - self.b_limits
@@ -845,16 +1171,29 @@ class Controller(object):
         - self.stage
         - self.valid_kappa_points
         - self.save_name
+        - self.data_file_keys
+
+        - self.ccnc_data and self.smps_data, unless lean_memory is set
+
+        In lean memory mode the data tables are not stored, as nothing reads them once the scans are created.  They
+        can be read again from the data files with :class:`~controller.Controller.load_data_tables`.
         """
         # TODO issues/41 Fix to remove smooth_method
         if self.save_name is None:
             self.view.save_project_as()
         else:
-            to_save = (self.scans, self.counts_to_conc_conv, self.data_files, self.ccnc_data, self.smps_data,
+            if self.data_file_keys is None and self.data_files is not None:
+                self.hash_data_files()
+            if self.lean_memory:
+                ccnc_data, smps_data = None, None
+            else:
+                ccnc_data, smps_data = self.ccnc_data, self.smps_data
+            # The data file keys are appended after the variables of the earlier project files
+            to_save = (self.scans, self.counts_to_conc_conv, self.data_files, ccnc_data, smps_data,
                        self.experiment_date, self.smooth_method, self.base_shift_factor, self.b_limits,
                        self.asym_limits, self.kappa_calculate_dict, self.alpha_pinene_dict, self.stage,
                        self.valid_kappa_points,
-                       self.save_name)
+                       self.save_name, self.data_file_keys)
             with open(self.save_name, 'wb') as handle:
                 pickle.dump(to_save, handle, protocol=pickle.HIGHEST_PROTOCOL)
 
@@ -870,15 +1209,23 @@ class Controller(object):
         self.project_folder = os.path.dirname(project_file)
         try:
             with open(project_file, 'rb') as handle:
-                (self.scans, self.counts_to_conc_conv, self.data_files, self.ccnc_data, self.smps_data,
-                 self.experiment_date, self.smooth_method, self.base_shift_factor, self.b_limits,
-                 self.asym_limits, self.kappa_calculate_dict, self.alpha_pinene_dict, self.stage,
-                 self.valid_kappa_points,
-                 self.save_name) = pickle.load(handle)
+                saved = pickle.load(handle)
+            (self.scans, self.counts_to_conc_conv, self.data_files, self.ccnc_data, self.smps_data,
+             self.experiment_date, self.smooth_method, self.base_shift_factor, self.b_limits,
+             self.asym_limits, self.kappa_calculate_dict, self.alpha_pinene_dict, self.stage,
+             self.valid_kappa_points,
+             self.save_name) = saved[:15]
+            self.data_file_keys = saved[15] if len(saved) > 15 else None
         except Exception as e:
             logger.warning("Old project/run file attempted to load (%s)" % e)
             self.view.show_error_message("old project file")
             return
+        # Scans saved before the data was kept in a store each have a store of their own, which are joined into one
+        self.scan_store = scan.share_store(self.scans)
+        # Projects saved before the data files were hashed hold the data tables as text rows, which are not used any
+        # more.  They are released and the data files are read again when the tables are needed.
+        if len(saved) <= 15 or self.lean_memory:
+            self.release_data_tables()
         # except TypeError as e:
         #     if str(e) == "__init__() takes exactly 2 arguments (1 given)":
         #         with open(project_file, 'rb') as handle:
@@ -918,6 +1265,7 @@ class Controller(object):
         :param str export_filename: The file name to export the file to
         """
         # TODO issues/20 issues/21 issues/22 issues/11
+        self.refresh_kappa_values()
         data_to_export = []
         # REVIEW kset use kappa dist
         for a_key in list(self.kappa_calculate_dict.keys()):
@@ -170,15 +170,15 @@ class DockerScanInformation(Qw.QFrame):
         Callback function set when the shift factor is changed on the Scan Information docker widget.  It:
 
         - Sets the shift factor on the scan (:class:`~scan.Scan.set_shift_factor`)
-        - Reprocesses the data (:class:`~scan.Scan.generate_processed_data`)
-        - Reloads the current scan into the display (:class:`~controller.Controller.switch_to_scan`)
+        - Marks the processed data as stale and updates the parts of the display that show it
+          (:class:`~controller.Controller.update_scan`), which reprocesses the data
+          (:class:`~scan.Scan.generate_processed_data`)
 
         :param int new_shift_index: The new shift value to set in the controller
         """
         curr_scan = self.controller.scans[self.controller.curr_scan_index]
         curr_scan.set_shift_factor(new_shift_index)        # RESEARCH shouldn't set index auto update display?  Why not?
-        curr_scan.generate_processed_data()                # If so, this may be redundent
-        self.controller.switch_to_scan(self.controller.curr_scan_index)    # As well as this line
+        self.controller.update_scan("processed")
 
     def set_scan_enable_status(self):
         """
@@ -204,6 +204,8 @@ class DockerScanInformation(Qw.QFrame):
                 self.scan_status.setStyleSheet("QWidget { color: white; background-color:red}")
                 self.additional_information.setText(curr_scan.get_status_code_descript())
                 self.enable_disable_button.setText("Enable this scan")
+            # Only the kappa points depend on the status
+            curr_scan.invalidate("kappa")
             self.controller.view.ratio_dp_graph.update_graph(curr_scan)
 
     def show_data(self):
@@ -236,6 +238,7 @@ class DockerScanInformation(Qw.QFrame):
             curr_scan.true_super_sat = float(ss[0])
             curr_scan.super_sat_label = str(ss[0])
             self.supersaturation.setText(curr_scan.super_sat_label)
+            curr_scan.invalidate("kappa")
 
 
 class DockerSigmoidWidget(Qw.QFrame):
@@ -473,7 +476,7 @@ class DockerSigmoidWidget(Qw.QFrame):
             param_list.append([sig_mid, curve_max, log_grow_rate, y_0])
         # set the sigmoid parameters and fit new sigmoid lines
         self.controller.scans[self.controller.curr_scan_index].set_sigmoid_params(param_list)
-        self.controller.switch_to_scan(self.controller.curr_scan_index)
+        self.controller.view.update_scan_info_and_graphs("sigmoid")
 
 
 class DockerKappaWidget(Qw.QFrame):
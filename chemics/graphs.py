@@ -87,16 +87,14 @@ class ConcOverTimeSmoothGraph(FigureCanvas):
         """
         # Get data from the scan
         smps_counts = a_scan.processed_smps_counts
-        ccnc_counts = a_scan.processed_ccnc_counts
         # Get the number of data points
         num_data_pts = a_scan.duration
         # Make up for the lost data points
         smps_counts = hf.fill_zeros_to_end(smps_counts, num_data_pts)
-        ccnc_counts = hf.fill_zeros_to_end(ccnc_counts, num_data_pts)
         smps_counts = smps_counts[:num_data_pts]
-        ccnc_counts = ccnc_counts[:num_data_pts]
-        # Smooth the CCNC data
-        ccnc_counts = hf.smooth(ccnc_counts, window_length=5, polyorder=2)
+        # Smooth the CCNC data, which is already padded to the duration of the scan.  The smoothed data is kept by
+        # the scan until it is shifted again.
+        ccnc_counts = a_scan.get_smoothed("processed_ccnc_counts", window_length=5, polyorder=2)
         # set new data
         x_axis = np.arange(num_data_pts)
         self.smps_points.set_xdata(x_axis)
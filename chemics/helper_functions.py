@@ -2,11 +2,20 @@
 Functions and classes that are used by other parts of the application
 """
 # External Packages
+import concurrent.futures
+import contextlib
 import csv
+import datetime as dt
+import functools
+import hashlib
+import json
 import logging
+import mmap
 import numpy as np
+import os
+import re
+import scipy.ndimage
 import scipy.signal
-import warnings  # TODO issues/49 Remove after fixing issue
 
 # Internal Packages
 import constants as const
@@ -77,6 +86,451 @@ def process_a_csv(file_path):
         return date, csv_content
 
 
+def process_ccnc_csv_files(file_paths, max_workers=None, use_cache=False):
+    """
+    Converts a list of CCNC csv files into a single set of typed columns.  Each file is parsed once with
+    :class:`~helper_functions.process_a_ccnc_csv` and the columns of all the files are merged by timestamp with
+    :class:`~helper_functions.merge_ccnc_columns`.
+
+    If there are at least :class:`~constants.CCNC_PARALLEL_FILE_THRESHOLD` files, the files are parsed in a process
+    pool.  The merged result is the same as parsing the files one after another.
+
+    :param list[str] file_paths: The full path names of the csv files to process
+    :param int max_workers: The number of processes to use.  If None, the number of CPUs is used.  Use 1 to parse
+                            the files one after another.
+    :param bool use_cache: If True, files that have not changed are loaded from their parse cache
+                           (see :class:`~helper_functions.load_cached_ccnc_csv`)
+    :return: The date from the first record in the last csv followed by the columns of all the csv files
+    :rtype: (str, dict[str, ndarray])
+    """
+    file_paths.sort()
+    if len(file_paths) < 1:
+        raise IOError("File not found")  # TODO issues/25 Error not handled well
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    max_workers = min(max_workers, len(file_paths))
+    parse = load_cached_ccnc_csv if use_cache else process_a_ccnc_csv
+    if max_workers > 1 and len(file_paths) >= const.CCNC_PARALLEL_FILE_THRESHOLD:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            # map returns the results in the order of the file paths
+            parsed_files = list(executor.map(parse, file_paths))
+    else:
+        parsed_files = [parse(a_file) for a_file in file_paths]
+    dates = [date for date, columns in parsed_files]
+    return dates[-1], merge_ccnc_columns(dates, [columns for date, columns in parsed_files])
+
+
+def process_a_ccnc_csv(file_path):
+    """
+    Converts a CCNC csv file into typed numpy columns.  See :class:`~helper_functions.ccnc_rows_to_columns` for the
+    columns that are returned.
+
+    :param str file_path:  The full path name to the csv file to process
+    :return: The date from the first record in the csv followed by the columns of the csv file
+    :rtype: (str, dict[str, ndarray])
+    """
+    date, csv_content = process_a_csv(file_path)
+    return date, ccnc_rows_to_columns(csv_content)
+
+
+def ccnc_rows_to_columns(csv_rows):
+    """
+    Converts the rows of a CCNC csv file, as returned by :class:`~helper_functions.process_a_csv`, into typed numpy
+    columns.  The columns are:
+
+    - **time**: The time of the row as int seconds since midnight
+    - **super_sat**: The current supersaturation as float64
+    - **T1**, **T2**, **T3**: The temperature readings as float64
+    - **sample_flow**: The sample flow as float64
+    - **ccnc_count**: The CCN number concentration as float64
+    - **bins**: The counts of the 20 bins as an int64 matrix with one row per record
+
+    :param list[list[str]] csv_rows: The rows of the csv file without the header
+    :return: The typed columns
+    :rtype: dict[str, ndarray]
+    """
+    if len(csv_rows) == 0:
+        return empty_ccnc_columns()
+    first_bin = const.CCNC_FIRST_BIN_COLUMN
+    last_bin = first_bin + len(const.BIN_SIZES)
+    times = [time_to_seconds(row[const.CCNC_TIME_COLUMN]) for row in csv_rows]
+    # Convert all the needed cells in one call.  The CCN count is indexed from the end of the row.
+    values = np.array([[row[const.CCNC_SUPER_SAT_COLUMN], row[const.CCNC_T1_COLUMN], row[const.CCNC_T2_COLUMN],
+                        row[const.CCNC_T3_COLUMN], row[const.CCNC_SAMPLE_FLOW_COLUMN],
+                        row[const.CCNC_COUNT_COLUMN]] + row[first_bin:last_bin] for row in csv_rows],
+                      dtype=np.float64)
+    return {"time": np.asarray(times, dtype=np.int64),
+            "super_sat": values[:, 0].copy(),
+            "T1": values[:, 1].copy(),
+            "T2": values[:, 2].copy(),
+            "T3": values[:, 3].copy(),
+            "sample_flow": values[:, 4].copy(),
+            "ccnc_count": values[:, 5].copy(),
+            "bins": values[:, 6:].astype(np.int64)}
+
+
+def merge_ccnc_columns(dates, columns_list):
+    """
+    Merges several sets of CCNC columns by timestamp into one set of columns.  Rows with a timestamp that was
+    already seen, such as the rows repeated at the hour boundaries of the hourly files, are dropped.  The first
+    occurrence is kept.
+
+    Each row is keyed on the date of its file plus its time of day (see :class:`~helper_functions.ccnc_timestamps`).
+    The key is kept as the **timestamp** column of the merged columns, which is the time axis of the experiment.  As
+    each file is in time order, the files are joined in the order of their first rows, which is linear in the number
+    of rows (see :class:`~helper_functions.find_ccnc_file_runs`).  Files that overlap by more than the rows repeated
+    at their boundaries are sorted instead.
+
+    :param list[str] dates: The date (mm/dd/yy) of each set of columns
+    :param list[dict[str, ndarray]] columns_list: The sets of columns to merge
+    :return: The merged columns
+    :rtype: dict[str, ndarray]
+    """
+    keys = [ccnc_timestamps(date, columns["time"]) for date, columns in zip(dates, columns_list)]
+    runs = find_ccnc_file_runs(keys)
+    if runs is None:
+        columns = concatenate_ccnc_columns(columns_list)
+        columns["timestamp"] = np.concatenate(keys) if len(keys) > 0 else np.zeros(0, dtype=np.int64)
+        return sort_ccnc_columns(columns)
+    pieces = []
+    for i, start in runs:
+        piece = {name: values[start:] for name, values in columns_list[i].items()}
+        piece["timestamp"] = keys[i][start:]
+        pieces.append(piece)
+    num_dropped = sum(len(a_keys) for a_keys in keys) - sum(len(piece["timestamp"]) for piece in pieces)
+    if num_dropped > 0:
+        logger.info("Dropped %d duplicated CCNC rows while merging files" % num_dropped)
+    columns = concatenate_ccnc_columns(pieces)
+    if len(pieces) == 0:
+        columns["timestamp"] = np.zeros(0, dtype=np.int64)
+    return columns
+
+
+def find_ccnc_file_runs(keys):
+    """
+    Finds the order in which to join the rows of several CCNC files so that the timestamps are in order, for files
+    that are each in order and only overlap by the rows a file repeats from the end of the file before it.  The files
+    are put in the order of their first timestamp, and the rows at the head of each file with a timestamp at or before
+    the last one already joined are dropped with one binary search per file.
+
+    The rows kept are the same as those kept by :class:`~helper_functions.sort_ccnc_columns` on the files joined in
+    the order given, so None is returned if a file is not in order, if a file overlaps by rows that are not repeated,
+    or if a repeated row would come from a file given after the file it repeats.
+
+    :param list[ndarray] keys: The timestamps of the rows of each file
+    :return: The index of each file to join, in order, with the first row of it to keep, or None if the files must
+             be sorted
+    :rtype: list[tuple[int, int]]
+    """
+    files = sorted((i for i in range(len(keys)) if len(keys[i]) > 0), key=lambda i: keys[i][0])
+    runs = []
+    joined_keys = None
+    joined_file = None
+    for i in files:
+        if np.any(keys[i][1:] <= keys[i][:-1]):
+            return None
+        start = 0
+        if joined_keys is not None:
+            start = int(np.searchsorted(keys[i], joined_keys[-1], side="right"))
+            if start > 0:
+                # The dropped rows must repeat rows of the file joined before, which must be given first
+                repeated = keys[i][:start]
+                positions = np.searchsorted(joined_keys, repeated)
+                if joined_file > i or repeated[0] < joined_keys[0] or \
+                        np.any(joined_keys[np.minimum(positions, len(joined_keys) - 1)] != repeated):
+                    return None
+        if start < len(keys[i]):
+            runs.append((i, start))
+            joined_keys = keys[i][start:]
+            joined_file = i
+    return runs
+
+
+def sort_ccnc_columns(columns):
+    """
+    Sorts a set of CCNC columns by their timestamp column and drops the rows with a timestamp that was already seen.
+    The sort is stable, so the first occurrence of a timestamp is kept.
+
+    :param dict[str, ndarray] columns: The columns to sort
+    :return: The sorted columns
+    :rtype: dict[str, ndarray]
+    """
+    keys = columns["timestamp"]
+    order = np.argsort(keys, kind="mergesort")
+    sorted_keys = keys[order]
+    # Keep the first row of each timestamp
+    keep = np.ones(len(sorted_keys), dtype=bool)
+    keep[1:] = sorted_keys[1:] != sorted_keys[:-1]
+    num_dropped = len(keep) - np.count_nonzero(keep)
+    if num_dropped > 0:
+        logger.info("Dropped %d duplicated CCNC rows while merging files" % num_dropped)
+    order = order[keep]
+    return {name: columns[name][order] for name in columns}
+
+
+def ccnc_timestamps(date, times, previous_time=None, days_passed=0):
+    """
+    Converts the times of a CCNC file into seconds since the epoch using the date of the file.  If the time goes
+    backwards, the file is assumed to continue past midnight and the following rows are moved to the next day.
+
+    :param str date: The date of the file as mm/dd/yy
+    :param ndarray times: The times of the rows as seconds since midnight
+    :param int previous_time: The time of the row before the first row, if the times continue rows already read
+    :param int days_passed: The number of days the file had already passed before the first row
+    :return: The timestamps of the rows
+    :rtype: ndarray
+    """
+    times = np.asarray(times, dtype=np.int64)
+    previous_times = np.empty(len(times), dtype=np.int64)
+    previous_times[:1] = times[:1] if previous_time is None else previous_time
+    previous_times[1:] = times[:-1]
+    days = days_passed + np.cumsum(times < previous_times)
+    return day_timestamp(date) + days * 86400 + times
+
+
+def smps_timestamps(start_times, start_dates=None, first_day=0):
+    """
+    Converts the start times of the SMPS scans into seconds since the epoch.  If the SMPS file has the date of each
+    scan, the date is used.  Otherwise the scans are placed on the first day and, as with
+    :class:`~helper_functions.unwrap_times_of_day`, moved to the next day each time the time goes backwards.
+
+    :param list[str] start_times: The start time of each scan as hh:mm:ss
+    :param list[str] start_dates: The date of each scan as mm/dd/yy or None if the file does not have the dates
+    :param int first_day: The timestamp of midnight of the first day, used if there are no dates
+    :return: The timestamp of the start of each scan
+    :rtype: ndarray
+    """
+    times = np.array([time_to_seconds(a_time) for a_time in start_times], dtype=np.int64)
+    if start_dates is None:
+        return first_day + unwrap_times_of_day(times)
+    # The scans of a day share the same date, so each date is only parsed once
+    days = {}
+    for date in start_dates:
+        if date not in days:
+            days[date] = day_timestamp(date)
+    return np.array([days[date] for date in start_dates], dtype=np.int64) + times
+
+
+def day_timestamp(date):
+    """
+    Converts a date into the seconds since the epoch of its midnight.  The instruments record local times without a
+    time zone, so the times are treated as UTC to keep every day 86400 seconds long.
+
+    :param str date: The date as mm/dd/yy
+    :return: The timestamp of the start of the day
+    :rtype: int
+    """
+    day = dt.datetime.strptime(date.strip(), "%m/%d/%y").replace(tzinfo=dt.timezone.utc)
+    return int(day.timestamp())
+
+
+def timestamp_to_datetime(timestamp):
+    """
+    Converts seconds since the epoch, as created by :class:`~helper_functions.day_timestamp`, into a datetime without
+    a time zone.
+
+    :param int timestamp: The seconds since the epoch
+    :return: The date and time
+    :rtype: datetime.datetime
+    """
+    return dt.datetime(1970, 1, 1) + dt.timedelta(seconds=int(timestamp))
+
+
+def datetime_to_timestamp(a_datetime):
+    """
+    Converts a datetime without a time zone into seconds since the epoch.  The reverse of
+    :class:`~helper_functions.timestamp_to_datetime`.
+
+    :param datetime.datetime a_datetime: The date and time
+    :return: The seconds since the epoch
+    :rtype: int
+    """
+    return int((a_datetime - dt.datetime(1970, 1, 1)).total_seconds())
+
+
+def empty_ccnc_columns():
+    """
+    Creates a set of CCNC columns without any rows.
+
+    :return: The typed columns with a length of zero
+    :rtype: dict[str, ndarray]
+    """
+    columns = {name: np.zeros(0, dtype=np.float64) for name in const.CCNC_FLOAT_COLUMNS}
+    columns["time"] = np.zeros(0, dtype=np.int64)
+    columns["bins"] = np.zeros((0, len(const.BIN_SIZES)), dtype=np.int64)
+    return columns
+
+
+def concatenate_ccnc_columns(columns_list):
+    """
+    Joins several sets of CCNC columns, in the order given, into one set of columns.
+
+    :param list[dict[str, ndarray]] columns_list: The sets of columns to join
+    :return: The joined columns
+    :rtype: dict[str, ndarray]
+    """
+    if len(columns_list) == 0:
+        return empty_ccnc_columns()
+    return {name: np.concatenate([columns[name] for columns in columns_list]) for name in columns_list[0]}
+
+
+def time_to_seconds(a_time):
+    """
+    Converts a time of the format hh:mm:ss into the number of seconds since midnight.
+
+    :param str a_time: The time to convert
+    :return: The number of seconds since midnight
+    :rtype: int
+    """
+    hours, minutes, seconds = a_time.split(":")
+    return int(hours) * 3600 + int(minutes) * 60 + int(seconds)
+
+
+def unwrap_times_of_day(times):
+    """
+    Converts times of day that are in order into a monotonic time index.  Each time the time of day goes backwards,
+    midnight has passed and a day is added to the following times.
+
+    :param list[int] times: The times as seconds since midnight
+    :return: The times as seconds since midnight of the day of the first time
+    :rtype: ndarray
+    """
+    times = np.asarray(times, dtype=np.int64)
+    days_passed = np.zeros(len(times), dtype=np.int64)
+    days_passed[1:] = np.cumsum(np.diff(times) < 0)
+    return times + days_passed * 86400
+
+
+class CcncTailReader(object):
+    """
+    Reads CCNC csv files that are still being written.  For each file the reader remembers the byte offset it has
+    read up to and the partial last line, so each :class:`~helper_functions.CcncTailReader.poll` only parses the rows
+    that were appended since the last poll.  The rows of all the files are kept merged by timestamp, as done by
+    :class:`~helper_functions.merge_ccnc_columns`.
+
+    Stores the following variables:
+
+    - **file_states**: The read state of each file by its full path name
+    - **columns**: The typed columns of all the rows read, with a timestamp column as created by
+      :class:`~helper_functions.merge_ccnc_columns`
+
+    :param list[str] file_paths: The full path names of the csv files to follow
+    """
+    def __init__(self, file_paths=()):
+        self.file_states = {}
+        self.columns = empty_ccnc_columns()
+        self.columns["timestamp"] = np.zeros(0, dtype=np.int64)
+        for a_file in file_paths:
+            self.add_file(a_file)
+
+    @property
+    def date(self):
+        """
+        The date from the first record in the last csv file, which is the experiment date.
+
+        :return: The date as mm/dd/yy or None if no date has been read yet
+        :rtype: str
+        """
+        dates = [self.file_states[a_file]["date"] for a_file in sorted(self.file_states)]
+        dates = [date for date in dates if date is not None]
+        return dates[-1] if len(dates) > 0 else None
+
+    def add_file(self, file_path):
+        """
+        Starts following a csv file.  The file is read from the top on the next poll.  Files that are already
+        followed are left as they are.
+
+        :param str file_path: The full path name of the csv file
+        """
+        if file_path not in self.file_states:
+            self.file_states[file_path] = {"offset": 0, "partial_line": b"", "num_rows": 0, "date": None,
+                                           "previous_time": None, "days_passed": 0}
+
+    def poll(self):
+        """
+        Reads the rows appended to each file since the last poll and adds them to the columns.  Files that do not
+        exist yet are skipped.  If a file became shorter than what was already read, it is read again from the top.
+
+        :return: The number of rows added to the columns
+        :rtype: int
+        """
+        new_columns = []
+        for a_file in sorted(self.file_states):
+            state = self.file_states[a_file]
+            if not os.path.isfile(a_file):
+                continue
+            if os.path.getsize(a_file) < state["offset"]:
+                logger.warning("CCNC file %s was truncated, reading it again" % a_file)
+                self.file_states.pop(a_file)
+                self.add_file(a_file)
+                state = self.file_states[a_file]
+            csv_rows = self.read_appended_rows(a_file, state)
+            if len(csv_rows) == 0:
+                continue
+            columns = ccnc_rows_to_columns(csv_rows)
+            columns["timestamp"] = ccnc_timestamps(state["date"], columns["time"], state["previous_time"],
+                                                   state["days_passed"])
+            # Remember the last row so that the next rows continue its day
+            state["days_passed"] = int(columns["timestamp"][-1] - columns["time"][-1]
+                                       - day_timestamp(state["date"])) // 86400
+            state["previous_time"] = int(columns["time"][-1])
+            new_columns.append(columns)
+        if len(new_columns) == 0:
+            return 0
+        num_rows = len(self.columns["timestamp"])
+        self.add_rows(concatenate_ccnc_columns(new_columns))
+        return len(self.columns["timestamp"]) - num_rows
+
+    def read_appended_rows(self, file_path, state):
+        """
+        Reads the complete lines appended to a file since the last read.  The partial last line is kept in the state
+        of the file until the rest of it is written.  The first four rows, the header of the file, are skipped and
+        the date is taken from the second row.
+
+        :param str file_path: The full path name of the csv file
+        :param dict state: The read state of the file, which is updated
+        :return: The new data rows with the empty strings removed, as returned by
+                 :class:`~helper_functions.process_a_csv`
+        :rtype: list[list[str]]
+        """
+        with open(file_path, "rb") as csv_file:
+            csv_file.seek(state["offset"])
+            appended = csv_file.read()
+        state["offset"] += len(appended)
+        lines = (state["partial_line"] + appended).split(b"\n")
+        state["partial_line"] = lines.pop()
+        lines = [line.rstrip(b"\r").decode("ISO-8859-1") for line in lines]
+        csv_rows = []
+        for row in csv.reader(lines, delimiter=','):
+            # Skip empty rows
+            if not row:
+                continue
+            state["num_rows"] += 1
+            if state["num_rows"] == 2:
+                state["date"] = row[1]
+            if state["num_rows"] <= 4:
+                continue
+            row = [_f for _f in row if _f]
+            if row:
+                csv_rows.append(row)
+        return csv_rows
+
+    def add_rows(self, columns):
+        """
+        Adds rows to the columns.  If the rows all come after the rows already read, which is the usual case for a
+        file being written, they are appended.  Otherwise all the rows are merged again by timestamp.
+
+        :param dict[str, ndarray] columns: The columns of the new rows, including their timestamp
+        """
+        timestamps = columns["timestamp"]
+        read_timestamps = self.columns["timestamp"]
+        in_order = np.all(np.diff(timestamps) > 0)
+        if in_order and (len(read_timestamps) == 0 or timestamps[0] > read_timestamps[-1]):
+            self.columns = concatenate_ccnc_columns([self.columns, columns])
+        else:
+            self.columns = sort_ccnc_columns(concatenate_ccnc_columns([self.columns, columns]))
+
+
 def process_tab_sep_files(file_path):
     """
     Converts a tab seperated value file into a python list.  Each data point is stored as a str.  Each row if items is
@@ -109,6 +563,402 @@ def process_tab_sep_files(file_path):
             txt_content[i] = [_f for _f in txt_content[i] if _f]
         return txt_content
 
+
+def index_smps_sections(smps_data):
+    """
+    Finds where each section of the SMPS data, as returned by :class:`~helper_functions.process_tab_sep_files`,
+    is in a single pass over the rows.  See :class:`~helper_functions.find_smps_sections` for the sections.
+
+    :param list[list[str]] smps_data: The contents of the SMPS file
+    :return: The section index
+    :rtype: dict
+    """
+    return find_smps_sections([row[0] if len(row) > 0 else "" for row in smps_data])
+
+
+def find_smps_sections(first_cells):
+    """
+    Finds where each section of the SMPS data is in a single pass over the first cell of each row.  Row 0 is the
+    start time row.  The sections are:
+
+    - **start_times**: The row of the scan start times
+    - **normalized_concs**: The (start, end) row range of the dN/dlogDp block.  The first cell of each row is the
+      diameter midpoint.
+    - **metadata**: A dict of the rows between the two numeric blocks keyed on the first cell with the white space
+      removed and in lower case (i.e. "scanuptime(s)").  The value is the row index.
+    - **raw_counts**: The (start, end) row range of the raw data block.  The first cell of each row is the time
+      followed by the diameter and count of each scan.
+
+    The end of each range is exclusive.
+
+    :param list[str] first_cells: The first non empty cell of each row.  Empty rows are an empty str.
+    :return: The section index
+    :rtype: dict
+    """
+    normalized_end = None
+    raw_start = None
+    raw_end = len(first_cells)
+    metadata = {}
+    for i in range(1, len(first_cells)):
+        if len(first_cells[i]) == 0:
+            continue
+        is_text = re.search('[a-zA-Z]', first_cells[i]) is not None
+        if normalized_end is None:
+            # Find the first line that is not a value.  This is the end of the dN/dlogDp block
+            if is_text:
+                normalized_end = i
+                metadata[''.join(first_cells[i].split()).lower()] = i
+        elif raw_start is None:
+            # The text section ends at the first line that is a value
+            if is_text:
+                metadata[''.join(first_cells[i].split()).lower()] = i
+            else:
+                raw_start = i
+        elif is_text:
+            # The raw data block ends at the next text line (i.e. "Comment")
+            raw_end = i
+            break
+    if normalized_end is None or raw_start is None:
+        raise IOError("SMPS file is missing a data section")  # TODO issues/25 Error not handled well
+    return {"start_times": 0,
+            "normalized_concs": (1, normalized_end),
+            "metadata": metadata,
+            "raw_counts": (raw_start, raw_end)}
+
+
+def process_smps_file(file_path):
+    """
+    Memory maps a SMPS tab seperated value file and decodes only what is needed into numpy arrays.  The file is never
+    loaded into memory as a whole.  The rows are found the same way as :class:`~helper_functions.process_tab_sep_files`
+    and :class:`~helper_functions.index_smps_sections`.
+
+    The section index has the byte range (start, end) in the file of the same sections as
+    :class:`~helper_functions.find_smps_sections` and of the date row (**start_dates**), which is None if the file
+    does not have one.  The SMPS data has:
+
+    - **start_dates**: The date of each scan as a str or None if the file does not have a date row
+    - **start_times**: The start time of each scan as a str
+    - **metadata**: A dict of the values of each metadata row as a list of str with the same keys as the section index
+    - **diameter_midpoints**: The diameter midpoints as a float64 array
+    - **normalized_concs**: The dN/dlogDp values as a float64 matrix of shape (diameter midpoints, scans).  The
+      matrix is in column major order so the values of each scan are contiguous.
+    - **raw_times**: The time of each raw data row as a float64 array
+    - **raw_diameters**: The diameters of the raw data as a float64 matrix of shape (raw data rows, scans)
+    - **raw_counts**: The counts of the raw data as an int64 matrix of shape (raw data rows, scans)
+
+    :param str file_path:  The full path name to the txt file to process
+    :return: The section index and the SMPS data
+    :rtype: (dict, dict)
+    """
+    with open(file_path, "rb") as txt_file:
+        with contextlib.closing(mmap.mmap(txt_file.fileno(), 0, access=mmap.ACCESS_READ)) as mm:
+            line_spans, first_cells = index_smps_lines(mm)
+            row_sections = find_smps_sections(first_cells)
+
+            def byte_range(start_row, end_row):
+                return line_spans[start_row][0], line_spans[end_row - 1][1]
+
+            def decode_cells(row):
+                cells = [x.decode("ISO-8859-1") for x in mm[line_spans[row][0]:line_spans[row][1]].split(b"\t") if x]
+                return cells[1:]
+
+            def numeric_rows(start_row, end_row):
+                return [line_spans[i] for i in range(start_row, end_row) if len(first_cells[i]) > 0]
+
+            start_times = decode_cells(row_sections["start_times"])
+            num_scans = len(start_times)
+            # The date row, if the file has one, is directly before the start time row
+            date_span = find_smps_date_line(mm, line_spans[row_sections["start_times"]][0])
+            start_dates = None
+            if date_span is not None:
+                start_dates = [x.decode("ISO-8859-1") for x in mm[date_span[0]:date_span[1]].split(b"\t") if x][1:]
+            normalized_concs = decode_numeric_lines(mm, numeric_rows(*row_sections["normalized_concs"]),
+                                                    num_scans + 1)
+            raw_data = decode_numeric_lines(mm, numeric_rows(*row_sections["raw_counts"]), num_scans * 2 + 1)
+            sections = {"start_dates": date_span,
+                        "start_times": line_spans[row_sections["start_times"]],
+                        "normalized_concs": byte_range(*row_sections["normalized_concs"]),
+                        "metadata": {key: line_spans[row] for key, row in row_sections["metadata"].items()},
+                        "raw_counts": byte_range(*row_sections["raw_counts"])}
+            smps_data = {"start_dates": start_dates,
+                         "start_times": start_times,
+                         "metadata": {key: decode_cells(row) for key, row in row_sections["metadata"].items()},
+                         "diameter_midpoints": np.ascontiguousarray(normalized_concs[:, 0]),
+                         "normalized_concs": np.asfortranarray(normalized_concs[:, 1:]),
+                         "raw_times": np.ascontiguousarray(raw_data[:, 0]),
+                         "raw_diameters": np.ascontiguousarray(raw_data[:, 1::2]),
+                         "raw_counts": raw_data[:, 2::2].astype(np.int64)}
+    return sections, smps_data
+
+
+def find_smps_date_line(mm, start_time_position):
+    """
+    Finds the date row of a memory mapped SMPS file, which is the line directly before the start time line.
+
+    :param mmap.mmap mm: The memory mapped SMPS file
+    :param int start_time_position: The byte position of the start of the start time line
+    :return: The (start, end) byte range of the date line without the line ending or None if there is no date line
+    :rtype: (int, int)|None
+    """
+    line_end = mm.rfind(b"\n", 0, start_time_position)
+    if line_end == -1:
+        return None
+    line_start = mm.rfind(b"\n", 0, line_end) + 1
+    if line_end > line_start and mm[line_end - 1:line_end] == b"\r":
+        line_end -= 1
+    first_cell = mm[line_start:line_end].split(b"\t")[0].decode("ISO-8859-1")
+    if ''.join(first_cell.split()).lower() != "date":
+        return None
+    return line_start, line_end
+
+
+def index_smps_lines(mm):
+    """
+    Finds the byte range of each line of a memory mapped SMPS file and its first non empty cell.  Like
+    :class:`~helper_functions.process_tab_sep_files`, the lines before the start time line and the line that only
+    states "Diameter midpoint" are dropped so that row 0 is the start time line.
+
+    :param mmap.mmap mm: The memory mapped SMPS file
+    :return: The (start, end) byte range of each line without the line ending and the first cell of each line
+    :rtype: (list[(int, int)], list[str])
+    """
+    line_spans = []
+    first_cells = []
+    found_start = False
+    position = 0
+    size = len(mm)
+    while position < size:
+        line_end = mm.find(b"\n", position)
+        if line_end == -1:
+            line_end = size
+        next_position = line_end + 1
+        if line_end > position and mm[line_end - 1:line_end] == b"\r":
+            line_end -= 1
+        # Only the first cell is decoded.  If the line starts with a tab, find the first cell that is not empty.
+        tab = mm.find(b"\t", position, line_end)
+        first_cell = mm[position:line_end if tab == -1 else tab]
+        if len(first_cell) == 0:
+            first_cell = next((x for x in mm[position:line_end].split(b"\t") if x), b"")
+        first_cell = first_cell.decode("ISO-8859-1")
+        if not found_start and ''.join(first_cell.split()).lower() == "starttime":
+            found_start = True
+        if found_start:
+            line_spans.append((position, line_end))
+            first_cells.append(first_cell)
+        position = next_position
+    if not found_start:
+        raise IOError("SMPS file is missing the start time row")  # TODO issues/25 Error not handled well
+    # Drop the row that only states "Diameter midpoint"
+    return line_spans[0:1] + line_spans[2:], first_cells[0:1] + first_cells[2:]
+
+
+def decode_numeric_lines(mm, line_spans, num_columns):
+    """
+    Decodes lines of white space seperated numbers in a memory mapped file into a float64 matrix.  The lines are
+    decoded in chunks of :class:`~constants.SMPS_DECODE_CHUNK_LINES` lines so that only a small part of the file is
+    copied out of the memory map at a time.
+
+    :param mmap.mmap mm: The memory mapped file
+    :param list[(int, int)] line_spans: The (start, end) byte range of each line to decode
+    :param int num_columns: The number of values on each line
+    :return: The decoded values with one row per line
+    :rtype: ndarray
+    """
+    values = np.empty((len(line_spans), num_columns), dtype=np.float64)
+    chunk_size = const.SMPS_DECODE_CHUNK_LINES
+    for chunk_start in range(0, len(line_spans), chunk_size):
+        chunk = line_spans[chunk_start:chunk_start + chunk_size]
+        chunk_values = np.fromstring(mm[chunk[0][0]:chunk[-1][1]], dtype=np.float64, sep=" ")
+        if chunk_values.size != len(chunk) * num_columns:
+            raise IOError("SMPS data block does not have %d values on each line" % num_columns)
+        values[chunk_start:chunk_start + len(chunk)] = chunk_values.reshape(len(chunk), num_columns)
+    return values
+
+################
+# Parse Cache  #
+################
+
+
+def load_cached_ccnc_csv(file_path):
+    """
+    Returns the same as :class:`~helper_functions.process_a_ccnc_csv`, but uses the parse cache
+    (see :class:`~helper_functions.load_parse_cache`) when the file has not changed.
+
+    :param str file_path:  The full path name to the csv file to process
+    :return: The date from the first record in the csv followed by the columns of the csv file
+    :rtype: (str, dict[str, ndarray])
+    """
+    cached = load_parse_cache(file_path)
+    if cached is not None:
+        arrays, info = cached
+        return info["date"], arrays
+    date, columns = process_a_ccnc_csv(file_path)
+    store_parse_cache(file_path, columns, {"date": date})
+    return date, columns
+
+
+def load_cached_smps_file(file_path):
+    """
+    Returns the same as :class:`~helper_functions.process_smps_file`, but uses the parse cache
+    (see :class:`~helper_functions.load_parse_cache`) when the file has not changed.
+
+    :param str file_path:  The full path name to the txt file to process
+    :return: The section index and the SMPS data
+    :rtype: (dict, dict)
+    """
+    cached = load_parse_cache(file_path)
+    if cached is not None:
+        smps_data, info = cached
+        sections = info["sections"]
+        # json stores tuples as lists
+        for key in ("start_times", "normalized_concs", "raw_counts"):
+            sections[key] = tuple(sections[key])
+        if sections["start_dates"] is not None:
+            sections["start_dates"] = tuple(sections["start_dates"])
+        sections["metadata"] = {key: tuple(value) for key, value in sections["metadata"].items()}
+        smps_data["start_dates"] = info["start_dates"]
+        smps_data["start_times"] = info["start_times"]
+        smps_data["metadata"] = info["metadata"]
+        return sections, smps_data
+    sections, smps_data = process_smps_file(file_path)
+    arrays = {key: value for key, value in smps_data.items() if isinstance(value, np.ndarray)}
+    store_parse_cache(file_path, arrays, {"sections": sections, "start_dates": smps_data["start_dates"],
+                                          "start_times": smps_data["start_times"], "metadata": smps_data["metadata"]})
+    return sections, smps_data
+
+
+def get_parse_cache_path(file_path):
+    """
+    Returns where the parse cache of a data file is stored.  The cache is a .npz file with the same name as the data
+    file in the :class:`~constants.PARSE_CACHE_FOLDER` folder of the data folder.
+
+    :param str file_path: The full path name to the data file
+    :return: The full path name of the cache file
+    :rtype: str
+    """
+    folder, file_name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(folder, const.PARSE_CACHE_FOLDER, file_name + ".npz")
+
+
+def get_file_key(file_path, content_hash=True):
+    """
+    Creates the key used to determine if a data file has changed since it was cached.
+
+    :param str file_path: The full path name to the data file
+    :param bool content_hash: If True, the sha1 of the contents of the file is included in the key
+    :return: The key with the version of the cache, the path, size, mtime and (optionally) the content hash
+    :rtype: dict
+    """
+    stat = os.stat(file_path)
+    key = {"version": const.PARSE_CACHE_VERSION,
+           "path": os.path.abspath(file_path),
+           "size": stat.st_size,
+           "mtime": stat.st_mtime_ns}
+    if content_hash:
+        sha1 = hashlib.sha1()
+        with open(file_path, "rb") as a_file:
+            for chunk in iter(lambda: a_file.read(1024 * 1024), b""):
+                sha1.update(chunk)
+        key["hash"] = sha1.hexdigest()
+    return key
+
+
+def file_matches_key(file_path, key):
+    """
+    Determines if a data file is unchanged since its key was created (see :class:`~helper_functions.get_file_key`).
+    The size of the file has to match.  If the path and mtime also match the file is not read at all.  Otherwise,
+    such as when the data folder is copied, the content hash of the file has to match as well.
+
+    :param str file_path: The full path name to the data file
+    :param dict key: The key of the file when it was read
+    :return: True if the file exists and is unchanged, otherwise False
+    :rtype: bool
+    """
+    if not os.path.isfile(file_path):
+        return False
+    file_key = get_file_key(file_path, content_hash=False)
+    if key["size"] != file_key["size"]:
+        return False
+    if key["path"] == file_key["path"] and key["mtime"] == file_key["mtime"]:
+        return True
+    return "hash" in key and key["hash"] == get_file_key(file_path)["hash"]
+
+
+def load_parse_cache(file_path):
+    """
+    Loads the parsed arrays of a data file from its parse cache.  The cache is only used if the version and size of
+    the data file match.  If the path and mtime also match the data file is not read at all.  Otherwise, such as when
+    the data folder is copied, the content hash of the data file has to match as well.  A cache that does not match is
+    deleted.
+
+    :param str file_path: The full path name to the data file
+    :return: The cached arrays and the other cached info or None if there is no valid cache
+    :rtype: (dict[str, ndarray], dict)|None
+    """
+    cache_path = get_parse_cache_path(file_path)
+    if not os.path.isfile(cache_path):
+        return None
+    try:
+        with np.load(cache_path, allow_pickle=False) as cache:
+            cached_key = json.loads(str(cache["__key__"]))
+            info = json.loads(str(cache["__info__"]))
+            arrays = {name: cache[name] for name in cache.files if name not in ("__key__", "__info__")}
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning("Unable to read parse cache %s (%s)" % (cache_path, str(e)))
+        remove_parse_cache(cache_path)
+        return None
+    if cached_key["version"] != const.PARSE_CACHE_VERSION or not file_matches_key(file_path, cached_key):
+        remove_parse_cache(cache_path)
+        return None
+    return arrays, info
+
+
+def store_parse_cache(file_path, arrays, info):
+    """
+    Stores the parsed arrays of a data file in its parse cache.  If the cache can not be written, such as on a read
+    only data folder, a warning is logged and the data is simply not cached.
+
+    :param str file_path: The full path name to the data file
+    :param dict[str, ndarray] arrays: The parsed arrays to cache
+    :param dict info: Other parsed values to cache.  Must be json serializable.
+    """
+    cache_path = get_parse_cache_path(file_path)
+    temp_path = cache_path + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(temp_path, "wb") as cache_file:
+            np.savez(cache_file, __key__=json.dumps(get_file_key(file_path)), __info__=json.dumps(info), **arrays)
+        os.replace(temp_path, cache_path)
+    except OSError as e:
+        logger.warning("Unable to write parse cache %s (%s)" % (cache_path, str(e)))
+        remove_parse_cache(temp_path)
+
+
+def remove_parse_cache(cache_path):
+    """
+    Deletes a parse cache file if it exists.
+
+    :param str cache_path: The full path name to the cache file
+    """
+    try:
+        os.remove(cache_path)
+    except OSError:
+        pass
+
+
+def evict_parse_cache(folder):
+    """
+    Deletes the parse caches in a data folder whose data file no longer exists.
+
+    :param str folder: The data folder
+    """
+    cache_folder = os.path.join(folder, const.PARSE_CACHE_FOLDER)
+    if not os.path.isdir(cache_folder):
+        return
+    for cache_name in os.listdir(cache_folder):
+        if not cache_name.endswith(".npz") or not os.path.isfile(os.path.join(folder, cache_name[:-len(".npz")])):
+            remove_parse_cache(os.path.join(cache_folder, cache_name))
+
 ########################
 # Help Math Functions  #
 ########################
@@ -139,12 +989,55 @@ def safe_div(x, y):
     return 0 if y == 0 else x / y
 
 
+def kappa_precision_report(kappa_dict, other_kappa_dict):
+    """
+    Compares the kappa values of the same experiment calculated twice, such as with and without compact storage (see
+    :class:`~scan.ScanStore`).  The kappa points are matched by scan and by their order within the scan, as the
+    supersaturation keys can differ slightly between the two.
+
+    The report has the following keys:
+
+    - **points**: A list of [scan index, dp50, kappa, other kappa, difference] for each matched kappa point
+    - **unmatched**: The number of kappa points that are only in one of the two dictionaries
+    - **max_difference**: The largest absolute difference between the kappa values
+    - **max_relative_difference**: The largest absolute difference relative to the kappa value
+
+    :param dict kappa_dict: The kappa values by supersaturation (see :class:`~controller.Controller`)
+    :param dict other_kappa_dict: The kappa values to compare to
+    :return: The report
+    :rtype: dict
+    """
+    def points_by_scan(a_kappa_dict):
+        points = {}
+        num_points = {}
+        for ss in a_kappa_dict:
+            for scan_index, dp_50, apparent_kappa in (point[:3] for point in a_kappa_dict[ss]):
+                num_points[scan_index] = num_points.get(scan_index, 0) + 1
+                points[(scan_index, num_points[scan_index] - 1)] = (dp_50, apparent_kappa)
+        return points
+
+    points = points_by_scan(kappa_dict)
+    other_points = points_by_scan(other_kappa_dict)
+    report = {"points": [], "unmatched": len(set(points) ^ set(other_points)), "max_difference": 0.0,
+              "max_relative_difference": 0.0}
+    for key in sorted(set(points) & set(other_points)):
+        dp_50, kappa = points[key]
+        other_kappa = other_points[key][1]
+        difference = abs(kappa - other_kappa)
+        report["points"].append([key[0], dp_50, kappa, other_kappa, difference])
+        report["max_difference"] = max(report["max_difference"], difference)
+        report["max_relative_difference"] = max(report["max_relative_difference"], safe_div(difference, abs(kappa)))
+    return report
+
+
 def normalize_dndlogdp_list(a_list):  # DOCQUESTION naming again
     """
     Normalize the data is a_list by finding the max value of the values in the list while ignoring the first 5 values.
     The assumption is that the first few data points are probably not quite right so normalization is only based
     on the max of later points.
 
+    The list is not changed, so it can be a view of data shared with other scans.
+
     :param list[float] a_list: A list of values to normalize
     :return: The normalized list
     :rtype: list[float]
@@ -152,10 +1045,7 @@ def normalize_dndlogdp_list(a_list):  # DOCQUESTION naming again
     max_value = max(a_list[5:])  # DOCQUESTION Magic Number, can this be something else?
     if max_value == 0:  # DOCQUESTION Are they always postive?
         return a_list
-    for x in range(len(a_list)):  # QUESTION BK: Is there any dis/advantagous to manually done?
-        if a_list[x]:
-            a_list[x] /= max_value
-    return np.asarray(a_list)
+    return np.asarray(a_list, dtype=np.float64) / max_value
 
 
 ############################
@@ -226,10 +1116,38 @@ def resolve_small_ccnc_vals(ccnc_vals):
     return ccnc_vals
 
 
-def smooth(a_list, window_length, polyorder):
+@functools.lru_cache(maxsize=None)
+def get_savgol_kernel(window_length, polyorder):
+    """
+    Returns the coefficients of a Savitzky-Golay filter (see `scipy.signal.savgol_coeffs`) and the matrices that fit
+    a polynomial to the first and last window of the data and evaluate it at the edges, as `scipy.signal.savgol_filter`
+    does in its default `"interp"` mode.  The kernel of each window length and order is only calculated once.
+
+    :param int window_length: The length of the filter window.  Must be a positive odd integer.
+    :param int polyorder: The order of the polynomial used to fit the samples.  Must be less than `window_length`.
+    :return: The filter coefficients, and the matrices of shape (window_length // 2, window_length) that give the
+             first and the last window_length // 2 smoothed values from the first and the last window of the data.
+             The arrays are read only as they are shared.
+    :rtype: (ndarray, ndarray, ndarray)
+    """
+    coeffs = scipy.signal.savgol_coeffs(window_length, polyorder)
+    half_length = window_length // 2
+    vander = np.vander(np.arange(window_length, dtype=np.float64), polyorder + 1)
+    fit = np.linalg.pinv(vander)
+    first_edge = vander[:half_length].dot(fit)
+    last_edge = vander[window_length - half_length:].dot(fit)
+    for array in (coeffs, first_edge, last_edge):
+        array.flags.writeable = False
+    return coeffs, first_edge, last_edge
+
+
+def smooth(a_list, window_length, polyorder, axis=-1):
     """
     Takes a list and smooths it using a Savitzky-Golay filter.  If an error occurs, the original list is returned.
 
+    A matrix, such as the counts of many scans, is smoothed along the axis in one call.  The filter coefficients are
+    calculated once for each window length and order (see :class:`~helper_functions.get_savgol_kernel`).
+
     Filter settings are:
 
     - The length of the filter window: 5
@@ -241,23 +1159,111 @@ def smooth(a_list, window_length, polyorder):
                               `window_length` must be less than or equal to the size of `x`.
     :param int polyorder: The order of the polynomial used to fit the samples.
                           `polyorder` must be less than `window_length`.
+    :param int axis: The axis of a matrix to smooth along
     :return: The smoothed list if it could be smoothed
     :rtype: ndarray
     """
     # TODO issues/48 if a_list is short than 5, there will be an error - Put in tests for all the restrictions above
     try:
-        with warnings.catch_warnings():
-            warnings.simplefilter(action="ignore", category=FutureWarning)
-            a_list = scipy.signal.savgol_filter(a_list,  window_length, polyorder)
-        # TODO issues/49 FutureWarning: Using a non-tuple sequence for multidimensional indexing is deprecated;
-        # use `arr[tuple(seq)]` instead of `arr[seq]`. In the future this will be interpreted as an array
-        # index, `arr[np.array(seq)]`, which will result either in an error or a different result.  = a[a_slice]
+        values = np.asarray(a_list, dtype=np.float64)
+        if values.shape[axis] < window_length:
+            raise ValueError("The window length %d is larger than the %d values to smooth"
+                             % (window_length, values.shape[axis]))
+        coeffs, first_edge, last_edge = get_savgol_kernel(window_length, polyorder)
+        smoothed = scipy.ndimage.convolve1d(values, coeffs, axis=axis, mode="constant")
+        # The convolution needs values past the edges, so the edges are fitted with a polynomial instead
+        half_length = window_length // 2
+        values = np.moveaxis(values, axis, -1)
+        moved = np.moveaxis(smoothed, axis, -1)
+        # Summed per value so a row is smoothed the same alone or in a matrix
+        first_window = values[..., np.newaxis, :window_length]
+        last_window = values[..., np.newaxis, -window_length:]
+        moved[..., :half_length] = (first_window * first_edge).sum(axis=-1)
+        moved[..., moved.shape[-1] - half_length:] = (last_window * last_edge).sum(axis=-1)
+        a_list = smoothed
     except Exception as e:
         logger.error(e, exc_info=True)
         pass
     return a_list
 
 
+def smooth_lists(a_lists, window_length, polyorder):
+    """
+    Smooths many lists, such as the counts of each scan, with a Savitzky-Golay filter (see
+    :class:`~helper_functions.smooth`).  The lists with the same length are smoothed as one matrix.
+
+    :param list[ndarray] a_lists: The lists to smooth
+    :param int window_length: The length of the filter window
+    :param int polyorder: The order of the polynomial used to fit the samples
+    :return: The smoothed lists in the same order
+    :rtype: list[ndarray]
+    """
+    indexes_by_length = {}
+    for i, a_list in enumerate(a_lists):
+        indexes_by_length.setdefault(len(a_list), []).append(i)
+    smoothed_lists = [None] * len(a_lists)
+    for indexes in indexes_by_length.values():
+        smoothed = smooth(np.array([a_lists[i] for i in indexes], dtype=np.float64), window_length, polyorder)
+        for i, smoothed_list in zip(indexes, smoothed):
+            smoothed_lists[i] = smoothed_list
+    return smoothed_lists
+
+
+def find_second_boundaries(raw_times, err=0.01):
+    """
+    Finds the raw SMPS data rows that end each second of a scan.  The rows of second n end at the first row after the
+    end of second n - 1 with a time equal to n, compared with :class:`~helper_functions.are_floats_equal`.  The search
+    stops at the first second that is missing, so the rows after the last boundary are not part of any second.
+
+    :param ndarray raw_times: The time of each raw data row
+    :param float err: Amount of allowable difference when comparing a time to a whole second
+    :return: The index of the last row of each second
+    :rtype: ndarray
+    """
+    raw_times = np.asarray(raw_times, dtype=np.float64)
+    whole_seconds = np.rint(raw_times)
+    # Only the rows on a whole second can end a second, so only those are searched in order
+    candidates = np.flatnonzero(np.abs(raw_times - whole_seconds) < err)
+    boundaries = []
+    target_time = 1
+    for row in candidates:
+        if abs(raw_times[row] - target_time) < err:
+            boundaries.append(row)
+            target_time += 1
+    return np.array(boundaries, dtype=np.intp)
+
+
+def sum_smps_seconds(raw_times, raw_diameters, raw_counts):
+    """
+    Sums the raw SMPS counts of every scan into one value per second and finds the count weighted average diameter of
+    each second across all the scans.  The diameters and counts are the two planes of the (rows, scans, 2) raw data
+    block.  Each second is reduced with :func:`numpy.add.reduceat`, so no row is visited in python.
+
+    If no particles were counted in a second, its average diameter is the diameter of the first scan on the last row
+    of the second.
+
+    :param ndarray raw_times: The time of each raw data row
+    :param ndarray raw_diameters: The diameters as a matrix of shape (raw data rows, scans)
+    :param ndarray raw_counts: The counts as a matrix of shape (raw data rows, scans)
+    :return: The counts of each second as a matrix of shape (seconds, scans) and the average diameter of each second
+    :rtype: (ndarray, ndarray)
+    """
+    boundaries = find_second_boundaries(raw_times)
+    num_scans = raw_counts.shape[1]
+    if len(boundaries) == 0:
+        return np.zeros((0, num_scans), dtype=np.int64), np.zeros(0, dtype=np.float64)
+    num_rows = boundaries[-1] + 1
+    starts = np.concatenate(([0], boundaries[:-1] + 1))
+    counts = np.add.reduceat(raw_counts[:num_rows], starts, axis=0)
+    # Sum the weighted diameters of each second row by row and scan by scan
+    weighted_diameters = (raw_diameters[:num_rows] * raw_counts[:num_rows]).ravel()
+    sum_diameters = np.add.reduceat(weighted_diameters, starts * num_scans)
+    total_counts = counts.sum(axis=1)
+    ave_diameters = raw_diameters[boundaries, 0].astype(np.float64)
+    np.divide(sum_diameters, total_counts, out=ave_diameters, where=total_counts != 0)
+    return counts, ave_diameters
+
+
 ################
 # Code Helpers #
 ################
@@ -295,6 +1301,46 @@ def get_correct_num(a_list, number, bigger=True):
             num = a_list[i]
     return a_list[-1], len(a_list) - 1
 
+
+class IntervalIndex(object):
+    """
+    Finds which intervals, such as the time span of each scan, overlap a range with binary searches.  The intervals are
+    kept sorted by their start along with the running maximum of their ends, so both ends of the range can be found
+    with :func:`numpy.searchsorted` even if an interval ends after the next one starts.
+
+    Stores the following variables:
+
+    - **order**: The original index of each interval in start order
+    - **starts**: The start of each interval in start order
+    - **ends**: The end of each interval in start order
+    - **max_ends**: The latest end of the intervals up to and including each interval
+
+    :param list[int] starts: The start of each interval
+    :param list[int] ends: The end of each interval
+    """
+    def __init__(self, starts, ends):
+        starts = np.asarray(starts, dtype=np.int64)
+        self.order = np.argsort(starts, kind="mergesort")
+        self.starts = starts[self.order]
+        self.ends = np.asarray(ends, dtype=np.int64)[self.order]
+        self.max_ends = np.maximum.accumulate(self.ends) if len(self.ends) > 0 else self.ends
+
+    def overlapping(self, start, end):
+        """
+        Finds the intervals that overlap the range [start, end).
+
+        :param int start: The start of the range
+        :param int end: The end of the range
+        :return: The original indexes of the overlapping intervals in ascending order
+        :rtype: ndarray
+        """
+        # Every interval before first ends at or before the start of the range
+        first = np.searchsorted(self.max_ends, start, side="right")
+        # Every interval from last on starts at or after the end of the range
+        last = np.searchsorted(self.starts, end, side="left")
+        candidates = np.arange(first, max(first, last))
+        return np.sort(self.order[candidates[self.ends[candidates] > start]])
+
 # Breaking backwards compatibility until the new workflow arrives
 # class CustomUnpickler(object, pickle.Unpickler):
 #     """
@@ -4,6 +4,7 @@ The main entry point of the program
 # External Packages
 import datetime
 import logging
+import multiprocessing
 import os
 import PySide2.QtCore as Qc
 import PySide2.QtGui as Qg
@@ -110,10 +111,12 @@ class MainView(Qw.QMainWindow):  # REVIEW Code Class
         save_action = Qw.QAction('&Save Project', self, shortcut="Ctrl+S", triggered=self.save_project)
         save_as_action = Qw.QAction('Save Project &As', self, triggered=self.save_project_as)
         export_data_action = Qw.QAction('Export &Kappa Data', self, triggered=self.export_project_data)
+        export_precision_action = Qw.QAction('Export Kappa &Precision Report', self,
+                                             triggered=self.export_kappa_precision_report)
         exit_action = Qw.QAction('&Exit', self, shortcut="Ctrl+E", triggered=self.exit_run)
         file_menu.addAction(new_action)
         file_menu.addSeparator()
-        file_menu.addActions([open_action, save_action, save_as_action, export_data_action])
+        file_menu.addActions([open_action, save_action, save_as_action, export_data_action, export_precision_action])
         file_menu.addSeparator()
         file_menu.addAction(exit_action)
         self.menuBar().addMenu(file_menu)
@@ -176,6 +179,7 @@ class MainView(Qw.QMainWindow):  # REVIEW Code Class
             file_action_list[3].setDisabled(True)  # Disable Save Project
             file_action_list[4].setDisabled(True)  # Disable Save Project As
             file_action_list[5].setDisabled(True)  # Disable Export Kappa Data
+            file_action_list[6].setDisabled(True)  # Disable Export Kappa Precision Report
             # action menu
             self.action_menu.setDisabled(True)
             # window menu
@@ -277,6 +281,22 @@ class MainView(Qw.QMainWindow):  # REVIEW Code Class
             # Save files
             self.controller.export_project_data(export_file)
 
+    def export_kappa_precision_report(self):
+        """
+        Exports the comparison of the kappa values of the project with the kappa values calculated in the other
+        storage mode (see :class:`~controller.Controller.export_kappa_precision_report`)
+        """
+        file_name = self.controller.project_folder + "/kappa_precision_"
+        file_name += self.controller.get_project_name() + ".csv"
+        # noinspection PyCallByClass
+        export_file = Qw.QFileDialog.getSaveFileName(self, "Save file", file_name, "*.csv")[0]
+        if export_file:
+            # append file extention if neccessary
+            if not export_file.endswith(".csv"):
+                export_file += ".csv"
+            # Save files
+            self.controller.export_kappa_precision_report(export_file)
+
     def closeEvent(self, event):
         """
         Overwrites base closeEvent function to execute the :class:`~main.MainView.exit_run` method.
@@ -715,20 +735,31 @@ class MainView(Qw.QMainWindow):  # REVIEW Code Class
         self.scaninfo_docker_widget.update_experiment_info()
         self.sigmoid_docker_widget.update_experiment_info()
 
-    def update_scan_info_and_graphs(self):
+    def update_scan_info_and_graphs(self, stage=None):
         """
-        Updates the graphs, scan information docker widget and sigmoid docker widget
+        Updates the graphs, scan information docker widget and sigmoid docker widget.  Each one shows the data of a
+        stage of the scan (see :class:`~scan.Scan.STAGES`), which is computed first if it is stale
+        (see :class:`~controller.Controller.refresh_scan`).
+
+        :param str stage: The stage of the current scan that changed.  Only the parts showing this stage or a stage
+                          computed from it are updated.  If None, everything is updated.
         """
         # Get the current scan's information
-        a_scan = self.controller.scans[self.controller.curr_scan_index]
-        # Update the graphs
-        self.raw_conc_time_graph.update_graph(a_scan)
-        self.smoothed_conc_time_graph.update_graph(a_scan)
-        self.ratio_dp_graph.update_graph(a_scan)
-        self.temp_graph.update_graph(a_scan)
-        # Update the docker widgets
-        self.scaninfo_docker_widget.update_scan_info()
-        self.sigmoid_docker_widget.update_scan_info()
+        index = self.controller.curr_scan_index
+        a_scan = self.controller.scans[index]
+        # The raw data graph does not show any stage, so it only changes with the scan
+        parts = [(None, self.raw_conc_time_graph.update_graph, (a_scan,)),
+                 ("processed", self.smoothed_conc_time_graph.update_graph, (a_scan,)),
+                 ("sigmoid", self.ratio_dp_graph.update_graph, (a_scan,)),
+                 ("processed", self.temp_graph.update_graph, (a_scan,)),
+                 ("processed", self.scaninfo_docker_widget.update_scan_info, ()),
+                 ("sigmoid", self.sigmoid_docker_widget.update_scan_info, ())]
+        for part_stage, update, args in parts:
+            if stage is None or (part_stage is not None and
+                                 a_scan.STAGES.index(stage) <= a_scan.STAGES.index(part_stage)):
+                if part_stage is not None:
+                    self.controller.refresh_scan(index, part_stage)
+                update(*args)
 
     def update_kappa_graph(self):
         """
@@ -742,6 +773,7 @@ class MainView(Qw.QMainWindow):  # REVIEW Code Class
         # REVIEW Documentation
         """
         # COMBAKL Kappa
+        self.controller.refresh_kappa_values()
         if self.window_menu.actions()[0].isChecked():
             self.window_menu.actions()[0].trigger()
         if self.window_menu.actions()[1].isChecked():
@@ -768,6 +800,8 @@ class MainView(Qw.QMainWindow):  # REVIEW Code Class
 
 
 if __name__ == "__main__":
+    # Required for the process pools when running in a |PyInstaller| bundle
+    multiprocessing.freeze_support()
     # setup debugger
     logger.info("=================================================")
     logger.info("=================================================")
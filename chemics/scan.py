@@ -4,6 +4,7 @@ This class creates a scan object stores the data from a single scan.
 # External Packages
 import logging
 import numpy as np
+import scipy.special
 import scipy.stats
 
 # Internal Packages
@@ -16,6 +17,641 @@ import helper_functions as hf
 logger = logging.getLogger("scan")
 
 
+class ScanStore(object):
+    """
+    Holds the data of every scan of an experiment.  Each channel, such as raw_T1s or processed_smps_counts, is one
+    contiguous 2D float64 array with a row for each scan, so operations on the whole experiment can work on the
+    arrays directly.  As the scans can have a different number of values in a channel, such as the raw CCNC data of
+    the last scan, each scan uses the start of its row and the number of values of each scan is kept per channel.
+
+    The diameter midpoints are the same for every scan and are stored once.
+
+    In compact mode the raw and processed channels are float32, which halves their memory as the instruments only
+    have 4 to 5 significant digits.  The corrected channels stay float64 and the numerically sensitive code, such as
+    the charge correction and the sigmoid fitting, promotes the values it uses to float64.
+
+    The processed CCNC channels are not stored.  They are the raw CCNC channels shifted by the shift factor of each
+    scan, so each one is a read only view of a zero padded copy of its raw channel starting at the shift
+    (see :class:`~scan.ScanStore.get_shifted_values`).  Changing a shift factor only moves the start of the view.
+
+    Stores the following variables:
+
+    - **num_scans**: The number of scans, which is the number of rows of each channel
+    - **compact**: Whether the raw and processed channels are float32
+    - **channels**: The 2D array of each channel by name
+    - **lengths**: The number of values of each scan in each channel by name
+    - **diameter_midpoints**: The diameter midpoints shared by all scans
+    - **shifts**: The shift applied to the raw CCNC channels of each scan
+    - **shifted_lengths**: The number of values of each scan in the shifted channels
+    - **padded**: The zero padded copy of each shifted raw channel and the size of its padding by name.  A copy is
+      created when it is first needed and dropped when its raw channel is set.
+    - **versions**: The version of the values of each scan in each channel by name.  It goes up each time the
+      values of the scan are set.
+    - **smoothed**: The smoothed values of a scan by channel name, row, window length and order, with the version of
+      the values they were smoothed from (see :class:`~scan.ScanStore.get_smoothed`)
+
+    :param int num_scans: The number of scans in the experiment
+    """
+    #: The names of the channels with a row for each scan
+    CHANNELS = ("raw_normalized_concs", "raw_smps_counts", "ave_smps_diameters", "raw_super_sats", "raw_T1s",
+                "raw_T2s", "raw_T3s", "raw_ccnc_counts", "raw_ccnc_count_sums", "raw_ccnc_sample_flow",
+                "raw_ave_ccnc_sizes", "processed_smps_counts", "processed_normalized_concs",
+                "corrected_smps_counts", "corrected_ccnc_counts")
+    #: The channels kept as float64 in compact mode.  They are the results of the charge correction.
+    FULL_PRECISION_CHANNELS = ("corrected_smps_counts", "corrected_ccnc_counts")
+    #: The raw channel each shifted channel is a view of
+    SHIFTED_CHANNELS = {"processed_ccnc_counts": "raw_ccnc_counts",
+                        "processed_ccnc_count_sums": "raw_ccnc_count_sums",
+                        "processed_ccnc_sample_flow": "raw_ccnc_sample_flow",
+                        "processed_T1s": "raw_T1s",
+                        "processed_T2s": "raw_T2s",
+                        "processed_T3s": "raw_T3s",
+                        "processed_super_sats": "raw_super_sats",
+                        "processed_ave_ccnc_sizes": "raw_ave_ccnc_sizes"}
+
+    def __init__(self, num_scans, compact=False):
+        self.num_scans = num_scans
+        self.compact = compact
+        self.channels = {name: np.zeros((num_scans, 0), dtype=self.get_dtype(name)) for name in self.CHANNELS}
+        self.lengths = {name: np.zeros(num_scans, dtype=np.intp) for name in self.CHANNELS}
+        self.diameter_midpoints = np.zeros(0, dtype=np.float64)
+        self.shifts = np.zeros(num_scans, dtype=np.intp)
+        self.shifted_lengths = np.zeros(num_scans, dtype=np.intp)
+        self.padded = {}
+        self.versions = {name: np.zeros(num_scans, dtype=np.int64) for name in self.CHANNELS}
+        self.smoothed = {}
+
+    def __getstate__(self):
+        """
+        Returns the variables of the store to pickle.  The padded copies and the smoothed values are not pickled as
+        they can be recreated.
+
+        :return: The variables stored in the store
+        :rtype: dict
+        """
+        state = self.__dict__.copy()
+        state["padded"] = {}
+        state["smoothed"] = {}
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restores the variables of the store from a pickle.  Stores pickled before the values were versioned start at
+        version zero.
+
+        :param dict state: The variables stored in the store
+        """
+        self.__dict__.update(state)
+        if "versions" not in state:
+            self.versions = {name: np.zeros(self.num_scans, dtype=np.int64) for name in self.CHANNELS}
+            self.smoothed = {}
+
+    def get_dtype(self, name):
+        """
+        Returns the data type of a channel.
+
+        :param str name: The name of the channel
+        :return: float32 for the raw and processed channels in compact mode, otherwise float64
+        :rtype: type
+        """
+        if self.compact and name not in self.FULL_PRECISION_CHANNELS:
+            return np.float32
+        return np.float64
+
+    def get_values(self, name, row):
+        """
+        Returns the values of a scan in a channel.  The values are a view of the row of the scan, so changing them
+        changes the store.
+
+        :param str name: The name of the channel
+        :param int row: The row of the scan
+        :return: The values of the scan
+        :rtype: ndarray
+        """
+        return self.channels[name][row, :self.lengths[name][row]]
+
+    def set_values(self, name, row, values):
+        """
+        Copies the values of a scan into its row of a channel.  The channel is made wider if the values do not fit.
+
+        :param str name: The name of the channel
+        :param int row: The row of the scan
+        :param ndarray|list[float] values: The values of the scan
+        """
+        values = np.asarray(values, dtype=self.get_dtype(name))
+        self.reserve(name, len(values))
+        self.channels[name][row, :len(values)] = values
+        self.lengths[name][row] = len(values)
+        self.versions[name][row] += 1
+        self.padded.pop(name, None)
+
+    def set_all_values(self, name, values):
+        """
+        Copies the values of every scan into a channel at once.
+
+        :param str name: The name of the channel
+        :param ndarray values: The values as a matrix of shape (scans, values)
+        """
+        values = np.array(values, dtype=self.get_dtype(name), order="C", ndmin=2)
+        if values.shape[0] != self.num_scans:
+            raise ValueError("Expected values for %d scans, got %d" % (self.num_scans, values.shape[0]))
+        self.channels[name] = values
+        self.lengths[name][:] = values.shape[1]
+        self.versions[name] += 1
+        self.padded.pop(name, None)
+
+    def reserve(self, name, width):
+        """
+        Makes a channel at least width values wide.  The values already stored are kept.
+
+        :param str name: The name of the channel
+        :param int width: The number of values each row must be able to hold
+        """
+        channel = self.channels[name]
+        if channel.shape[1] < width:
+            wider_channel = np.zeros((self.num_scans, width), dtype=channel.dtype)
+            wider_channel[:, :channel.shape[1]] = channel
+            self.channels[name] = wider_channel
+            self.padded.pop(name, None)
+
+    def set_shift(self, row, shift, length):
+        """
+        Sets the shift applied to the raw CCNC channels of a scan.  No values are copied.
+
+        :param int row: The row of the scan
+        :param int shift: The number of values to drop from the start of the raw channels.  If negative, zeros are
+                          put in front instead.
+        :param int length: The number of values of the shifted channels, which is the duration of the scan
+        """
+        self.shifts[row] = shift
+        self.shifted_lengths[row] = length
+
+    def get_shifted_values(self, name, row):
+        """
+        Returns the values of a scan in a shifted channel.  Value i is value i + shift of the raw channel, or zero if
+        there is no such value, the same as dropping or padding the start of the raw values and padding the end with
+        zeros.  The values are a read only view, so no values are copied.
+
+        The raw channel must be set with :class:`~scan.ScanStore.set_values` or
+        :class:`~scan.ScanStore.set_all_values` for the view to see the change.
+
+        :param str name: The name of the shifted channel
+        :param int row: The row of the scan
+        :return: The shifted values of the scan
+        :rtype: ndarray
+        """
+        length = self.shifted_lengths[row]
+        padded, padding = self.get_padded(self.SHIFTED_CHANNELS[name], length)
+        # Shifts past either end of the raw values start in the zeros of the padding
+        start = min(max(padding + self.shifts[row], 0), padded.shape[1] - length)
+        return padded[row, start:start + length]
+
+    def set_shifts(self, rows, shifts, lengths):
+        """
+        Sets the shifts applied to the raw CCNC channels of many scans at once.  No values are copied.
+
+        :param ndarray rows: The rows of the scans
+        :param ndarray shifts: The shift of each scan (see :class:`~scan.ScanStore.set_shift`)
+        :param ndarray lengths: The number of values of the shifted channels of each scan
+        """
+        self.shifts[rows] = shifts
+        self.shifted_lengths[rows] = lengths
+
+    def get_all_shifted_values(self, name, rows):
+        """
+        Gathers the shifted values of many scans in a shifted channel into one matrix.  Row i of the matrix holds the
+        values of rows[i] (see :class:`~scan.ScanStore.get_shifted_values`) followed by zeros up to the length of the
+        longest scan.  Unlike :class:`~scan.ScanStore.get_shifted_values` the matrix is a copy.
+
+        :param str name: The name of the shifted channel
+        :param ndarray rows: The rows of the scans
+        :return: The shifted values as a matrix of shape (rows, values)
+        :rtype: ndarray
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        lengths = self.shifted_lengths[rows]
+        max_length = int(lengths.max()) if len(rows) > 0 else 0
+        padded, padding = self.get_padded(self.SHIFTED_CHANNELS[name], max_length)
+        starts = np.minimum(np.maximum(padding + self.shifts[rows], 0), padded.shape[1] - lengths)
+        columns = starts[:, np.newaxis] + np.arange(max_length)
+        in_scan = np.arange(max_length) < lengths[:, np.newaxis]
+        columns = np.where(in_scan, columns, 0)
+        return np.where(in_scan, padded[rows[:, np.newaxis], columns], 0)
+
+    def copy_rows(self, source, target, rows):
+        """
+        Copies the values of many scans from one channel to another.
+
+        :param str source: The name of the channel to copy from
+        :param str target: The name of the channel to copy to
+        :param ndarray rows: The rows of the scans
+        """
+        width = self.channels[source].shape[1]
+        self.reserve(target, width)
+        self.channels[target][rows, :width] = self.channels[source][rows]
+        self.lengths[target][rows] = self.lengths[source][rows]
+        self.versions[target][rows] += 1
+        self.padded.pop(target, None)
+
+    def get_padded(self, name, padding):
+        """
+        Returns a copy of a raw channel with at least padding zeros before and after the values of each scan.  The
+        copy is created once and reused until the raw channel is set.
+
+        :param str name: The name of the raw channel
+        :param int padding: The least number of zeros needed on each side
+        :return: The read only padded copy and the number of zeros on each side
+        :rtype: (ndarray, int)
+        """
+        if name in self.padded and self.padded[name][1] >= padding:
+            return self.padded[name]
+        channel = self.channels[name]
+        width = channel.shape[1]
+        padded = np.zeros((self.num_scans, padding + width + padding), dtype=channel.dtype)
+        # Only the values of each scan are copied.  The rest of its row may hold older values.
+        in_scan = np.arange(width) < self.lengths[name][:, np.newaxis]
+        padded[:, padding:padding + width] = np.where(in_scan, channel, 0)
+        padded.flags.writeable = False
+        self.padded[name] = (padded, padding)
+        return self.padded[name]
+
+    def get_version(self, name, row):
+        """
+        Returns the version of the values of a scan in a channel.  For a shifted channel the version includes the
+        shift, as moving the shift changes the values without setting them.
+
+        :param str name: The name of the channel
+        :param int row: The row of the scan
+        :return: A value that changes each time the values of the scan change
+        :rtype: tuple
+        """
+        if name in self.SHIFTED_CHANNELS:
+            raw_name = self.SHIFTED_CHANNELS[name]
+            return self.versions[raw_name][row], self.shifts[row], self.shifted_lengths[row]
+        return self.versions[name][row], self.lengths[name][row]
+
+    def get_smoothed(self, name, row, window_length, polyorder):
+        """
+        Returns the values of a scan in a channel smoothed with a Savitzky-Golay filter (see
+        :class:`~helper_functions.smooth`).  The result is kept until the values of the scan change, so showing the
+        same scan again does not smooth it again.
+
+        :param str name: The name of the channel, which may be a shifted channel
+        :param int row: The row of the scan
+        :param int window_length: The length of the filter window
+        :param int polyorder: The order of the polynomial used to fit the samples
+        :return: The read only smoothed values of the scan
+        :rtype: ndarray
+        """
+        return self.smooth_rows(name, [row], window_length, polyorder)[0]
+
+    def smooth_rows(self, name, rows, window_length, polyorder):
+        """
+        Returns the smoothed values of many scans in a channel (see :class:`~scan.ScanStore.get_smoothed`).  The scans
+        that are not already smoothed are smoothed as one matrix per number of values.
+
+        :param str name: The name of the channel, which may be a shifted channel
+        :param list[int]|ndarray rows: The rows of the scans
+        :param int window_length: The length of the filter window
+        :param int polyorder: The order of the polynomial used to fit the samples
+        :return: The read only smoothed values of each scan
+        :rtype: list[ndarray]
+        """
+        rows = [int(row) for row in rows]
+        versions = {row: self.get_version(name, row) for row in rows}
+        # Group the rows that need smoothing by their number of values
+        rows_by_length = {}
+        for row in rows:
+            cached = self.smoothed.get((name, row, window_length, polyorder))
+            if cached is None or cached[0] != versions[row]:
+                rows_by_length.setdefault(int(versions[row][-1]), []).append(row)
+        for length, length_rows in rows_by_length.items():
+            if name in self.SHIFTED_CHANNELS:
+                values = self.get_all_shifted_values(name, length_rows)
+            else:
+                values = self.channels[name][length_rows, :length]
+            smoothed = np.array(hf.smooth(values, window_length, polyorder, axis=1), dtype=np.float64)
+            smoothed.flags.writeable = False
+            for i, row in enumerate(length_rows):
+                self.smoothed[(name, row, window_length, polyorder)] = (versions[row], smoothed[i])
+        return [self.smoothed[(name, row, window_length, polyorder)][1] for row in rows]
+
+
+class ScanSimilarity(object):
+    """
+    Compares the distributions of the raw SMPS counts of many scans at once, the same way as
+    :class:`~scan.Scan.compare_smps`.  The results are kept, so comparing a pair of scans again is free.
+
+    - The Pearson correlation coefficients of all the pairs of scans are one matrix product of the normalized raw SMPS
+      counts, and their two-tailed p-values are calculated from the coefficients as in `scipy.stats.pearsonr`.
+    - The Kolmogorov-Smirnov statistics of a batch of pairs are calculated together by sorting the counts of each pair
+      once.  The p-value only depends on the statistic and the number of counts of the two scans, so it is calculated
+      with `scipy.stats.ks_2samp` once for each different statistic.
+
+    Stores the following variables:
+
+    - **values**: The raw SMPS counts of each scan as float64, one row per scan
+    - **lengths**: The number of raw SMPS counts of each scan
+    - **sums**: The sum of the raw SMPS counts of each scan
+    - **pearson_p_values**: The matrix of Pearson p-values, or None until it is needed
+    - **ks_p_values**: The Kolmogorov-Smirnov p-value of each compared pair of scans
+    - **ks_p_values_by_statistic**: The Kolmogorov-Smirnov p-value of each statistic and numbers of counts
+
+    :param list[Scan] scans: The scans to compare, which share one :class:`~scan.ScanStore`
+    """
+    def __init__(self, scans):
+        rows = np.array([a_scan.row for a_scan in scans], dtype=np.intp)
+        store = scans[0].store if len(scans) > 0 else ScanStore(0)
+        self.values = store.channels["raw_smps_counts"][rows].astype(np.float64)
+        self.lengths = store.lengths["raw_smps_counts"][rows]
+        in_scan = np.arange(self.values.shape[1]) < self.lengths[:, np.newaxis]
+        self.values[~in_scan] = 0
+        self.sums = self.values.sum(axis=1)
+        self.pearson_p_values = None
+        self.ks_p_values = {}
+        self.ks_p_values_by_statistic = {}
+
+    def get_pearson_p_values(self):
+        """
+        Returns the two-tailed p-values of the Pearson correlation coefficients of all the pairs of scans.  Pairs whose
+        scans have a different number of counts, or whose counts are constant, are NaN.
+
+        :return: The p-values as a matrix of shape (scans, scans)
+        :rtype: ndarray
+        """
+        if self.pearson_p_values is None:
+            num_counts = self.values.shape[1]
+            centered = self.values - (self.values.sum(axis=1) / num_counts)[:, np.newaxis]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                normalized = centered / np.sqrt((centered ** 2).sum(axis=1))[:, np.newaxis]
+                corr_coefs = np.clip(normalized.dot(normalized.T), -1.0, 1.0)
+                ab = num_counts / 2.0 - 1
+                p_values = 2 * scipy.special.betainc(ab, ab, 0.5 * (1 - np.abs(corr_coefs)))
+            full_length = self.lengths == num_counts
+            p_values[~(full_length[:, np.newaxis] & full_length)] = np.nan
+            self.pearson_p_values = p_values
+        return self.pearson_p_values
+
+    def get_ks_p_values(self, pairs):
+        """
+        Returns the two-tailed p-values of the two sample Kolmogorov-Smirnov statistics of pairs of scans.  The pairs
+        not compared before are calculated together.
+
+        :param ndarray pairs: The index of the two scans of each pair as an array of shape (pairs, 2)
+        :return: The p-value of each pair
+        :rtype: ndarray
+        """
+        pairs = np.asarray(pairs, dtype=np.intp).reshape(-1, 2)
+        new_pairs = np.array(sorted({tuple(pair) for pair in pairs.tolist()} - set(self.ks_p_values)),
+                             dtype=np.intp).reshape(-1, 2)
+        lengths = self.lengths[new_pairs]
+        for length_1, length_2 in {tuple(pair_lengths) for pair_lengths in lengths.tolist()}:
+            same_lengths = new_pairs[(lengths[:, 0] == length_1) & (lengths[:, 1] == length_2)]
+            statistics = self.get_ks_statistics(same_lengths, length_1, length_2)
+            for pair, statistic in zip(same_lengths.tolist(), statistics):
+                key = (statistic, length_1, length_2)
+                if key not in self.ks_p_values_by_statistic:
+                    self.ks_p_values_by_statistic[key] = scipy.stats.ks_2samp(self.values[pair[0], :length_1],
+                                                                              self.values[pair[1], :length_2])[1]
+                self.ks_p_values[tuple(pair)] = self.ks_p_values_by_statistic[key]
+        return np.array([self.ks_p_values[tuple(pair)] for pair in pairs.tolist()], dtype=np.float64)
+
+    def get_ks_statistics(self, pairs, length_1, length_2):
+        """
+        Calculates the two sided Kolmogorov-Smirnov statistics, the largest distance between the empirical
+        distribution functions of the two scans, of pairs of scans with the same numbers of counts.
+
+        :param ndarray pairs: The index of the two scans of each pair as an array of shape (pairs, 2)
+        :param int length_1: The number of counts of the first scan of each pair
+        :param int length_2: The number of counts of the second scan of each pair
+        :return: The statistic of each pair
+        :rtype: ndarray
+        """
+        counts = np.concatenate((self.values[pairs[:, 0], :length_1], self.values[pairs[:, 1], :length_2]), axis=1)
+        order = np.argsort(counts, axis=1, kind="mergesort")
+        counts = np.take_along_axis(counts, order, axis=1)
+        from_first = order < length_1
+        # The distribution functions at each count, which are only complete at the last of equal counts
+        cdf_differences = np.abs(np.cumsum(from_first, axis=1) / length_1 - np.cumsum(~from_first, axis=1) / length_2)
+        last_of_equal = np.ones(counts.shape, dtype=bool)
+        last_of_equal[:, :-1] = counts[:, 1:] != counts[:, :-1]
+        return np.where(last_of_equal, cdf_differences, 0).max(axis=1, initial=0)
+
+    def compare_smps(self, pairs):
+        """
+        Compares the distributions of pairs of scans (see :class:`~scan.Scan.compare_smps`).
+
+        :param ndarray pairs: The index of the two scans of each pair as an array of shape (pairs, 2)
+        :return: True for each pair whose correlation coefficient p-value is less than 0.05 **and** whose
+                 Kolmogorov-Smirnov p-value is greater than 0.05
+        :rtype: ndarray
+        """
+        pairs = np.asarray(pairs, dtype=np.intp).reshape(-1, 2)
+        # Ensure there is SMPS data.
+        has_data = (self.sums[pairs[:, 0]] != 0) & (self.sums[pairs[:, 1]] != 0)
+        same = np.zeros(len(pairs), dtype=bool)
+        if np.any(has_data):
+            compared = pairs[has_data]
+            corr_coef_p = self.get_pearson_p_values()[compared[:, 0], compared[:, 1]]
+            ks_stat_p = self.get_ks_p_values(compared)
+            same[has_data] = (corr_coef_p < 0.05) & (0.05 < ks_stat_p)
+        return same
+
+
+def share_store(scans):
+    """
+    Copies the data of scans that do not share one :class:`~scan.ScanStore` into a new store, with row i holding the
+    data of scan i.  Scans pickled before the data was kept in a store each have a store of their own (see
+    :class:`~scan.Scan.__setstate__`), but the calculations over many scans read all their rows from one store.  Scans
+    that already share a store are left as they are.
+
+    :param list[Scan] scans: The scans
+    :return: The store shared by the scans, or None if there are no scans
+    :rtype: ScanStore
+    """
+    if len(scans) == 0:
+        return None
+    if all(a_scan.store is scans[0].store for a_scan in scans):
+        return scans[0].store
+    store = ScanStore(len(scans), scans[0].store.compact)
+    store.diameter_midpoints = scans[0].store.diameter_midpoints
+    for name in ScanStore.CHANNELS:
+        store.reserve(name, max(a_scan.store.lengths[name][a_scan.row] for a_scan in scans))
+        for i, a_scan in enumerate(scans):
+            store.set_values(name, i, a_scan.store.get_values(name, a_scan.row))
+    for i, a_scan in enumerate(scans):
+        store.set_shift(i, a_scan.store.shifts[a_scan.row], a_scan.store.shifted_lengths[a_scan.row])
+        a_scan.store = store
+        a_scan.row = i
+    return store
+
+
+def apply_shift_factors(scans, shift_factors):
+    """
+    Sets the shift factors of many scans and generates their processed data at once, the same as calling
+    :class:`~scan.Scan.set_shift_factor` and :class:`~scan.Scan.generate_processed_data` on each scan.  The scans
+    must share one :class:`~scan.ScanStore`, so the shifted data and the post align checks are computed on the
+    matrices of the store instead of scan by scan.
+
+    :param list[Scan] scans: The scans to process
+    :param list[int] shift_factors: The shift factor of each scan
+    """
+    if len(scans) == 0:
+        return
+    store = scans[0].store
+    rows = np.array([a_scan.row for a_scan in scans], dtype=np.intp)
+    shift_factors = np.asarray(shift_factors, dtype=np.intp)
+    ccnc_lengths = store.lengths["raw_ccnc_counts"][rows]
+    # Shift factors not smaller than the number of CCNC values are set to zero, as in Scan.set_shift_factor
+    shift_factors = np.where(shift_factors < ccnc_lengths, shift_factors, 0)
+    durations = np.array([a_scan.duration for a_scan in scans], dtype=np.intp)
+    # Copy the raw SMPS data to ensure no data loss
+    store.copy_rows("raw_smps_counts", "processed_smps_counts", rows)
+    # Normalize the dndlogdp values of each scan by its max, ignoring the first 5 values
+    store.copy_rows("raw_normalized_concs", "processed_normalized_concs", rows)
+    concs = store.channels["processed_normalized_concs"]
+    in_scan = np.arange(concs.shape[1]) < store.lengths["processed_normalized_concs"][rows, np.newaxis]
+    in_scan[:, :5] = False
+    max_values = np.where(in_scan, concs[rows], -np.inf).max(axis=1, initial=-np.inf)
+    to_normalize = (max_values != 0) & np.isfinite(max_values)
+    concs[rows[to_normalize]] /= max_values[to_normalize, np.newaxis]
+    # Shift the data based on the shift factors, filling with zeros to the length of duration
+    store.set_shifts(rows, shift_factors, durations)
+    super_sats = store.get_all_shifted_values("processed_super_sats", rows)
+    status_codes, super_sats_constant = post_align_self_tests(store, rows)
+    for i, a_scan in enumerate(scans):
+        a_scan.shift_factor = int(shift_factors[i])
+        # if not enough ccnc counts to even shift, the scan is invalid
+        if ccnc_lengths[i] < shift_factors[i]:
+            a_scan.set_status(0)
+            a_scan.set_status_code(6)  # RESEARCH 6 Status Code
+        a_scan.true_super_sat = super_sats[i, 0] if super_sats_constant[i] else None
+        if status_codes[i] != 0:
+            a_scan.set_status(0)
+            a_scan.set_status_code(int(status_codes[i]))
+        a_scan.activation = None
+        a_scan.set_stage_done("processed")
+
+
+def get_activations(scans):
+    """
+    Calculates the activation percentage of many scans at once.  The activation percentage of a scan is the sum of
+    its CCNC counts of all 20 bins during the up time divided by its SMPS counts during the up time, scaled by the
+    CPC sample flow over the mean CCNC sample flow.  The sums are reductions over the matrices of the
+    :class:`~scan.ScanStore` of the scans, which must be shared.
+
+    The percentage of each scan is kept by the scan (see :class:`~scan.Scan.get_activation`), and only the scans
+    without one are calculated.
+
+    :param list[Scan] scans: The scans
+    :return: The activation percentage of each scan, or NaN if it can not be calculated
+    :rtype: ndarray
+    """
+    to_calculate = [a_scan for a_scan in scans if a_scan.activation is None]
+    if len(to_calculate) > 0:
+        store = to_calculate[0].store
+        rows = np.array([a_scan.row for a_scan in to_calculate], dtype=np.intp)
+        up_times = np.array([a_scan.scan_up_time for a_scan in to_calculate], dtype=np.intp)
+        counts_to_conc = np.array([a_scan.counts_to_conc for a_scan in to_calculate], dtype=np.float64)
+        cpc_sample_flow = np.array([a_scan.cpc_sample_flow for a_scan in to_calculate], dtype=np.float64)
+
+        def sum_up_time(values, lengths):
+            # Sum the values of each scan during its up time, which can be cut short by the end of its values
+            in_up_time = np.arange(values.shape[1]) < np.minimum(up_times, lengths)[:, np.newaxis]
+            return np.where(in_up_time, values, 0).sum(axis=1, dtype=np.float64)
+
+        shifted_lengths = store.shifted_lengths[rows]
+        # Sum of CCNC Uptime across all 20 bins  # TODO Fix
+        ccnc_uptime = sum_up_time(store.get_all_shifted_values("processed_ccnc_count_sums", rows), shifted_lengths)
+        # Sum of SMPS counts (Section 4) during Uptime
+        smps_uptime = np.round(sum_up_time(store.channels["processed_smps_counts"][rows],
+                                           store.lengths["processed_smps_counts"][rows]) / counts_to_conc, 0)
+        # Average Sample Flow (CCNC)
+        sample_flow = sum_up_time(store.get_all_shifted_values("processed_ccnc_sample_flow", rows), shifted_lengths)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean_sample_flow = sample_flow / np.minimum(up_times, shifted_lengths)
+            activations = np.round((ccnc_uptime / smps_uptime) * (cpc_sample_flow / (mean_sample_flow / 1000)) * 100,
+                                   0)
+        activations[(smps_uptime == 0) | (sample_flow == 0) | ~np.isfinite(activations)] = np.nan
+        for a_scan, activation in zip(to_calculate, activations):
+            a_scan.activation = "Unknown" if np.isnan(activation) else activation
+    return np.array([np.nan if a_scan.activation == "Unknown" else a_scan.activation for a_scan in scans],
+                    dtype=np.float64)
+
+
+def post_align_self_tests(store, rows):
+    """
+    Runs the checks of :class:`~scan.Scan.post_align_self_test` on many scans at once.  Each check is a few
+    reductions over the shifted matrices of the store:
+
+    - The largest difference of the supersaturation from its first value must be under 0.01
+    - The standard deviation of each temperature must be at most 1
+    - The largest difference of each temperature from its first value must be under 1
+
+    :param ScanStore store: The store of the scans
+    :param ndarray rows: The rows of the scans
+    :return: The status code of each scan, 0 if it passed all the checks and 7 if not, and whether the
+             supersaturation of each scan is constant
+    :rtype: (ndarray, ndarray)
+    """
+    rows = np.asarray(rows, dtype=np.intp)
+    lengths = store.shifted_lengths[rows]
+    in_scan = np.arange(lengths.max() if len(rows) > 0 else 0) < lengths[:, np.newaxis]
+
+    def max_deviations_from_first(values):
+        # NaN values are not equal to anything, so a NaN deviation fails the checks as well
+        return np.where(in_scan, np.abs(values - values[:, :1]), 0).max(axis=1, initial=0)
+
+    # Check for error in supersaturation
+    super_sats = store.get_all_shifted_values("processed_super_sats", rows)
+    super_sats_constant = max_deviations_from_first(super_sats) < 0.01
+    passed = super_sats_constant.copy()
+    for name in ("processed_T1s", "processed_T2s", "processed_T3s"):
+        temps = store.get_all_shifted_values(name, rows)
+        # check for standard deviation on tempuratures
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = temps.sum(axis=1, dtype=np.float64) / lengths
+            deviations = np.where(in_scan, temps - means[:, np.newaxis], 0)
+            passed &= ~(np.sqrt((deviations ** 2).sum(axis=1) / lengths) > 1)
+        # check for uniform values
+        passed &= max_deviations_from_first(temps) < 1
+    status_codes = np.where(passed, 0, 7)  # RESEARCH 7 Status Code
+    return status_codes, super_sats_constant
+
+
+def channel_property(name):
+    """
+    Creates a property of :class:`~scan.Scan` that reads and writes the row of the scan in a channel of its
+    :class:`~scan.ScanStore`.  Reading returns a view of the row.  Assigning copies the values into the row.
+
+    :param str name: The name of the channel
+    :return: The property
+    :rtype: property
+    """
+    def get_values(self):
+        return self.store.get_values(name, self.row)
+
+    def set_values(self, values):
+        self.store.set_values(name, self.row, values)
+
+    return property(get_values, set_values, doc="The %s of the scan (see :class:`~scan.ScanStore`)" % name)
+
+
+def shifted_channel_property(name):
+    """
+    Creates a read only property of :class:`~scan.Scan` that returns the shifted values of the scan in a shifted
+    channel of its :class:`~scan.ScanStore` (see :class:`~scan.ScanStore.get_shifted_values`).
+
+    :param str name: The name of the shifted channel
+    :return: The property
+    :rtype: property
+    """
+    def get_values(self):
+        return self.store.get_shifted_values(name, self.row)
+
+    return property(get_values, doc="The %s of the scan (see :class:`~scan.ScanStore`)" % name)
+
+
 class Scan(object):
     """
     This class creates a scan object stores the data from a single scan.
@@ -25,8 +661,17 @@ class Scan(object):
     Corrected: Data after charge corrections
     Cleaned: Data after sigmoid cleaning
 
+    The data of the scan, such as raw_T1s or processed_ccnc_counts, is kept in a row of a :class:`~scan.ScanStore`
+    shared by all the scans of the experiment.  The scan is a view of that row.
+
+    The derived data of the scan is computed in stages (see :class:`~scan.Scan.STAGES`), each from the stage before
+    it.  When a stage changes, the stages computed from it are marked stale (see :class:`~scan.Scan.invalidate`) and
+    are only computed again when they are needed (see :class:`~controller.Controller.refresh_scan`).
+
     The following variables are stored:  # RESEARCH Confirm variable descriptions
 
+        - **store**: the store holding the data of the scan
+        - **row**: the row of the scan in the store
         - **status**: status of the scan
         - **status_code**: The reason why the scan is not good
         - **counts_to_conc**: the flow rate
@@ -36,15 +681,65 @@ class Scan(object):
         - **duration**: duration of the scan
         - **scan_up_time**: up and down scan time. Very useful to align the data
         - **scan_down_time**:
+        - **computed_stages**: The stages that have been computed
+        - **stale_stages**: The computed stages whose data is out of date
+        - **activation**: The activation percentage, or None if it has to be calculated again
+          (see :class:`~scan.Scan.get_activation`)
+        - **shift_cost_curve**: The area of each shift searched by the auto alignment and the shift it chose, or None
+          if the scan was not auto aligned (see :class:`~auto_shift.ShiftCostCurve`)
         - etc... # REVIEW Documentation
 
     :param int index: The scan number from the SMPS file.  # TODO issues/4 [Current is sequential #s from zero]
+    :param ScanStore store: The store of the experiment.  If None, the scan gets a store of its own.
+    :param int row: The row of the scan in the store.  If None, the index is used.
 
     """
-
-    def __init__(self, index):
+    __slots__ = ("store", "row", "version", "status", "status_code", "sigmoid_status", "counts_to_conc",
+                 "cpc_sample_flow", "index", "start_time", "end_time", "duration", "scan_up_time", "scan_down_time",
+                 "shift_factor", "true_super_sat", "super_sat_label", "sig_df", "sig_peaks_indices", "sig_selection",
+                 "sigmoid_params", "dp50", "sigmoid_curve_x", "sigmoid_curve_y", "asym_limits", "computed_stages",
+                 "stale_stages", "activation", "shift_cost_curve")
+    #: The stages of the derived data of a scan, in the order they are computed.  The kappa stage is the kappa points
+    #: of the scan, which are calculated for the whole experiment.
+    STAGES = ("processed", "corrected", "sigmoid", "kappa")
+
+    # Controller#start.get_normalized_concentration()
+    raw_normalized_concs = channel_property("raw_normalized_concs")
+    # Controller#start.get_smps_counts()
+    raw_smps_counts = channel_property("raw_smps_counts")
+    ave_smps_diameters = channel_property("ave_smps_diameters")
+    # Controller#start.get_ccnc_counts()
+    raw_super_sats = channel_property("raw_super_sats")
+    raw_T1s = channel_property("raw_T1s")
+    raw_T2s = channel_property("raw_T2s")
+    raw_T3s = channel_property("raw_T3s")
+    raw_ccnc_counts = channel_property("raw_ccnc_counts")
+    raw_ccnc_count_sums = channel_property("raw_ccnc_count_sums")
+    raw_ccnc_sample_flow = channel_property("raw_ccnc_sample_flow")
+    raw_ave_ccnc_sizes = channel_property("raw_ave_ccnc_sizes")
+    # Scan#generate_processed_data
+    processed_smps_counts = channel_property("processed_smps_counts")
+    processed_ccnc_counts = shifted_channel_property("processed_ccnc_counts")
+    processed_ccnc_count_sums = shifted_channel_property("processed_ccnc_count_sums")
+    processed_ccnc_sample_flow = shifted_channel_property("processed_ccnc_sample_flow")
+    processed_T1s = shifted_channel_property("processed_T1s")
+    processed_T2s = shifted_channel_property("processed_T2s")
+    processed_T3s = shifted_channel_property("processed_T3s")
+    processed_super_sats = shifted_channel_property("processed_super_sats")
+    processed_ave_ccnc_sizes = shifted_channel_property("processed_ave_ccnc_sizes")
+    processed_normalized_concs = channel_property("processed_normalized_concs")
+    # Scan#correct_charges
+    corrected_smps_counts = channel_property("corrected_smps_counts")
+    corrected_ccnc_counts = channel_property("corrected_ccnc_counts")
+
+    def __init__(self, index, store=None, row=None):
         # TODO issues/45 combine status and code into one
         # DOCQUESTION / RESEARCH duration = scan_up_time + scan_down_time; end time is start_time+duration. Neccessary?
+        if store is None:
+            store = ScanStore(1)
+            row = 0
+        self.store = store
+        self.row = index if row is None else row
         # Controller#start.create_scans()
         self.version = "2.2.5"
         self.status = 1
@@ -58,39 +753,11 @@ class Scan(object):
         self.duration = 0
         self.scan_up_time = 0
         self.scan_down_time = 0
-        # Controller#start.get_smps_counts()
-        self.raw_normalized_concs = []
-        self.diameter_midpoints = []
-        # Controller#start.get_smps_counts()
-        self.raw_smps_counts = []
-        self.ave_smps_diameters = []
-        # Controller#start.get_ccnc_counts()
-        self.raw_super_sats = []
-        self.raw_T1s = []
-        self.raw_T2s = []
-        self.raw_T3s = []
-        self.raw_ccnc_counts = []
-        self.raw_ccnc_count_sums = []
-        self.raw_ccnc_sample_flow = []
-        self.raw_ave_ccnc_sizes = []
         # Scan#align_smps_ccnc_data
         self.shift_factor = 0
         # Scan#generate_processed_data
-        self.processed_smps_counts = []
-        self.processed_ccnc_counts = []
-        self.processed_ccnc_count_sums = []
-        self.processed_ccnc_sample_flow = []
-        self.processed_T1s = []
-        self.processed_T2s = []
-        self.processed_T3s = []
-        self.processed_super_sats = []
         self.true_super_sat = 0
         self.super_sat_label = None
-        self.processed_ave_ccnc_sizes = []
-        self.processed_normalized_concs = []
-        # Scan#correct_charges
-        self.corrected_smps_counts = []
-        self.corrected_ccnc_counts = []
 
         # RESEARCH Following variables for continued use
         # TODO issues/10
@@ -104,6 +771,69 @@ class Scan(object):
         self.sigmoid_curve_y = []
 
         self.asym_limits = [0.75, 1.5]  # RESEARCH Magic number  RESEARCH get from controller?
+        # Scan#set_stage_done
+        self.computed_stages = set()
+        self.stale_stages = set()
+        # Scan#get_activation
+        self.activation = None
+        # Controller#auto_align_scans
+        self.shift_cost_curve = None
+
+    @property
+    def diameter_midpoints(self):
+        """
+        The diameter midpoints of the scan, which are shared by all the scans in the store.
+        """
+        return self.store.diameter_midpoints
+
+    @diameter_midpoints.setter
+    def diameter_midpoints(self, values):
+        self.store.diameter_midpoints = np.asarray(values, dtype=np.float64)
+
+    def __getstate__(self):
+        """
+        Returns the variables of the scan to pickle.  The store is pickled once for all the scans that share it.
+
+        :return: The variables stored in the scan
+        :rtype: dict
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __setstate__(self, state):
+        """
+        Restores the variables of an unpickled scan.  Scans pickled before the data was kept in a
+        :class:`~scan.ScanStore` have their data copied into a store of their own, and scans pickled before their
+        stages were kept are given the stages their data was computed for (see :class:`~scan.Scan.invalidate`).
+
+        :param dict state: The variables stored in the scan
+        """
+        if "store" not in state:
+            self.store = ScanStore(1)
+            self.row = 0
+        self.computed_stages = set()
+        self.stale_stages = set()
+        self.activation = None
+        self.shift_cost_curve = None
+        for name, value in state.items():
+            # The shifted channels are views of the raw channels
+            if name in ScanStore.SHIFTED_CHANNELS:
+                continue
+            try:
+                setattr(self, name, value)
+            except AttributeError:
+                logger.warning("Scan variable %s is no longer used" % name)
+        if "processed_ccnc_counts" in state:
+            self.store.set_shift(self.row, self.shift_factor, len(state["processed_ccnc_counts"]))
+        if "computed_stages" not in state:
+            # Scans pickled before the stages were kept have the stages whose data they hold, so that changing their
+            # inputs still marks them stale
+            if len(self.processed_smps_counts) > 0:
+                self.computed_stages.add("processed")
+            if len(self.corrected_smps_counts) > 0:
+                self.computed_stages.add("corrected")
+            sigmoid_params = getattr(self, "sigmoid_params", None)
+            if sigmoid_params is not None and len(sigmoid_params) > 0:
+                self.computed_stages.update(("sigmoid", "kappa"))
 
     def __repr__(self):
         """
@@ -113,7 +843,9 @@ class Scan(object):
         :return: The scan as a string.
         :rtype: str
         """
-        items = ("%s;%r" % (k, v) for k, v in list(self.__dict__.items()))
+        names = [name for name in self.__slots__ if name != "store"] + list(ScanStore.CHANNELS) + \
+            list(ScanStore.SHIFTED_CHANNELS)
+        items = ("%s;%r" % (name, getattr(self, name)) for name in names + ["diameter_midpoints"])
         return "%s" % "\n".join(items)
 
     ###############
@@ -157,6 +889,19 @@ class Scan(object):
         else:
             return False
 
+    def get_smoothed(self, name, window_length, polyorder):
+        """
+        Returns the values of the scan in a channel smoothed with a Savitzky-Golay filter.  The result is kept by the
+        store until the values change (see :class:`~scan.ScanStore.get_smoothed`).
+
+        :param str name: The name of the channel, such as processed_ccnc_counts
+        :param int window_length: The length of the filter window
+        :param int polyorder: The order of the polynomial used to fit the samples
+        :return: The read only smoothed values
+        :rtype: ndarray
+        """
+        return self.store.get_smoothed(name, self.row, window_length, polyorder)
+
     def get_status_code_descript(self):
         """
         Returns a string value explaining the status code of the current scan
@@ -215,6 +960,7 @@ class Scan(object):
         :param int up_time:  The scan up time from the smps file.
         """
         self.scan_up_time = up_time
+        self.activation = None
 
     def set_down_time(self, down_time):
         """
@@ -239,6 +985,7 @@ class Scan(object):
         :param float new_value: The counts_to_conc value
         """
         self.counts_to_conc = new_value
+        self.activation = None
 
     def set_cpc_sample_flow(self, new_value):
         """
@@ -247,50 +994,29 @@ class Scan(object):
         :param float new_value: The counts_to_conc value
         """
         self.cpc_sample_flow = new_value
+        self.activation = None
 
-    def add_to_diameter_midpoints(self, new_data):
-        """
-        Adds the new_data value to the diameter_midpoints list in the scan object.
-
-        :param str|int|float new_data: The diameter_midpoints to add to the list
+    def set_raw_normalized_concs(self, diameter_midpoints, normalized_concs):
         """
-        self.diameter_midpoints.append(float(new_data))
+        Sets the diameter midpoints and the raw dN/dlogDp values in the scan object.  The diameter midpoints are shared
+        by all the scans in the store.  The dN/dlogDp values are copied into the row of the scan.
 
-    def add_to_raw_normalized_concs(self, new_data):
+        :param ndarray diameter_midpoints: The diameter midpoints
+        :param ndarray normalized_concs: The raw dN/dlogDp value of each diameter midpoint
         """
-        Adds the new_data value to the raw_normalized_concs list in the scan object.
+        self.diameter_midpoints = diameter_midpoints
+        self.raw_normalized_concs = normalized_concs
 
-        :param str|int|float new_data: The raw_normalized_concs to add to the list
+    def set_raw_smps_data(self, smps_counts, ave_smps_diameters):
         """
-        self.raw_normalized_concs.append(float(new_data))
+        Sets the raw SMPS values in the scan object at once.  The counts are multiplied by counts_to_conc.  Each
+        value is copied into the row of the scan.
 
-    def add_to_raw_smps_counts(self, new_data):
+        :param ndarray smps_counts: The SMPS counts of each second
+        :param ndarray ave_smps_diameters: The average SMPS diameter of each second
         """
-        Multiplies the new_data by counts_to_conc and adds the result to the raw_smps_counts list in the scan object.
-
-        :param int new_data: The raw_smps_counts to add to the list
-        """
-        self.raw_smps_counts.append(int(new_data) * self.counts_to_conc)
-
-    def add_to_ave_smps_diameters(self, new_data):
-        """
-        Adds the new_data value to the ave_smps_diameters list in the scan object.
-
-        :param float new_data: The ave_smps_diameters to add to the list
-        """
-        self.ave_smps_diameters.append(new_data)
-
-    def add_to_raw_t1s_t2s_t3s(self, t1, t2, t3):
-        """
-        Adds the three temperaturs values to the t1, t2 and t3 lists in the scan object.
-
-        :param str|int|float t1: The raw t1 value.
-        :param str|int|float t2: The raw t1 value.
-        :param str|int|float t3: The raw t1 value.
-        """
-        self.raw_T1s.append(float(t1))
-        self.raw_T2s.append(float(t2))
-        self.raw_T3s.append(float(t3))
+        self.raw_smps_counts = np.asarray(smps_counts, dtype=np.float64) * self.counts_to_conc
+        self.ave_smps_diameters = ave_smps_diameters
 
     def set_status(self, status):
         """
@@ -308,34 +1034,28 @@ class Scan(object):
         """
         self.status_code = code
 
-    def add_to_raw_super_sats(self, ss):
+    def set_raw_ccnc_data(self, super_sats, t1s, t2s, t3s, ccnc_counts, ccnc_count_sums, ccnc_sample_flow,
+                          ave_ccnc_sizes):
         """
-        Adds the new_data value to the raw_super_sats list in the scan object.
-
-        :param str|int|float ss: The raw supersaturation value to add to the list
+        Sets all the raw CCNC values in the scan object at once.  Each value is copied into the row of the scan.
+
+        :param ndarray super_sats: The raw supersaturation values
+        :param ndarray t1s: The raw t1 values
+        :param ndarray t2s: The raw t2 values
+        :param ndarray t3s: The raw t3 values
+        :param ndarray ccnc_counts: The raw CCNC counts
+        :param ndarray ccnc_count_sums: The raw sums of the CCNC bins
+        :param ndarray ccnc_sample_flow: The raw CCNC sample flow
+        :param ndarray ave_ccnc_sizes: The raw average CCNC sizes
         """
-        self.raw_super_sats.append(float(ss))
-
-    def add_to_raw_ccnc_counts(self, new_count_data, new_count_sum, new_sample_flow):
-        """
-        Adds the new_data value to the raw_ccnc_counts list in the scan object.
-
-        :param str|int|float new_count_data: The raw_ccnc_count to add to the list
-        :param int new_count_sum: The raw_ccnc_count to add to the list
-        :param str|int|float new_sample_flow: The raw_ccnc_count to add to the list
-        """
-        self.raw_ccnc_counts.append(float(new_count_data))
-        self.raw_ccnc_count_sums.append(float(new_count_sum))
-        self.raw_ccnc_sample_flow.append(float(new_sample_flow))
-
-    def add_to_raw_ave_ccnc_sizes(self, new_data):
-        """
-        Adds the new_data value to the raw_ave_ccnc_sizes list in the scan object.
-
-        :param  str|int|float new_data: The ave_ccnc_size to add to the list
-        :type new_data:
-        """
-        self.raw_ave_ccnc_sizes.append(float(new_data))
+        self.raw_super_sats = super_sats
+        self.raw_T1s = t1s
+        self.raw_T2s = t2s
+        self.raw_T3s = t3s
+        self.raw_ccnc_counts = ccnc_counts
+        self.raw_ccnc_count_sums = ccnc_count_sums
+        self.raw_ccnc_sample_flow = ccnc_sample_flow
+        self.raw_ave_ccnc_sizes = ave_ccnc_sizes
 
     def set_shift_factor(self, factor):
         """
@@ -348,6 +1068,7 @@ class Scan(object):
             self.shift_factor = factor
         else:
             self.shift_factor = 0  # RESEARCH Does a 0 make sense?
+        self.activation = None
 
     def set_sigmoid_params(self, params):
         """
@@ -376,39 +1097,55 @@ class Scan(object):
 
     def post_align_self_test(self):
         """
-        Checks for invalid scans.  Currently tests for:
+        Checks for invalid scans (see :class:`~scan.post_align_self_tests`).  Currently tests for:
 
         - Error in supersaturation
         - Standard devations in the three tempuratures greater than 1
-        - Checks for uniform values in temperatures by comparing the first value to all the values
+        - Checks for uniform values in the three temperatures by comparing the first value to all the values
 
         """
         # DOCQUESTION K: more work over here. Can always improve this one
-        # Check for error in supersaturation
-        for i in range(len(self.processed_super_sats)):
-            if not hf.are_floats_equal(self.true_super_sat, self.processed_super_sats[i]):  # DOCQUESTION err value?
-                self.true_super_sat = None
-                self.set_status(0)
-                self.set_status_code(7)  # RESEARCH 7 Status Code
-                break
-        # check for standard deviation on tempuratures
-        if np.std(self.processed_T1s) > 1 or np.std(self.processed_T2s) > 1 or np.std(self.processed_T3s) > 1:
+        status_codes, super_sats_constant = post_align_self_tests(self.store, [self.row])
+        if not super_sats_constant[0]:
+            self.true_super_sat = None
+        if status_codes[0] != 0:
             self.set_status(0)
-            self.set_status_code(7)  # RESEARCH 7 Status Code
-        # check for uniform values
-        for i in range(len(self.processed_T1s)):
-            # check for temperature 1
-            if not hf.are_floats_equal(self.processed_T1s[0], self.processed_T1s[i], 1):
-                self.set_status(0)
-                self.set_status_code(7)  # RESEARCH 7 Status Code
-            # check for temperature 2
-            if not hf.are_floats_equal(self.processed_T2s[0], self.processed_T2s[i], 1):
-                self.set_status(0)
-                self.set_status_code(7)  # RESEARCH 7 Status Code
-            # check for temperature 3
-            if not hf.are_floats_equal(self.processed_T2s[0], self.processed_T2s[i], 1):
-                self.set_status(0)
-                self.set_status_code(7)  # RESEARCH 7 Status Code
+            self.set_status_code(int(status_codes[0]))
+
+    ##########################
+    # Derived Data Stages    #
+    ##########################
+
+    def set_stage_done(self, stage):
+        """
+        Marks a stage as computed and up to date.  The stages computed from it are marked stale.
+
+        :param str stage: The stage (see :class:`~scan.Scan.STAGES`)
+        """
+        self.computed_stages.add(stage)
+        self.stale_stages.discard(stage)
+        if stage != self.STAGES[-1]:
+            self.invalidate(self.STAGES[self.STAGES.index(stage) + 1])
+
+    def invalidate(self, stage):
+        """
+        Marks a stage and the stages computed from it as stale.  Stages that were never computed stay that way.
+
+        :param str stage: The stage whose inputs changed (see :class:`~scan.Scan.STAGES`)
+        """
+        for a_stage in self.STAGES[self.STAGES.index(stage):]:
+            if a_stage in self.computed_stages:
+                self.stale_stages.add(a_stage)
+
+    def get_stale_stages(self, stage):
+        """
+        Returns the stale stages that stage depends on, including stage itself, in the order they are computed.
+
+        :param str stage: The stage that is needed (see :class:`~scan.Scan.STAGES`)
+        :return: The stale stages
+        :rtype: list[str]
+        """
+        return [a_stage for a_stage in self.STAGES[:self.STAGES.index(stage) + 1] if a_stage in self.stale_stages]
 
     #############################
     # Data Transformation Code  #
@@ -416,18 +1153,10 @@ class Scan(object):
 
     def do_basic_trans(self):
         """
-        Convert lists to numpy arrays.
+        Convert lists to numpy arrays.  The data of the scan is always kept as numpy arrays in its
+        :class:`~scan.ScanStore`, so there is nothing left to convert.
         """
-        self.raw_T1s = np.asarray(self.raw_T1s)
-        self.raw_T2s = np.asarray(self.raw_T2s)
-        self.raw_T3s = np.asarray(self.raw_T3s)
-        self.raw_smps_counts = np.asarray(self.raw_smps_counts, dtype=np.float64)
-        self.raw_ccnc_counts = np.asarray(self.raw_ccnc_counts, dtype=np.float64)
-        self.raw_normalized_concs = np.asarray(self.raw_normalized_concs)
-        self.diameter_midpoints = np.asarray(self.diameter_midpoints)
-        self.raw_ave_ccnc_sizes = np.asarray(self.raw_ave_ccnc_sizes)
-        self.raw_super_sats = np.asarray(self.raw_super_sats)
-        self.ave_smps_diameters = np.asarray(self.ave_smps_diameters)
+        pass
 
     def generate_processed_data(self):  # RESEARCH should this be called apply shift?
         """
@@ -440,6 +1169,9 @@ class Scan(object):
         - If there is not enough data, then zeros are added to the end.
         - Processed data is then truncated to match the length of duration.
 
+        The processed CCNC data is a view of the zero padded raw CCNC data starting at the shift factor
+        (see :class:`~scan.ScanStore.get_shifted_values`), so no CCNC data is copied.
+
         Finally the :class:`~scan.Scan.post_align_self_test` is processed to verify validity of scan.
 
         Original data is stored seperately to ensure no data loss when shifting.
@@ -448,63 +1180,19 @@ class Scan(object):
         self.processed_smps_counts = self.raw_smps_counts
         # Process the dndlogdp list  # DOCQUESTION naming again
         self.processed_normalized_concs = hf.normalize_dndlogdp_list(self.raw_normalized_concs)
-        # Copy raw CCNC values to local variables
-        ccnc_counts = self.raw_ccnc_counts[:]
-        ccnc_count_sums = self.raw_ccnc_count_sums[:]
-        ccnc_sample_flow = self.raw_ccnc_sample_flow[:]
-        t1s = self.raw_T1s[:]
-        t2s = self.raw_T2s[:]
-        t3s = self.raw_T3s[:]
-        super_sats = self.raw_super_sats[:]
-        ave_ccnc_sizes = self.raw_ave_ccnc_sizes[:]
         # Update for shift factors
         # -- if shift factor is non-negative  # DOCQUESTION But, we assumed it always would be?
-        if self.shift_factor >= 0:
-            # if not enough ccnc counts to even shift, the scan is invalid
-            if len(ccnc_counts) < self.shift_factor:
-                self.set_status(0)
-                self.set_status_code(6)  # RESEARCH 6 Status Code
-            # Shift the data based on the shift factor
-            ccnc_counts = ccnc_counts[self.shift_factor:]
-            ccnc_count_sums = ccnc_count_sums[self.shift_factor:]
-            ccnc_sample_flow = ccnc_sample_flow[self.shift_factor:]
-            t1s = t1s[self.shift_factor:]
-            t2s = t2s[self.shift_factor:]
-            t3s = t3s[self.shift_factor:]
-            super_sats = super_sats[self.shift_factor:]
-            ave_ccnc_sizes = ave_ccnc_sizes[self.shift_factor:]
-        else:  # -- if shift factor is negative
-            # populate ccnc counts with 0s in the fronts
-            ccnc_counts = hf.fill_zeros_to_begin(ccnc_counts, abs(self.shift_factor))
-            ccnc_count_sums = hf.fill_zeros_to_begin(ccnc_count_sums, abs(self.shift_factor))
-            ccnc_sample_flow = hf.fill_zeros_to_begin(ccnc_sample_flow, abs(self.shift_factor))
-            t1s = hf.fill_zeros_to_begin(t1s, abs(self.shift_factor))
-            t2s = hf.fill_zeros_to_begin(t2s, abs(self.shift_factor))
-            t3s = hf.fill_zeros_to_begin(t3s, abs(self.shift_factor))
-            super_sats = hf.fill_zeros_to_begin(super_sats, abs(self.shift_factor))
-            ave_ccnc_sizes = hf.fill_zeros_to_begin(ave_ccnc_sizes, abs(self.shift_factor))
-        # If the shifted data is not long enough to match duration, fill with zeros.
-        ccnc_counts = hf.fill_zeros_to_end(ccnc_counts, self.duration)
-        ccnc_count_sums = hf.fill_zeros_to_end(ccnc_count_sums, self.duration)
-        ccnc_sample_flow = hf.fill_zeros_to_end(ccnc_sample_flow, self.duration)
-        t1s = hf.fill_zeros_to_end(t1s, self.duration)
-        t2s = hf.fill_zeros_to_end(t2s, self.duration)
-        t3s = hf.fill_zeros_to_end(t3s, self.duration)
-        super_sats = hf.fill_zeros_to_end(super_sats, self.duration)
-        ave_ccnc_sizes = hf.fill_zeros_to_end(ave_ccnc_sizes, self.duration)
-        # Update the objects values with the local calculations truncating to the length of duration
-        self.processed_ccnc_counts = ccnc_counts[:self.duration]
-        self.processed_ccnc_count_sums = ccnc_count_sums[:self.duration]
-        self.processed_ccnc_sample_flow = ccnc_sample_flow[:self.duration]
-        self.processed_T1s = t1s[:self.duration]
-        self.processed_T2s = t2s[:self.duration]
-        self.processed_T3s = t3s[:self.duration]
-        self.processed_super_sats = super_sats[:self.duration]
-        self.processed_ave_ccnc_sizes = ave_ccnc_sizes[:self.duration]
+        # if not enough ccnc counts to even shift, the scan is invalid
+        if self.shift_factor >= 0 and len(self.raw_ccnc_counts) < self.shift_factor:
+            self.set_status(0)
+            self.set_status_code(6)  # RESEARCH 6 Status Code
+        # Shift the data based on the shift factor, filling with zeros to the length of duration
+        self.store.set_shift(self.row, self.shift_factor, self.duration)
         self.true_super_sat = self.processed_super_sats[0]
         # Perform self test
         self.post_align_self_test()
-        self.get_activation()
+        self.activation = None
+        self.set_stage_done("processed")
 
     def correct_charges(self):
         """
@@ -515,9 +1203,9 @@ class Scan(object):
         if not self.is_valid():
             return -1
         # Initiate some necessary variables
-        ccnc = self.processed_ccnc_counts[:]
-        smps = self.processed_smps_counts[:]
-        ave_smps_dp = self.ave_smps_diameters[:]
+        ccnc = np.array(self.processed_ccnc_counts, dtype=np.float64)
+        smps = np.array(self.processed_smps_counts, dtype=np.float64)
+        ave_smps_dp = np.array(self.ave_smps_diameters, dtype=np.float64)
         # Basic Processing
         ccnc = hf.resolve_zeros(ccnc)
         smps = hf.resolve_zeros(smps)
@@ -535,6 +1223,7 @@ class Scan(object):
         # Save the smps and ccnc data after charge correction to new variables
         self.corrected_smps_counts = corrected_smps
         self.corrected_ccnc_counts = corrected_ccnc
+        self.set_stage_done("corrected")
 
     def fit_sigmoids(self):
         """
@@ -544,28 +1233,17 @@ class Scan(object):
         if not self.is_valid():
             return
         sigmoid_fit.get_all_fit_curves(self)
+        self.set_stage_done("sigmoid")
 
     def get_activation(self):
         """
-        Calculates the activation percentage for each scan on the fly.
-        Updates each time a new shift value is selected
+        Calculates the activation percentage of the scan (see :class:`~scan.get_activations`).  The percentage is
+        kept until the processed data, the shift factor, the up time, the counts to concentration conversion or the
+        CPC sample flow change.
 
-        :return: The activation percentage.  If an exception occurs, returns `"Unknown"`
+        :return: The activation percentage.  If it can not be calculated, returns `"Unknown"`
         :rtype: str|int
         """
-        # Sum of CCNC Uptime across all 20 bins  # TODO Fix
-        ccnc_uptime = sum(self.processed_ccnc_count_sums[0:self.scan_up_time])
-        # Sum of SMPS counts (Section 4) during Uptime
-        smps_uptime = round(sum(self.processed_smps_counts[0:self.scan_up_time]) / self.counts_to_conc, 0)
-        # Average Sample Flow (CCNC)
-        mean_sample_flow = sum(self.processed_ccnc_sample_flow[0:self.scan_up_time])
-        mean_sample_flow /= len((self.processed_ccnc_sample_flow[0:self.scan_up_time]))
-
-        if smps_uptime == 0 or sum(self.processed_ccnc_sample_flow[0:self.scan_up_time]) == 0:
-            return "Unknown"
-        else:
-            try:
-                return round(((ccnc_uptime / smps_uptime) * (self.cpc_sample_flow/(mean_sample_flow/1000))*100), 0)
-            except Exception as e:
-                logger.warning("Scan (" + str(self.index) + "):" + str(e))
-                return "Unknown"
+        if self.activation is None:
+            get_activations([self])
+        return self.activation
@@ -0,0 +1,219 @@
+"""
+# REVIEW Documentation
+"""
+from unittest import TestCase
+import concurrent.futures
+
+import numpy as np
+
+from algorithm import auto_shift
+
+
+class TestGetShiftAreas(TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.smps = rng.gamma(2.0, 3.0, 200)
+        self.ccnc = rng.gamma(2.0, 3.0, 80)
+
+    def assert_same_areas(self, first_start, num_shifts):
+        areas, messages = auto_shift.get_shift_areas(self.smps, self.ccnc, first_start, len(self.ccnc), num_shifts)
+        expected_areas, expected_messages = auto_shift.get_shift_areas_by_iteration(self.smps, self.ccnc, first_start,
+                                                                                    len(self.ccnc), num_shifts)
+        np.testing.assert_array_equal(areas, expected_areas)
+        self.assertEqual(messages, expected_messages)
+
+    def test_same_as_by_iteration(self):
+        self.assert_same_areas(5, 100)
+
+    def test_same_slope(self):
+        # The curves have the same slope where both are flat
+        self.smps[20:30] = 1.0
+        self.ccnc[10:20] = 1.0
+        self.assert_same_areas(0, 40)
+
+    def test_windows_past_the_ends(self):
+        self.assert_same_areas(-3, 130)
+
+    def test_no_shifts(self):
+        areas, messages = auto_shift.get_shift_areas(self.smps, self.ccnc, 0, len(self.ccnc), 0)
+        self.assertEqual(len(areas), 0)
+        self.assertEqual(messages, [])
+
+
+class TestSearchShiftBand(TestCase):
+    def setUp(self):
+        x = np.arange(200)
+        self.smps = 100 * np.exp(-((x - 100) / 20.0) ** 2) + np.random.RandomState(0).uniform(0, 1, 200)
+        self.ccnc = self.smps[60:140] * 0.9
+
+    def test_band_around_best(self):
+        areas = auto_shift.get_shift_areas(self.smps, self.ccnc, 20, 80, 80)[0]
+        best = int(np.argmin(areas))
+        band_areas, messages, num_searched = auto_shift.search_shift_band(self.smps, self.ccnc, 20, 80, 80, best, 3)
+        self.assertEqual(num_searched, 7)
+        self.assertEqual(int(np.argmin(band_areas)), best)
+        np.testing.assert_array_equal(band_areas[best - 3:best + 4], areas[best - 3:best + 4])
+        self.assertTrue(np.isinf(band_areas[:best - 3]).all())
+
+    def test_widened_when_best_on_edge(self):
+        areas = auto_shift.get_shift_areas(self.smps, self.ccnc, 20, 80, 80)[0]
+        best = int(np.argmin(areas))
+        band_areas, messages, num_searched = auto_shift.search_shift_band(self.smps, self.ccnc, 20, 80, 80,
+                                                                          best + 10, 2)
+        self.assertEqual(int(np.argmin(band_areas)), best)
+        self.assertGreater(num_searched, 5)
+        self.assertLess(num_searched, 80)
+
+    def test_out_of_range_center(self):
+        band_areas, messages, num_searched = auto_shift.search_shift_band(self.smps, self.ccnc, 20, 80, 80, 500, 2)
+        self.assertEqual(int(np.argmin(band_areas)), int(np.argmin(auto_shift.get_shift_areas(self.smps, self.ccnc,
+                                                                                                20, 80, 80)[0])))
+
+
+class TestGetAutoShift(TestCase):
+    def test_same_as_by_iteration(self):
+        rng = np.random.RandomState(1)
+        x = np.arange(135)
+        smps = 100 * np.exp(-((x - 60) / 15.0) ** 2) + rng.uniform(0, 5, 135)
+        ccnc = 80 * np.exp(-((np.arange(150) - 68) / 15.0) ** 2) + rng.uniform(0, 5, 150)
+        for median_shift in (0, 4, 8):
+            self.assertEqual(auto_shift.get_auto_shift(smps, ccnc, 120, median_shift),
+                             auto_shift.get_auto_shift(smps, ccnc, 120, median_shift, by_iteration=True))
+
+
+class TestShiftCostCurve(TestCase):
+    def setUp(self):
+        x = np.arange(200)
+        self.smps = 100 * np.exp(-((x - 100) / 20.0) ** 2) + np.random.RandomState(0).uniform(0, 1, 200)
+        self.ccnc = self.smps[60:140] * 0.9
+
+    def test_search_in_runs(self):
+        areas, messages = auto_shift.get_shift_areas(self.smps, self.ccnc, 20, 80, 80)
+        curve = auto_shift.ShiftCostCurve(80)
+        self.assertEqual(curve.search(self.smps, self.ccnc, 20, 80, 10, 20), 10)
+        self.assertEqual(curve.search(self.smps, self.ccnc, 20, 80, 30, 40), 10)
+        self.assertEqual(curve.search(self.smps, self.ccnc, 20, 80, 0, 80), 60)
+        self.assertEqual(curve.search(self.smps, self.ccnc, 20, 80, 0, 80), 0)
+        np.testing.assert_array_equal(curve.areas, areas)
+        self.assertEqual(curve.get_error_messages(), messages)
+
+    def test_get_best_shifts(self):
+        curve = auto_shift.ShiftCostCurve(7, offset=10)
+        curve.areas[:] = [3.0, 1.0, 1.0, 2.0, 0.5, 0.5, 4.0]
+        curve.searched[:6] = True
+        self.assertEqual(curve.get_best_shifts(), [6, 9])
+        np.testing.assert_array_equal(curve.get_shifts(), [10, 9, 8, 7, 6, 5, 4])
+
+    def test_reused(self):
+        peaks = (60, 140, 100, 180)
+        ccnc = np.concatenate((np.zeros(40), self.smps, np.zeros(40)))
+        shift, messages, num_searched, num_shifts, curve = auto_shift.search_shift_from_peaks(self.smps, ccnc, *peaks)
+        self.assertEqual(num_searched, num_shifts)
+        self.assertEqual(curve.shift, shift)
+        self.assertEqual(curve.get_best_shifts(1), [shift])
+        result = auto_shift.search_shift_from_peaks(self.smps, ccnc, *peaks, curve=curve)
+        self.assertEqual(result[:2], (shift, messages))
+        self.assertEqual(result[2], 0)
+        # Another peak can not reuse the curve
+        self.assertEqual(auto_shift.search_shift_from_peaks(self.smps, ccnc, 60, 140, 101, 181, curve=curve)[2],
+                         num_shifts)
+
+    def test_band_is_kept(self):
+        peaks = (60, 140, 100, 180)
+        ccnc = np.concatenate((np.zeros(40), self.smps, np.zeros(40)))
+        shift, messages, num_searched, num_shifts, curve = auto_shift.search_shift_from_peaks(
+            self.smps, ccnc, *peaks, median_shift=40, band=2)
+        self.assertLess(num_searched, num_shifts)
+        full_result = auto_shift.search_shift_from_peaks(self.smps, ccnc, *peaks, curve=curve)
+        self.assertEqual(full_result[2], num_shifts - num_searched)
+        self.assertEqual(full_result[:2], auto_shift.get_shift_from_peaks(self.smps, ccnc, *peaks))
+        # The curve searched with the band is not changed
+        self.assertEqual(curve.searched.sum(), num_searched)
+
+    def test_same_slope_on_band_edge(self):
+        peaks = (60, 140, 100, 180)
+        ccnc = np.concatenate((np.zeros(40), self.smps, np.zeros(40)))
+        # The curves have the same slope on iteration 8, the first iteration of the band, so it has the area of
+        # iteration 7, which was not searched
+        self.smps[63] = self.smps[62]
+        ccnc[101] = ccnc[100]
+        shift, messages, num_searched, num_shifts, curve = auto_shift.search_shift_from_peaks(
+            self.smps, ccnc, *peaks, median_shift=36, band=2)
+        full_shift, full_messages = auto_shift.get_shift_from_peaks(self.smps, ccnc, *peaks)
+        self.assertEqual((shift, messages), (full_shift, full_messages))
+        full_curve = auto_shift.search_shift_from_peaks(self.smps, ccnc, *peaks)[4]
+        np.testing.assert_array_equal(curve.areas[curve.searched], full_curve.areas[curve.searched])
+
+
+class TestAutoShiftBatch(TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(2)
+        self.smps_counts = []
+        self.ccnc_counts = []
+        for i in range(12):
+            delay = rng.randint(2, 10)
+            x = np.arange(135)
+            self.smps_counts.append(100 * np.exp(-((x - 60) / 15.0) ** 2) + rng.uniform(0, 5, 135))
+            ccnc_x = np.arange(140 + i)
+            self.ccnc_counts.append(80 * np.exp(-((ccnc_x - 60 - delay) / 15.0) ** 2) + rng.uniform(0, 5, 140 + i))
+        # Scans that get_auto_shift does not search
+        self.smps_counts[3] = np.zeros(135)
+        self.ccnc_counts[5] = self.ccnc_counts[5][:100]
+        self.scan_up_times = [120] * 12
+
+    def test_same_as_get_auto_shift(self):
+        batch = auto_shift.AutoShiftBatch(self.smps_counts, self.ccnc_counts, self.scan_up_times)
+        self.assertEqual(batch.batched.sum(), 10)
+        for median_shift in (0, 3, 6):
+            shifts, error_messages = batch.get_shifts(median_shift)
+            for i in range(12):
+                self.assertEqual((shifts[i], error_messages[i]),
+                                 auto_shift.get_auto_shift(self.smps_counts[i], self.ccnc_counts[i],
+                                                           self.scan_up_times[i], median_shift))
+
+    def test_executor(self):
+        batch = auto_shift.AutoShiftBatch(self.smps_counts, self.ccnc_counts, self.scan_up_times)
+        progress = []
+        with concurrent.futures.ProcessPoolExecutor(max_workers=2) as executor:
+            shifts = batch.get_shifts(4, executor, 2, progress.append)
+        self.assertEqual(shifts, batch.get_shifts(4))
+        self.assertEqual(progress, sorted(set(progress)))
+        self.assertEqual(progress[-1], 100)
+
+    def test_band(self):
+        batch = auto_shift.AutoShiftBatch(self.smps_counts, self.ccnc_counts, self.scan_up_times)
+        shifts = batch.get_shifts(6)[0]
+        full_counts = batch.search_counts
+        self.assertEqual(batch.get_shifts(6, band=3)[0], shifts)
+        self.assertIsNone(batch.search_counts[3])
+        for search_count, full_count in zip(batch.search_counts, full_counts):
+            if search_count is not None:
+                self.assertEqual(search_count[1], full_count[1])
+                self.assertLessEqual(search_count[0], full_count[0])
+
+    def test_curves(self):
+        batch = auto_shift.AutoShiftBatch(self.smps_counts, self.ccnc_counts, self.scan_up_times)
+        shifts = batch.get_shifts(4)
+        curves = batch.cost_curves
+        self.assertIsNone(curves[3])
+        self.assertEqual(batch.get_shifts(4, curves=curves), shifts)
+        for i, search_count in enumerate(batch.search_counts):
+            if search_count is not None:
+                self.assertEqual(search_count[0], 0)
+                self.assertEqual(batch.cost_curves[i].shift, shifts[0][i])
+
+    def test_smps_peaks_are_kept(self):
+        batch = auto_shift.AutoShiftBatch(self.smps_counts, self.ccnc_counts, self.scan_up_times)
+        batch.get_shifts(0)
+        smps_peaks = batch.smps_peaks
+        batch.get_shifts(4)
+        self.assertIs(batch.smps_peaks, smps_peaks)
+
+
+class TestProgressQueue(TestCase):
+    def test_throttled(self):
+        progress = []
+        progress_queue = auto_shift.ProgressQueue(1000, progress.append)
+        for i in range(1000):
+            progress_queue.put(1)
+        self.assertEqual(progress, list(range(101)))
@@ -2,13 +2,37 @@
 # REVIEW Documentation
 """
 from unittest import TestCase
+import glob
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+
 import controller
+import scan
+from algorithm import auto_shift
+
+
+TEST_DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata", "O3100VOC25", "Analysis")
 
 
 class MainView(object):
     def __init__(self):
         pass
 
+    def update_scan_info_and_graphs(self, stage=None):
+        pass
+
+
+class ProjectView(MainView):
+    """
+    Ignores the calls made to the view when a project is loaded
+    """
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
 
 class TestController(TestCase):
     def setUp(self):
@@ -19,6 +43,9 @@ class TestInit(TestController):
     def test_scans(self):
         self.assertEqual(self.control.scans, [])
 
+    def test_scan_store(self):
+        self.assertEqual(self.control.scan_store, None)
+
     def test_counts_to_conc_conv(self):
         self.assertEqual(self.control.counts_to_conc_conv, 0)
 
@@ -34,6 +61,15 @@ class TestInit(TestController):
     def test_smps_data(self):
         self.assertEqual(self.control.smps_data, None)
 
+    def test_ccnc_tail_reader(self):
+        self.assertEqual(self.control.ccnc_tail_reader, None)
+
+    def test_scan_time_index(self):
+        self.assertEqual(self.control.scan_time_index, None)
+
+    def test_scan_similarity(self):
+        self.assertEqual(self.control.scan_similarity, None)
+
     def experiment_date(self):
         self.assertEqual(self.control.experiment_date, None)
 
@@ -91,6 +127,24 @@ class TestInit(TestController):
     def test_kappa_excel(self):
         self.assertEqual(self.control.kappa_excel, None)
 
+    def test_use_parse_cache(self):
+        self.assertEqual(self.control.use_parse_cache, True)
+
+    def test_compact_storage(self):
+        self.assertEqual(self.control.compact_storage, False)
+
+    def test_lean_memory(self):
+        self.assertEqual(self.control.lean_memory, False)
+
+    def test_align_max_workers(self):
+        self.assertEqual(self.control.align_max_workers, None)
+
+    def test_align_search_band(self):
+        self.assertEqual(self.control.align_search_band, None)
+
+    def test_data_file_keys(self):
+        self.assertEqual(self.control.data_file_keys, None)
+
 
 class TestSetAttributesDefault(TestController):
     def test_scans(self):
@@ -98,6 +152,11 @@ class TestSetAttributesDefault(TestController):
         controller.Controller.set_attributes_default(self.control)
         self.assertEqual(self.control.scans, [])
 
+    def test_scan_store(self):
+        self.control.scan_store = -1
+        controller.Controller.set_attributes_default(self.control)
+        self.assertEqual(self.control.scan_store, None)
+
     def test_counts_to_conc_conv(self):
         self.control.counts_to_conc_conv = -1
         controller.Controller.set_attributes_default(self.control)
@@ -118,6 +177,26 @@ class TestSetAttributesDefault(TestController):
         controller.Controller.set_attributes_default(self.control)
         self.assertEqual(self.control.smps_data, None)
 
+    def test_data_file_keys(self):
+        self.control.data_file_keys = -1
+        controller.Controller.set_attributes_default(self.control)
+        self.assertEqual(self.control.data_file_keys, None)
+
+    def test_ccnc_tail_reader(self):
+        self.control.ccnc_tail_reader = -1
+        controller.Controller.set_attributes_default(self.control)
+        self.assertEqual(self.control.ccnc_tail_reader, None)
+
+    def test_scan_time_index(self):
+        self.control.scan_time_index = -1
+        controller.Controller.set_attributes_default(self.control)
+        self.assertEqual(self.control.scan_time_index, None)
+
+    def test_scan_similarity(self):
+        self.control.scan_similarity = -1
+        controller.Controller.set_attributes_default(self.control)
+        self.assertEqual(self.control.scan_similarity, None)
+
     def experiment_date(self):
         self.control.counts_to_conc_conv = -1
         controller.Controller.set_attributes_default(self.control)
@@ -172,3 +251,174 @@ class TestSetAttributesDefault(TestController):
         self.control.valid_kappa_points = -1
         controller.Controller.set_attributes_default(self.control)
         self.assertEqual(self.control.valid_kappa_points, {})
+
+
+class TestRefreshScan(TestController):
+    def setUp(self):
+        super(TestRefreshScan, self).setUp()
+        a_scan = scan.Scan(0)
+        a_scan.set_duration(4)
+        a_scan.set_up_time(3)
+        a_scan.set_counts_2_conc(1.0)
+        a_scan.set_raw_ccnc_data(*[np.arange(6, dtype=np.float64)] * 8)
+        a_scan.set_raw_smps_data(np.ones(4), np.ones(4))
+        a_scan.raw_normalized_concs = np.ones(8)
+        a_scan.generate_processed_data()
+        self.control.scans = [a_scan]
+        self.control.curr_scan_index = 0
+
+    def test_update_scan(self):
+        a_scan = self.control.scans[0]
+        a_scan.set_shift_factor(2)
+        self.control.update_scan("processed")
+        np.testing.assert_array_equal(a_scan.processed_ccnc_counts, [0, 1, 2, 3])
+        self.assertEqual(a_scan.stale_stages, {"processed"})
+        self.control.refresh_scan(0, "sigmoid")
+        np.testing.assert_array_equal(a_scan.processed_ccnc_counts, [2, 3, 4, 5])
+        self.assertEqual(a_scan.stale_stages, set())
+
+    def test_unpickled_scan(self):
+        self.control.scans = pickle.loads(pickle.dumps(self.control.scans))
+        self.control.scans[0].set_shift_factor(2)
+        self.control.update_scan("processed")
+        self.control.refresh_scan(0, "processed")
+        np.testing.assert_array_equal(self.control.scans[0].processed_ccnc_counts, [2, 3, 4, 5])
+
+    def test_old_pickled_scan(self):
+        # Scans pickled before the stages were kept
+        state = self.control.scans[0].__getstate__()
+        del state["computed_stages"]
+        del state["stale_stages"]
+        a_scan = scan.Scan.__new__(scan.Scan)
+        a_scan.__setstate__(state)
+        self.assertEqual(a_scan.computed_stages, {"processed"})
+        self.control.scans = [a_scan]
+        a_scan.set_shift_factor(2)
+        self.control.update_scan("processed")
+        self.control.refresh_scan(0, "processed")
+        np.testing.assert_array_equal(a_scan.processed_ccnc_counts, [2, 3, 4, 5])
+
+    def test_fresh_stage_is_not_computed(self):
+        a_scan = self.control.scans[0]
+        a_scan.set_shift_factor(2)
+        self.control.refresh_scan(0, "processed")
+        np.testing.assert_array_equal(a_scan.processed_ccnc_counts, [0, 1, 2, 3])
+
+
+class TestShiftCostCurve(TestController):
+    def setUp(self):
+        super(TestShiftCostCurve, self).setUp()
+        curve = auto_shift.ShiftCostCurve(6, offset=4)
+        curve.areas[1:] = [5.0, 2.0, 3.0, 1.0, 4.0]
+        curve.searched[1:] = True
+        curve.shift = 0
+        self.control.scans = [scan.Scan(0), scan.Scan(1)]
+        self.control.scans[0].shift_cost_curve = curve
+
+    def test_get_shift_cost_curve(self):
+        shift_factors, areas = self.control.get_shift_cost_curve(0)
+        np.testing.assert_array_equal(shift_factors, [4, 3, 2, 1, 0])
+        np.testing.assert_array_equal(areas, [5.0, 2.0, 3.0, 1.0, 4.0])
+        self.assertIsNone(self.control.get_shift_cost_curve(1))
+
+    def test_get_best_shift_factors(self):
+        self.assertEqual(self.control.get_best_shift_factors(0), [1, 3])
+        self.assertEqual(self.control.get_best_shift_factors(0, 1), [1])
+        self.assertEqual(self.control.get_best_shift_factors(1), [])
+
+
+class TestDataTables(TestController):
+    def setUp(self):
+        super(TestDataTables, self).setUp()
+        self.folder = tempfile.mkdtemp()
+        for a_file in glob.glob(os.path.join(TEST_DATA_FOLDER, "*")):
+            shutil.copy(a_file, self.folder)
+        self.control.data_files = sorted(glob.glob(os.path.join(self.folder, "*")))
+        self.control.use_parse_cache = False
+        self.control.parse_files()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_release_and_load(self):
+        ccnc_data = self.control.ccnc_data
+        smps_data = self.control.smps_data
+        self.control.release_data_tables()
+        self.assertIsNone(self.control.ccnc_data)
+        self.assertIsNone(self.control.smps_data)
+        self.assertEqual(len(self.control.data_file_keys), len(self.control.data_files))
+        self.control.load_data_tables()
+        np.testing.assert_array_equal(self.control.ccnc_data["timestamp"], ccnc_data["timestamp"])
+        np.testing.assert_array_equal(self.control.smps_data["raw_counts"], smps_data["raw_counts"])
+
+    def test_changed_file(self):
+        self.control.release_data_tables()
+        with open(self.control.data_files[0], "a") as a_file:
+            a_file.write("\n")
+        self.assertRaises(IOError, self.control.load_data_tables)
+
+    def test_kappa_precision_report(self):
+        self.control.scans = []
+        self.control.create_scans()
+        self.control.get_normalized_concentration()
+        self.control.get_smps_counts()
+        self.control.get_ccnc_counts()
+        self.control.lean_memory = True
+        scans = self.control.scans
+        report = self.control.get_kappa_precision_report()
+        self.assertEqual(report["points"], [])
+        self.assertEqual(report["unmatched"], 0)
+        self.assertIs(self.control.scans, scans)
+        self.assertFalse(self.control.scan_store.compact)
+        self.assertIsNone(self.control.ccnc_data)
+
+    def save_and_load(self, saved=None):
+        self.control.view = ProjectView()
+        self.control.scans = [scan.Scan(0)]
+        self.control.save_name = os.path.join(self.folder, "project.chemics")
+        if saved is None:
+            self.control.save_project()
+        else:
+            with open(self.control.save_name, "wb") as handle:
+                pickle.dump(saved, handle)
+        self.control.ccnc_data = None
+        self.control.smps_data = None
+        self.control.data_file_keys = None
+        self.control.load_project(self.control.save_name)
+
+    def test_project_keeps_data_tables(self):
+        ccnc_data = self.control.ccnc_data
+        self.save_and_load()
+        np.testing.assert_array_equal(self.control.ccnc_data["timestamp"], ccnc_data["timestamp"])
+        self.assertEqual(len(self.control.data_file_keys), len(self.control.data_files))
+
+    def test_lean_project(self):
+        self.control.lean_memory = True
+        self.save_and_load()
+        self.assertIsNone(self.control.ccnc_data)
+        self.assertIsNone(self.control.smps_data)
+        self.control.load_data_tables()
+        self.assertIsNotNone(self.control.ccnc_data)
+
+    def test_old_project(self):
+        # Projects saved before the data files were hashed hold the data tables as text rows
+        saved = ([scan.Scan(0)], 1.0, self.control.data_files, [["12:00:00", "1"]], [["Sample #", "1"]], None,
+                 None, 0, None, None, {}, {}, "align", {}, os.path.join(self.folder, "project.chemics"))
+        self.save_and_load(saved)
+        self.assertIsNone(self.control.ccnc_data)
+        self.assertIsNone(self.control.smps_data)
+        self.control.load_data_tables()
+        self.assertIsNotNone(self.control.smps_data)
+
+    def test_old_project_scans_share_store(self):
+        # Scans saved before the data was kept in a store each have a store of their own
+        scans = [scan.Scan(i) for i in range(3)]
+        for i, a_scan in enumerate(scans):
+            a_scan.raw_smps_counts = np.full(5, i + 1.0)
+        saved = (scans, 1.0, self.control.data_files, [["12:00:00", "1"]], [["Sample #", "1"]], None, None, 0,
+                 None, None, {}, {}, "align", {}, os.path.join(self.folder, "project.chemics"))
+        self.save_and_load(saved)
+        for i, a_scan in enumerate(self.control.scans):
+            self.assertIs(a_scan.store, self.control.scan_store)
+            self.assertEqual(a_scan.row, i)
+            np.testing.assert_array_equal(a_scan.raw_smps_counts, np.full(5, i + 1.0))
@@ -0,0 +1,463 @@
+"""
+# REVIEW Documentation
+"""
+from unittest import TestCase
+import datetime as dt
+import glob
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import scipy.signal
+
+import helper_functions as hf
+
+TEST_DATA_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), "testdata", "O3100VOC25", "Analysis")
+CCNC_FILES = sorted(glob.glob(os.path.join(TEST_DATA_FOLDER, "*.csv")))
+SMPS_FILE = glob.glob(os.path.join(TEST_DATA_FOLDER, "*.txt"))[0]
+
+
+class TestProcessACcncCsv(TestCase):
+    def setUp(self):
+        self.date, self.text_rows = hf.process_a_csv(CCNC_FILES[0])
+        self.typed_date, self.columns = hf.process_a_ccnc_csv(CCNC_FILES[0])
+
+    def test_date(self):
+        self.assertEqual(self.typed_date, self.date)
+
+    def test_lengths(self):
+        for name in self.columns:
+            self.assertEqual(len(self.columns[name]), len(self.text_rows))
+
+    def test_time(self):
+        self.assertEqual(self.columns["time"].dtype, np.int64)
+        self.assertEqual(self.columns["time"][0], hf.time_to_seconds(self.text_rows[0][0]))
+
+    def test_float_columns(self):
+        self.assertEqual(self.columns["super_sat"][0], float(self.text_rows[0][1]))
+        self.assertEqual(self.columns["T3"][0], float(self.text_rows[0][9]))
+        self.assertEqual(self.columns["ccnc_count"][0], float(self.text_rows[0][-3]))
+
+    def test_bins(self):
+        self.assertEqual(self.columns["bins"].shape, (len(self.text_rows), 20))
+        self.assertEqual(list(self.columns["bins"][0]), [int(float(x)) for x in self.text_rows[0][25:45]])
+
+
+class TestProcessCcncCsvFiles(TestCase):
+    def test_concatenates_in_order(self):
+        date, columns = hf.process_ccnc_csv_files(list(reversed(CCNC_FILES)))
+        self.assertEqual(date, "05/30/19")
+        self.assertEqual(len(columns["time"]), sum(len(hf.process_a_csv(f)[1]) for f in CCNC_FILES))
+        self.assertTrue(np.all(np.diff(columns["time"]) > 0))
+
+    def test_no_files(self):
+        self.assertRaises(IOError, hf.process_ccnc_csv_files, [])
+
+    def test_timestamp(self):
+        date, columns = hf.process_ccnc_csv_files(list(CCNC_FILES))
+        first_time = hf.timestamp_to_datetime(columns["timestamp"][0])
+        self.assertEqual(first_time.strftime("%m/%d/%y %H:%M:%S"), "05/30/19 10:21:45")
+        np.testing.assert_array_equal(columns["timestamp"] - columns["timestamp"][0],
+                                      columns["time"] - columns["time"][0])
+
+
+class TestParallelCcncCsvFiles(TestCase):
+    def setUp(self):
+        self.serial = hf.process_ccnc_csv_files(list(CCNC_FILES), max_workers=1)[1]
+
+    def test_parallel_matches_serial(self):
+        # Each file is listed twice so that the process pool is used and the duplicates must be dropped
+        date, columns = hf.process_ccnc_csv_files(CCNC_FILES * 2, max_workers=2)
+        for name in self.serial:
+            np.testing.assert_array_equal(columns[name], self.serial[name])
+
+
+class TestMergeCcncColumns(TestCase):
+    def make_columns(self, times):
+        columns = hf.empty_ccnc_columns()
+        columns["time"] = np.asarray(times, dtype=np.int64)
+        for name in columns:
+            if name != "time":
+                columns[name] = np.zeros((len(times),) + columns[name].shape[1:], dtype=columns[name].dtype)
+        columns["ccnc_count"] = np.arange(len(times), dtype=np.float64)
+        return columns
+
+    def test_drops_duplicates_at_boundary(self):
+        first = self.make_columns([10, 11, 12])
+        second = self.make_columns([12, 13])
+        merged = hf.merge_ccnc_columns(["05/30/19", "05/30/19"], [first, second])
+        self.assertEqual(list(merged["time"]), [10, 11, 12, 13])
+        self.assertEqual(list(merged["ccnc_count"]), [0, 1, 2, 1])
+
+    def test_orders_by_timestamp(self):
+        first = self.make_columns([86398, 86399, 0, 1])
+        second = self.make_columns([2, 3])
+        merged = hf.merge_ccnc_columns(["05/31/19", "05/30/19"], [second, first])
+        self.assertEqual(list(merged["time"]), [86398, 86399, 0, 1, 2, 3])
+
+    def test_same_as_sort(self):
+        times_list = [[10, 11, 12], [12, 13, 14], [5, 6], [14, 15], [20, 25], [21, 22, 30], [13], [30, 30, 31], []]
+        columns_list = [self.make_columns(times) for times in times_list]
+        for i, columns in enumerate(columns_list):
+            columns["ccnc_count"] += 100 * i
+        for order in ([0, 1, 3], [1, 0], [2, 0, 1, 3], [3, 1, 0], [0, 1, 6], [4, 5], [4, 7], [8, 0, 8]):
+            dates = ["05/30/19"] * len(order)
+            merged = hf.merge_ccnc_columns(dates, [columns_list[i] for i in order])
+            joined = hf.concatenate_ccnc_columns([columns_list[i] for i in order])
+            joined["timestamp"] = np.concatenate([hf.ccnc_timestamps(date, columns_list[i]["time"])
+                                                  for date, i in zip(dates, order)])
+            expected = hf.sort_ccnc_columns(joined)
+            for name in expected:
+                np.testing.assert_array_equal(merged[name], expected[name])
+
+
+class TestFindCcncFileRuns(TestCase):
+    def test_hourly_files(self):
+        keys = [np.array([10, 11, 12]), np.array([5, 6]), np.array([12, 13, 14])]
+        self.assertEqual(hf.find_ccnc_file_runs(keys), [(1, 0), (0, 0), (2, 1)])
+
+    def test_repeated_file(self):
+        keys = [np.array([1, 2, 3]), np.array([2, 3]), np.array([3, 4])]
+        self.assertEqual(hf.find_ccnc_file_runs(keys), [(0, 0), (2, 1)])
+
+    def test_interleaved_files(self):
+        self.assertIsNone(hf.find_ccnc_file_runs([np.array([1, 3, 5]), np.array([2, 4])]))
+
+    def test_repeated_row_from_later_file(self):
+        self.assertIsNone(hf.find_ccnc_file_runs([np.array([2, 3]), np.array([1, 2])]))
+
+    def test_file_out_of_order(self):
+        self.assertIsNone(hf.find_ccnc_file_runs([np.array([1, 1, 2])]))
+
+
+class TestCcncTailReader(TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.ccnc_file = os.path.join(self.folder, os.path.basename(CCNC_FILES[0]))
+        with open(CCNC_FILES[0], "rb") as csv_file:
+            self.contents = csv_file.read()
+        self.date, self.columns = hf.process_a_ccnc_csv(CCNC_FILES[0])
+        self.reader = hf.CcncTailReader([self.ccnc_file])
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def append(self, contents):
+        with open(self.ccnc_file, "ab") as csv_file:
+            csv_file.write(contents)
+
+    def assert_columns_equal(self, num_rows):
+        for name in self.columns:
+            np.testing.assert_array_equal(self.reader.columns[name], self.columns[name][:num_rows])
+
+    def test_missing_file(self):
+        self.assertEqual(self.reader.poll(), 0)
+        self.assertIsNone(self.reader.date)
+
+    def test_whole_file(self):
+        self.append(self.contents)
+        self.assertEqual(self.reader.poll(), len(self.columns["time"]))
+        self.assertEqual(self.reader.date, self.date)
+        self.assert_columns_equal(len(self.columns["time"]))
+        self.assertEqual(self.reader.poll(), 0)
+
+    def test_appended_in_pieces(self):
+        # Cut the file in the header, in the middle of a row and at the end of a row
+        lines = self.contents.split(b"\n")
+        header_end = len(b"\n".join(lines[:2])) + 3
+        row_middle = len(b"\n".join(lines[:10])) + 7
+        row_end = len(b"\n".join(lines[:20])) + 1
+        self.append(self.contents[:header_end])
+        self.assertEqual(self.reader.poll(), 0)
+        self.assertEqual(self.reader.date, self.date)
+        self.append(self.contents[header_end:row_middle])
+        num_rows = self.reader.poll()
+        self.assert_columns_equal(num_rows)
+        self.append(self.contents[row_middle:row_end])
+        num_rows += self.reader.poll()
+        self.assert_columns_equal(num_rows)
+        self.append(self.contents[row_end:])
+        num_rows += self.reader.poll()
+        self.assertEqual(num_rows, len(self.columns["time"]))
+        self.assert_columns_equal(num_rows)
+
+    def test_past_midnight(self):
+        lines = self.contents.split(b"\n")
+        self.append(b"\n".join(lines[:7]) + b"\n")
+        self.assertEqual(self.reader.poll(), 1)
+        # Write the next row as just after midnight
+        self.append(b"00:00:01" + lines[7][len(b"10:21:46"):] + b"\n")
+        self.assertEqual(self.reader.poll(), 1)
+        self.assertEqual(self.reader.columns["timestamp"][-1] - self.reader.columns["timestamp"][0],
+                         86400 + 1 - self.columns["time"][0])
+
+    def test_truncated_file(self):
+        self.append(self.contents)
+        self.reader.poll()
+        os.remove(self.ccnc_file)
+        self.append(self.contents[:len(self.contents) // 2])
+        self.assertEqual(self.reader.poll(), 0)
+        self.assert_columns_equal(len(self.columns["time"]))
+
+
+class TestIndexSmpsSections(TestCase):
+    def setUp(self):
+        self.smps_data = hf.process_tab_sep_files(SMPS_FILE)
+        self.sections = hf.index_smps_sections(self.smps_data)
+
+    def test_normalized_concs(self):
+        start, end = self.sections["normalized_concs"]
+        self.assertEqual(start, 1)
+        self.assertEqual(self.smps_data[start][0], "8.20")
+        self.assertEqual(self.smps_data[end][0], "Scan Up Time(s)")
+
+    def test_metadata(self):
+        metadata = self.sections["metadata"]
+        self.assertEqual(self.smps_data[metadata["scanuptime(s)"]][1], "120")
+        self.assertEqual(self.smps_data[metadata["retracetime(s)"]][1], "15")
+        self.assertEqual(self.smps_data[metadata["cpcsampleflow(lpm)"]][1], "0.05")
+
+    def test_raw_counts(self):
+        start, end = self.sections["raw_counts"]
+        self.assertEqual(self.smps_data[start][0], "0.1")
+        self.assertEqual(self.smps_data[end - 1][0], "135.0")
+        self.assertEqual(end, len(self.smps_data) - 1)
+
+    def test_missing_section(self):
+        self.assertRaises(IOError, hf.index_smps_sections, self.smps_data[:5])
+
+
+class TestProcessSmpsFile(TestCase):
+    def setUp(self):
+        self.smps_text = hf.process_tab_sep_files(SMPS_FILE)
+        self.text_sections = hf.index_smps_sections(self.smps_text)
+        self.sections, self.smps_data = hf.process_smps_file(SMPS_FILE)
+
+    def test_start_times(self):
+        self.assertEqual(self.smps_data["start_times"], self.smps_text[0])
+
+    def test_start_dates(self):
+        self.assertEqual(self.smps_data["start_dates"], ["05/30/19"] * len(self.smps_text[0]))
+        with open(SMPS_FILE, "rb") as txt_file:
+            contents = txt_file.read()
+        start, end = self.sections["start_dates"]
+        self.assertTrue(contents[start:end].startswith(b"Date\t05/30/19"))
+
+    def test_metadata(self):
+        for key, row in self.text_sections["metadata"].items():
+            self.assertEqual(self.smps_data["metadata"][key], self.smps_text[row][1:])
+
+    def test_normalized_concs(self):
+        start, end = self.text_sections["normalized_concs"]
+        rows = self.smps_text[start:end]
+        np.testing.assert_array_equal(self.smps_data["diameter_midpoints"], [float(row[0]) for row in rows])
+        np.testing.assert_array_equal(self.smps_data["normalized_concs"],
+                                      [[float(x) for x in row[1:]] for row in rows])
+
+    def test_raw_data(self):
+        start, end = self.text_sections["raw_counts"]
+        rows = self.smps_text[start:end]
+        np.testing.assert_array_equal(self.smps_data["raw_times"], [float(row[0]) for row in rows])
+        np.testing.assert_array_equal(self.smps_data["raw_diameters"], [[float(x) for x in row[1::2]] for row in rows])
+        np.testing.assert_array_equal(self.smps_data["raw_counts"], [[int(x) for x in row[2::2]] for row in rows])
+        self.assertTrue(self.smps_data["raw_counts"].flags["C_CONTIGUOUS"])
+
+    def test_scan_columns_are_contiguous(self):
+        self.assertTrue(self.smps_data["normalized_concs"][:, 3].flags["C_CONTIGUOUS"])
+
+    def test_byte_ranges(self):
+        with open(SMPS_FILE, "rb") as txt_file:
+            contents = txt_file.read()
+        start, end = self.sections["metadata"]["scanuptime(s)"]
+        self.assertTrue(contents[start:end].startswith(b"Scan Up Time(s)\t120"))
+        start, end = self.sections["raw_counts"]
+        self.assertTrue(contents[start:end].startswith(b"0.1\t"))
+        self.assertTrue(contents[start:end].split(b"\n")[-1].startswith(b"135.0\t"))
+
+
+class TestParseCache(TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.ccnc_file = shutil.copy(CCNC_FILES[-1], self.folder)
+        self.smps_file = shutil.copy(SMPS_FILE, self.folder)
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_ccnc_cache(self):
+        date, columns = hf.load_cached_ccnc_csv(self.ccnc_file)
+        self.assertTrue(os.path.isfile(hf.get_parse_cache_path(self.ccnc_file)))
+        self.assertIsNotNone(hf.load_parse_cache(self.ccnc_file))
+        cached_date, cached_columns = hf.load_cached_ccnc_csv(self.ccnc_file)
+        self.assertEqual(cached_date, date)
+        for name in columns:
+            np.testing.assert_array_equal(cached_columns[name], columns[name])
+
+    def test_smps_cache(self):
+        sections, smps_data = hf.load_cached_smps_file(self.smps_file)
+        cached_sections, cached_smps_data = hf.load_cached_smps_file(self.smps_file)
+        self.assertEqual(cached_sections, sections)
+        self.assertEqual(cached_smps_data["start_times"], smps_data["start_times"])
+        self.assertEqual(cached_smps_data["metadata"], smps_data["metadata"])
+        np.testing.assert_array_equal(cached_smps_data["raw_counts"], smps_data["raw_counts"])
+
+    def test_changed_file_invalidates_cache(self):
+        hf.load_cached_ccnc_csv(self.ccnc_file)
+        with open(self.ccnc_file, "a") as a_file:
+            a_file.write("13:10:29,    0.50\n")
+        self.assertIsNone(hf.load_parse_cache(self.ccnc_file))
+        self.assertFalse(os.path.isfile(hf.get_parse_cache_path(self.ccnc_file)))
+
+    def test_touched_file_uses_hash(self):
+        hf.load_cached_ccnc_csv(self.ccnc_file)
+        os.utime(self.ccnc_file, ns=(0, 0))
+        self.assertIsNotNone(hf.load_parse_cache(self.ccnc_file))
+
+    def test_evict(self):
+        hf.load_cached_ccnc_csv(self.ccnc_file)
+        os.remove(self.ccnc_file)
+        hf.evict_parse_cache(self.folder)
+        self.assertFalse(os.path.isfile(hf.get_parse_cache_path(self.ccnc_file)))
+
+
+class TestTimeToSeconds(TestCase):
+    def test_time_to_seconds(self):
+        self.assertEqual(hf.time_to_seconds("10:21:45"), 37305)
+
+
+class TestUnwrapTimesOfDay(TestCase):
+    def test_same_day(self):
+        self.assertEqual(list(hf.unwrap_times_of_day([10, 11, 20])), [10, 11, 20])
+
+    def test_past_midnight(self):
+        self.assertEqual(list(hf.unwrap_times_of_day([86398, 86399, 0, 1])), [86398, 86399, 86400, 86401])
+
+    def test_empty(self):
+        self.assertEqual(len(hf.unwrap_times_of_day([])), 0)
+
+
+class TestSmpsTimestamps(TestCase):
+    def test_dates(self):
+        timestamps = hf.smps_timestamps(["23:59:00", "00:01:15"], ["05/30/19", "05/31/19"])
+        self.assertEqual(hf.timestamp_to_datetime(timestamps[0]), dt.datetime(2019, 5, 30, 23, 59))
+        self.assertEqual(hf.timestamp_to_datetime(timestamps[1]), dt.datetime(2019, 5, 31, 0, 1, 15))
+
+    def test_no_dates(self):
+        first_day = hf.day_timestamp("05/30/19")
+        timestamps = hf.smps_timestamps(["23:59:00", "00:01:15"], first_day=first_day)
+        self.assertEqual(list(timestamps - first_day), [86340, 86475])
+
+    def test_datetime_round_trip(self):
+        a_datetime = dt.datetime(2019, 5, 30, 10, 21, 47)
+        self.assertEqual(hf.timestamp_to_datetime(hf.datetime_to_timestamp(a_datetime)), a_datetime)
+
+
+class TestIntervalIndex(TestCase):
+    def setUp(self):
+        # The third interval is listed out of order and the first one ends after the second one starts
+        self.index = hf.IntervalIndex([0, 10, 40, 20], [15, 20, 50, 30])
+
+    def test_overlapping(self):
+        self.assertEqual(list(self.index.overlapping(12, 25)), [0, 1, 3])
+        self.assertEqual(list(self.index.overlapping(30, 40)), [])
+        self.assertEqual(list(self.index.overlapping(45, 100)), [2])
+
+    def test_empty(self):
+        self.assertEqual(len(hf.IntervalIndex([], []).overlapping(0, 10)), 0)
+
+
+class TestFindSecondBoundaries(TestCase):
+    def test_boundaries(self):
+        times = [0.5, 1.0, 1.5, 2.0, 2.5]
+        self.assertEqual(list(hf.find_second_boundaries(times)), [1, 3])
+
+    def test_stops_at_missing_second(self):
+        times = [1.0, 2.5, 3.0, 4.0]
+        self.assertEqual(list(hf.find_second_boundaries(times)), [0])
+
+
+class TestSumSmpsSeconds(TestCase):
+    def setUp(self):
+        self.smps_data = hf.process_smps_file(SMPS_FILE)[1]
+        self.counts, self.ave_diameters = hf.sum_smps_seconds(self.smps_data["raw_times"],
+                                                              self.smps_data["raw_diameters"],
+                                                              self.smps_data["raw_counts"])
+
+    def test_shape(self):
+        self.assertEqual(self.counts.shape, (135, self.smps_data["raw_counts"].shape[1]))
+        self.assertEqual(self.ave_diameters.shape, (135,))
+
+    def test_matches_row_by_row_sums(self):
+        raw_times = self.smps_data["raw_times"]
+        raw_diameters = self.smps_data["raw_diameters"]
+        raw_counts = self.smps_data["raw_counts"]
+        start = 0
+        for second, end in enumerate(hf.find_second_boundaries(raw_times)):
+            counts = raw_counts[start:end + 1].sum(axis=0)
+            np.testing.assert_array_equal(self.counts[second], counts)
+            if counts.sum() == 0:
+                self.assertEqual(self.ave_diameters[second], raw_diameters[end, 0])
+            else:
+                ave_diameter = (raw_diameters[start:end + 1] * raw_counts[start:end + 1]).sum() / counts.sum()
+                self.assertAlmostEqual(self.ave_diameters[second], ave_diameter, places=9)
+            start = end + 1
+
+
+class TestKappaPrecisionReport(TestCase):
+    def test_report(self):
+        kappa_dict = {0.2: [[0.0, 80.0, 0.25, 50, 0.2, 1.0], [0.0, 120.0, 0.5, 50, 0.4, 1.0]],
+                      0.4: [[1.0, 60.0, 0.2, 50, 0.2, 1.0]]}
+        other_kappa_dict = {0.2000001: [[0.0, 80.0, 0.25, 50, 0.2, 1.0], [0.0, 120.0, 0.55, 50, 0.4, 1.0]]}
+        report = hf.kappa_precision_report(kappa_dict, other_kappa_dict)
+        self.assertEqual(len(report["points"]), 2)
+        self.assertEqual(report["unmatched"], 1)
+        self.assertAlmostEqual(report["max_difference"], 0.05)
+        self.assertAlmostEqual(report["max_relative_difference"], 0.1)
+
+
+class TestSmooth(TestCase):
+    def setUp(self):
+        self.values = np.random.RandomState(0).gamma(2.0, 2.0, (4, 40))
+
+    def test_matches_savgol_filter(self):
+        for window_length, polyorder in ((5, 1), (5, 2), (7, 2), (15, 2)):
+            np.testing.assert_allclose(hf.smooth(self.values[0], window_length, polyorder),
+                                       scipy.signal.savgol_filter(self.values[0], window_length, polyorder),
+                                       rtol=1e-12)
+
+    def test_matrix(self):
+        smoothed = hf.smooth(self.values, 7, 2)
+        np.testing.assert_allclose(smoothed, scipy.signal.savgol_filter(self.values, 7, 2), rtol=1e-12)
+        for i in range(len(self.values)):
+            np.testing.assert_array_equal(smoothed[i], hf.smooth(self.values[i], 7, 2))
+
+    def test_axis(self):
+        np.testing.assert_array_equal(hf.smooth(self.values.T, 7, 2, axis=0), hf.smooth(self.values, 7, 2).T)
+
+    def test_too_short(self):
+        values = [1.0, 2.0, 3.0]
+        self.assertIs(hf.smooth(values, 5, 2), values)
+
+    def test_kernel_is_kept(self):
+        self.assertIs(hf.get_savgol_kernel(5, 2), hf.get_savgol_kernel(5, 2))
+
+
+class TestSmoothLists(TestCase):
+    def test_smooth_lists(self):
+        rng = np.random.RandomState(0)
+        a_lists = [rng.uniform(0, 5, length) for length in (20, 30, 20)]
+        smoothed = hf.smooth_lists(a_lists, 7, 2)
+        for a_list, smoothed_list in zip(a_lists, smoothed):
+            np.testing.assert_array_equal(smoothed_list, hf.smooth(a_list, 7, 2))
+
+
+class TestNormalizeDndlogdpList(TestCase):
+    def test_normalize(self):
+        a_list = np.array([9.0, 0, 0, 0, 0, 1.0, 4.0, 0])
+        np.testing.assert_array_equal(hf.normalize_dndlogdp_list(a_list), [2.25, 0, 0, 0, 0, 0.25, 1.0, 0])
+
+    def test_does_not_change_list(self):
+        a_list = np.array([9.0, 0, 0, 0, 0, 1.0, 4.0, 0])
+        hf.normalize_dndlogdp_list(a_list)
+        np.testing.assert_array_equal(a_list, [9.0, 0, 0, 0, 0, 1.0, 4.0, 0])
@@ -0,0 +1,388 @@
+"""
+# REVIEW Documentation
+"""
+from unittest import TestCase
+import pickle
+
+import numpy as np
+
+import helper_functions as hf
+import scan
+
+
+class TestScanStore(TestCase):
+    def setUp(self):
+        self.store = scan.ScanStore(3)
+
+    def test_empty(self):
+        self.assertEqual(len(self.store.get_values("raw_T1s", 1)), 0)
+
+    def test_set_values(self):
+        self.store.set_values("raw_T1s", 1, [1.0, 2.0])
+        self.store.set_values("raw_T1s", 2, [3.0, 4.0, 5.0])
+        self.assertEqual(self.store.channels["raw_T1s"].shape, (3, 3))
+        np.testing.assert_array_equal(self.store.get_values("raw_T1s", 1), [1.0, 2.0])
+        np.testing.assert_array_equal(self.store.get_values("raw_T1s", 2), [3.0, 4.0, 5.0])
+
+    def test_values_are_views(self):
+        self.store.set_values("raw_T1s", 0, [1.0, 2.0])
+        self.store.get_values("raw_T1s", 0)[0] = 7.0
+        self.assertEqual(self.store.channels["raw_T1s"][0, 0], 7.0)
+
+    def test_set_all_values(self):
+        values = np.arange(6, dtype=np.float64).reshape(2, 3).T
+        self.store.set_all_values("raw_normalized_concs", values)
+        self.assertTrue(self.store.channels["raw_normalized_concs"].flags["C_CONTIGUOUS"])
+        np.testing.assert_array_equal(self.store.get_values("raw_normalized_concs", 2), [2.0, 5.0])
+        self.assertRaises(ValueError, self.store.set_all_values, "raw_normalized_concs", values[:2])
+
+    def test_compact(self):
+        store = scan.ScanStore(2, compact=True)
+        store.set_values("raw_ccnc_counts", 0, [1.5, 2.5])
+        store.set_values("corrected_ccnc_counts", 0, [1.5, 2.5])
+        self.assertEqual(store.channels["raw_ccnc_counts"].dtype, np.float32)
+        self.assertEqual(store.channels["corrected_ccnc_counts"].dtype, np.float64)
+        store.set_shift(0, 1, 2)
+        self.assertEqual(store.get_shifted_values("processed_ccnc_counts", 0).dtype, np.float32)
+
+
+class TestShiftedValues(TestCase):
+    def setUp(self):
+        self.store = scan.ScanStore(2)
+        self.store.set_values("raw_ccnc_counts", 0, [1.0, 2.0, 3.0, 4.0])
+        self.store.set_values("raw_ccnc_counts", 1, [5.0, 6.0])
+
+    def shifted(self, row, shift, length):
+        self.store.set_shift(row, shift, length)
+        return self.store.get_shifted_values("processed_ccnc_counts", row)
+
+    def test_positive_shift(self):
+        np.testing.assert_array_equal(self.shifted(0, 1, 4), [2.0, 3.0, 4.0, 0.0])
+
+    def test_negative_shift(self):
+        np.testing.assert_array_equal(self.shifted(0, -2, 4), [0.0, 0.0, 1.0, 2.0])
+
+    def test_shift_past_values(self):
+        np.testing.assert_array_equal(self.shifted(0, 9, 3), [0.0, 0.0, 0.0])
+        np.testing.assert_array_equal(self.shifted(0, -9, 3), [0.0, 0.0, 0.0])
+
+    def test_shorter_row(self):
+        # The row is padded with zeros past its own values
+        np.testing.assert_array_equal(self.shifted(1, 0, 4), [5.0, 6.0, 0.0, 0.0])
+
+    def test_read_only(self):
+        values = self.shifted(0, 0, 4)
+        self.assertFalse(values.flags.writeable)
+
+    def test_shift_does_not_copy(self):
+        padded = self.store.get_padded("raw_ccnc_counts", 4)[0]
+        self.shifted(0, 1, 4)
+        self.assertIs(self.store.get_padded("raw_ccnc_counts", 4)[0], padded)
+        self.assertTrue(np.shares_memory(self.shifted(0, -1, 4), padded))
+
+    def test_raw_change_is_seen(self):
+        self.shifted(0, 0, 4)
+        self.store.set_values("raw_ccnc_counts", 0, [7.0])
+        np.testing.assert_array_equal(self.shifted(0, 0, 2), [7.0, 0.0])
+
+    def test_pickle(self):
+        self.shifted(0, 1, 2)
+        store = pickle.loads(pickle.dumps(self.store))
+        np.testing.assert_array_equal(store.get_shifted_values("processed_ccnc_counts", 0), [2.0, 3.0])
+
+
+class TestSmoothed(TestCase):
+    def setUp(self):
+        self.store = scan.ScanStore(3)
+        for row in range(3):
+            self.store.set_values("raw_ccnc_counts", row, np.arange(12.0) ** 2 + row)
+            self.store.set_shift(row, row, 10)
+
+    def test_matches_smooth(self):
+        smoothed = self.store.get_smoothed("raw_ccnc_counts", 1, 5, 2)
+        np.testing.assert_array_equal(smoothed, hf.smooth(np.arange(12.0) ** 2 + 1, 5, 2))
+        self.assertFalse(smoothed.flags.writeable)
+
+    def test_smooth_rows(self):
+        smoothed = self.store.smooth_rows("processed_ccnc_counts", [0, 1, 2], 5, 2)
+        for row in range(3):
+            values = self.store.get_shifted_values("processed_ccnc_counts", row)
+            np.testing.assert_array_equal(smoothed[row], hf.smooth(values, 5, 2))
+
+    def test_kept_until_changed(self):
+        smoothed = self.store.get_smoothed("processed_ccnc_counts", 0, 5, 2)
+        self.assertIs(self.store.get_smoothed("processed_ccnc_counts", 0, 5, 2), smoothed)
+        self.store.set_shift(0, 1, 10)
+        shifted = self.store.get_smoothed("processed_ccnc_counts", 0, 5, 2)
+        self.assertIsNot(shifted, smoothed)
+        self.store.set_values("raw_ccnc_counts", 0, np.ones(12))
+        np.testing.assert_array_almost_equal(self.store.get_smoothed("processed_ccnc_counts", 0, 5, 2), np.ones(10))
+
+    def test_not_pickled(self):
+        self.store.get_smoothed("raw_ccnc_counts", 0, 5, 2)
+        store = pickle.loads(pickle.dumps(self.store))
+        self.assertEqual(store.smoothed, {})
+        np.testing.assert_array_equal(store.versions["raw_ccnc_counts"], [1, 1, 1])
+
+
+class TestScanSimilarity(TestCase):
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        store = scan.ScanStore(8)
+        self.scans = [scan.Scan(i, store) for i in range(8)]
+        for i, a_scan in enumerate(self.scans):
+            a_scan.raw_smps_counts = np.round(rng.gamma(1 + i % 3, 2, 135)) * 1.2
+        self.scans[3].raw_smps_counts = np.zeros(135)
+        self.scans[4].raw_smps_counts = np.full(135, 2.4)
+        # The same distribution as the first scan with a few counts swapped
+        self.scans[5].raw_smps_counts = self.scans[0].raw_smps_counts[np.r_[1, 0, 3, 2, 4:135]]
+        self.similarity = scan.ScanSimilarity(self.scans)
+        self.pairs = [(i, j) for i in range(8) for j in range(8) if i != j]
+
+    def test_same_as_each_scan(self):
+        same = self.similarity.compare_smps(self.pairs)
+        for (i, j), same_dist in zip(self.pairs, same):
+            self.assertEqual(same_dist, self.scans[i].compare_smps(self.scans[j]), (i, j))
+        self.assertTrue(np.any(same))
+
+    def test_p_values(self):
+        import scipy.stats
+        pearson_p_values = self.similarity.get_pearson_p_values()
+        ks_p_values = self.similarity.get_ks_p_values([(0, 1), (1, 2), (6, 7)])
+        for (i, j), ks_p_value in zip([(0, 1), (1, 2), (6, 7)], ks_p_values):
+            counts = self.scans[i].raw_smps_counts, self.scans[j].raw_smps_counts
+            self.assertAlmostEqual(pearson_p_values[i, j], scipy.stats.pearsonr(*counts)[1])
+            self.assertEqual(ks_p_value, scipy.stats.ks_2samp(*counts)[1])
+            statistic = self.similarity.get_ks_statistics(np.array([[i, j]]), 135, 135)[0]
+            self.assertAlmostEqual(statistic, scipy.stats.ks_2samp(*counts)[0])
+
+    def test_cached(self):
+        self.similarity.compare_smps(self.pairs)
+        pearson_p_values = self.similarity.get_pearson_p_values()
+        self.assertIs(self.similarity.get_pearson_p_values(), pearson_p_values)
+        self.assertEqual(len(self.similarity.ks_p_values), 42)
+        self.assertLessEqual(len(self.similarity.ks_p_values_by_statistic), 42)
+
+
+class TestApplyShiftFactors(TestCase):
+    @staticmethod
+    def make_scans(num_scans):
+        rng = np.random.RandomState(0)
+        store = scan.ScanStore(num_scans)
+        scans = [scan.Scan(i, store) for i in range(num_scans)]
+        for i, a_scan in enumerate(scans):
+            a_scan.set_duration(10)
+            a_scan.set_up_time(8)
+            a_scan.set_counts_2_conc(1.2)
+            a_scan.set_cpc_sample_flow(0.05)
+            num_ccnc = 8 if i == 3 else 14
+            temps = [20 + rng.uniform(0, 0.5 + i % 3, num_ccnc) for _ in range(3)]
+            super_sats = np.full(num_ccnc, 0.2)
+            if i == 4:
+                super_sats[12] = 0.3
+            a_scan.set_raw_ccnc_data(super_sats, temps[0], temps[1], temps[2], rng.uniform(0, 5, num_ccnc),
+                                     rng.uniform(0, 5, num_ccnc), rng.uniform(40, 50, num_ccnc),
+                                     rng.uniform(0, 5, num_ccnc))
+            a_scan.set_raw_smps_data(rng.uniform(0, 5, 10), rng.uniform(10, 300, 10))
+            a_scan.raw_normalized_concs = rng.uniform(0, 100, 12) * (i != 5)
+        return scans
+
+    def test_same_as_each_scan(self):
+        shift_factors = [0, 2, -3, 7, 4, 1, 20, 5]
+        scans = self.make_scans(len(shift_factors))
+        expected = self.make_scans(len(shift_factors))
+        scan.apply_shift_factors(scans, shift_factors)
+        for a_scan, expected_scan, shift_factor in zip(scans, expected, shift_factors):
+            expected_scan.set_shift_factor(shift_factor)
+            expected_scan.generate_processed_data()
+            for name in ("shift_factor", "status", "status_code", "true_super_sat"):
+                self.assertEqual(getattr(a_scan, name), getattr(expected_scan, name), name)
+            for name in ("processed_smps_counts", "processed_normalized_concs", "processed_ccnc_counts",
+                         "processed_T1s", "processed_super_sats"):
+                np.testing.assert_array_equal(getattr(a_scan, name), getattr(expected_scan, name), name)
+
+    def test_no_scans(self):
+        scan.apply_shift_factors([], [])
+
+
+class TestPostAlignSelfTests(TestCase):
+    def setUp(self):
+        self.store = scan.ScanStore(4)
+        for row in range(4):
+            temps = [np.full(6, 20.0) for _ in range(3)]
+            super_sats = np.full(6, 0.2)
+            if row == 1:
+                super_sats[4] = 0.25
+            elif row == 2:
+                # Drifts by more than 1 but has a standard deviation under 1
+                temps[2][5] = 21.5
+            elif row == 3:
+                temps[0][:] = [20, 23, 20, 23, 20, 23]
+            self.store.set_values("raw_super_sats", row, super_sats)
+            for name, values in zip(("raw_T1s", "raw_T2s", "raw_T3s"), temps):
+                self.store.set_values(name, row, values)
+        self.store.set_shifts(np.arange(4), 0, 6)
+
+    def test_status_codes(self):
+        status_codes, super_sats_constant = scan.post_align_self_tests(self.store, np.arange(4))
+        np.testing.assert_array_equal(status_codes, [0, 7, 7, 7])
+        np.testing.assert_array_equal(super_sats_constant, [True, False, True, True])
+
+    def test_scan(self):
+        a_scan = scan.Scan(2, self.store)
+        a_scan.post_align_self_test()
+        self.assertEqual(a_scan.status, 0)
+        self.assertEqual(a_scan.status_code, 7)
+        a_scan = scan.Scan(0, self.store)
+        a_scan.post_align_self_test()
+        self.assertEqual(a_scan.status_code, 0)
+
+
+class TestGetActivations(TestCase):
+    def setUp(self):
+        self.scans = TestApplyShiftFactors.make_scans(6)
+        scan.apply_shift_factors(self.scans, [0, 1, 2, -1, 3, 0])
+
+    @staticmethod
+    def expected_activation(a_scan):
+        up_time = a_scan.scan_up_time
+        ccnc_uptime = sum(a_scan.processed_ccnc_count_sums[0:up_time])
+        smps_uptime = round(sum(a_scan.processed_smps_counts[0:up_time]) / a_scan.counts_to_conc, 0)
+        mean_sample_flow = sum(a_scan.processed_ccnc_sample_flow[0:up_time]) / up_time
+        return round((ccnc_uptime / smps_uptime) * (a_scan.cpc_sample_flow / (mean_sample_flow / 1000)) * 100, 0)
+
+    def test_same_as_each_scan(self):
+        activations = scan.get_activations(self.scans)
+        for a_scan, activation in zip(self.scans, activations):
+            self.assertAlmostEqual(activation, self.expected_activation(a_scan))
+            self.assertEqual(a_scan.get_activation(), activation)
+
+    def test_unknown(self):
+        self.scans[2].raw_smps_counts = np.zeros(10)
+        self.scans[2].generate_processed_data()
+        self.assertTrue(np.isnan(scan.get_activations(self.scans)[2]))
+        self.assertEqual(self.scans[2].get_activation(), "Unknown")
+
+    def test_cached(self):
+        activation = self.scans[0].get_activation()
+        self.scans[0].cpc_sample_flow = 0.1
+        self.assertEqual(self.scans[0].get_activation(), activation)
+        self.scans[0].set_cpc_sample_flow(0.1)
+        self.assertAlmostEqual(self.scans[0].get_activation(), 2 * activation, delta=1)
+
+    def test_shift_change(self):
+        activation = self.scans[1].get_activation()
+        self.scans[1].set_shift_factor(4)
+        self.assertIsNone(self.scans[1].activation)
+        self.scans[1].generate_processed_data()
+        self.assertNotEqual(self.scans[1].get_activation(), activation)
+
+
+class TestShareStore(TestCase):
+    def setUp(self):
+        self.scans = TestApplyShiftFactors.make_scans(3)
+        scan.apply_shift_factors(self.scans, [0, 2, -1])
+
+    @staticmethod
+    def old_scan(a_scan):
+        # A scan pickled before the data was kept in a store holds its data as lists
+        state = {name: getattr(a_scan, name) for name in ("version", "status", "status_code", "counts_to_conc",
+                                                           "cpc_sample_flow", "index", "duration", "scan_up_time",
+                                                           "scan_down_time", "shift_factor")}
+        for name in list(scan.ScanStore.CHANNELS) + list(scan.ScanStore.SHIFTED_CHANNELS):
+            state[name] = list(getattr(a_scan, name))
+        state["diameter_midpoints"] = list(a_scan.diameter_midpoints)
+        old_scan = scan.Scan.__new__(scan.Scan)
+        old_scan.__setstate__(state)
+        return old_scan
+
+    def test_old_scans(self):
+        old_scans = [self.old_scan(a_scan) for a_scan in self.scans]
+        store = scan.share_store(old_scans)
+        for i, (old_scan, a_scan) in enumerate(zip(old_scans, self.scans)):
+            self.assertIs(old_scan.store, store)
+            self.assertEqual(old_scan.row, i)
+            np.testing.assert_array_equal(old_scan.raw_smps_counts, a_scan.raw_smps_counts)
+            np.testing.assert_array_equal(old_scan.processed_ccnc_counts, a_scan.processed_ccnc_counts)
+        activations = scan.get_activations(old_scans)
+        for activation, a_scan in zip(activations, self.scans):
+            self.assertAlmostEqual(activation, TestGetActivations.expected_activation(a_scan))
+        self.assertEqual(len(set(activations)), 3)
+
+    def test_shared_store_kept(self):
+        store = self.scans[0].store
+        self.assertIs(scan.share_store(self.scans), store)
+        self.assertEqual([a_scan.row for a_scan in self.scans], [0, 1, 2])
+
+    def test_no_scans(self):
+        self.assertIsNone(scan.share_store([]))
+
+
+class TestStages(TestCase):
+    def setUp(self):
+        self.a_scan = scan.Scan(0)
+
+    def test_done(self):
+        self.a_scan.set_stage_done("processed")
+        self.a_scan.set_stage_done("corrected")
+        self.assertEqual(self.a_scan.computed_stages, {"processed", "corrected"})
+        self.assertEqual(self.a_scan.stale_stages, set())
+
+    def test_invalidate_computed_stages(self):
+        self.a_scan.set_stage_done("processed")
+        self.a_scan.set_stage_done("corrected")
+        self.a_scan.invalidate("processed")
+        self.assertEqual(self.a_scan.stale_stages, {"processed", "corrected"})
+        self.assertEqual(self.a_scan.get_stale_stages("sigmoid"), ["processed", "corrected"])
+        self.assertEqual(self.a_scan.get_stale_stages("processed"), ["processed"])
+
+    def test_done_makes_later_stages_stale(self):
+        for stage in scan.Scan.STAGES:
+            self.a_scan.set_stage_done(stage)
+        self.a_scan.set_stage_done("corrected")
+        self.assertEqual(self.a_scan.stale_stages, {"sigmoid", "kappa"})
+
+    def test_pickle(self):
+        self.a_scan.set_stage_done("processed")
+        a_scan = pickle.loads(pickle.dumps(self.a_scan))
+        self.assertEqual(a_scan.computed_stages, {"processed"})
+
+
+class TestScanView(TestCase):
+    def setUp(self):
+        self.store = scan.ScanStore(2)
+        self.scans = [scan.Scan(i, self.store) for i in range(2)]
+
+    def test_slots(self):
+        self.assertFalse(hasattr(self.scans[0], "__dict__"))
+        self.assertRaises(AttributeError, setattr, self.scans[0], "not_a_variable", 1)
+
+    def test_channels_use_store_rows(self):
+        self.scans[1].raw_smps_counts = [1.0, 2.0]
+        np.testing.assert_array_equal(self.store.channels["raw_smps_counts"][1], [1.0, 2.0])
+        self.assertEqual(len(self.scans[0].raw_smps_counts), 0)
+
+    def test_shared_diameter_midpoints(self):
+        self.scans[0].diameter_midpoints = [8.2, 8.5]
+        np.testing.assert_array_equal(self.scans[1].diameter_midpoints, [8.2, 8.5])
+
+    def test_own_store(self):
+        a_scan = scan.Scan(5)
+        a_scan.raw_T1s = [1.0]
+        self.assertEqual(a_scan.row, 0)
+        self.assertEqual(a_scan.store.num_scans, 1)
+
+    def test_pickle(self):
+        self.scans[0].raw_T1s = [1.0, 2.0]
+        self.scans[1].status = 0
+        scans = pickle.loads(pickle.dumps(self.scans, protocol=pickle.HIGHEST_PROTOCOL))
+        self.assertIs(scans[0].store, scans[1].store)
+        np.testing.assert_array_equal(scans[0].raw_T1s, [1.0, 2.0])
+        self.assertEqual(scans[1].status, 0)
+
+    def test_old_pickle_state(self):
+        a_scan = scan.Scan.__new__(scan.Scan)
+        a_scan.__setstate__({"index": 3, "status": 1, "raw_T1s": [1.0, 2.0], "diameter_midpoints": [8.2]})
+        self.assertEqual(a_scan.index, 3)
+        np.testing.assert_array_equal(a_scan.raw_T1s, [1.0, 2.0])
+        np.testing.assert_array_equal(a_scan.diameter_midpoints, [8.2])